@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+IVF近似索引基准测试 - 对比精确匹配的 recall@1 和加速比
+ANN benchmark - recall@1 and speedup of the IVF index versus the exact matcher
+
+用法:
+  python3 benchmarks/bench_ann.py                       # 合成数据 (20000条编码)
+  python3 benchmarks/bench_ann.py --size 50000 --users 2000
+  python3 benchmarks/bench_ann.py --model models/face_model.bin
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from matcher import EncodingMatcher
+from ann_index import IVFIndex
+from model_store import ModelStore
+
+
+def synthetic_gallery(size, users, seed=0):
+    """合成人脸编码：每个用户一个中心，照片编码围绕中心分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=0.08, size=(users, 128)).astype(np.float32)
+    labels = rng.integers(users, size=size)
+    encodings = centers[labels] + rng.normal(scale=0.03, size=(size, 128)).astype(np.float32)
+    names = [f"user{label:05d}" for label in labels]
+    return encodings, names
+
+
+def make_queries(encodings, count, seed=1):
+    """在已知编码上加噪声作为查询（模拟同一人的新照片）"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(len(encodings), size=count)
+    noise = rng.normal(scale=0.02, size=(count, encodings.shape[1])).astype(np.float32)
+    return encodings[picks] + noise
+
+
+def timed(func, *args, repeat=3):
+    """返回最佳耗时和结果"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IVF近似索引基准测试')
+    parser.add_argument('--model', help='使用已训练的模型 (face_model.bin 或旧版 .pkl)')
+    parser.add_argument('--size', type=int, default=20000, help='合成编码数量')
+    parser.add_argument('--users', type=int, default=1000, help='合成用户数量')
+    parser.add_argument('--queries', type=int, default=200, help='查询数量')
+    parser.add_argument('--nlist', type=int, default=0, help='桶数量 (0=自动)')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--json', action='store_true', help='输出JSON')
+    args = parser.parse_args()
+
+    if args.model and args.model.endswith('.pkl'):
+        with open(args.model, 'rb') as f:
+            model = pickle.load(f)
+        encodings = np.asarray(model['encodings'], dtype=np.float32)
+        names = list(model['names'])
+    elif args.model:
+        store = ModelStore(args.model)
+        encodings = np.asarray(store.encodings)
+        names = store.names()
+    else:
+        encodings, names = synthetic_gallery(args.size, args.users)
+
+    queries = make_queries(encodings, args.queries)
+    matcher = EncodingMatcher.from_names(encodings, names)
+
+    build_time, index = timed(IVFIndex.build, encodings, names, args.nlist, repeat=1)
+
+    # 精确匹配作为基准（逐个查询，与识别时的调用方式一致）
+    exact_time, exact = timed(lambda: [matcher.match(q)[0] for q in queries])
+    exact_ids = np.array([m.index for m in exact])
+
+    report = {
+        'size': len(encodings),
+        'users': len(set(names)),
+        'queries': len(queries),
+        'nlist': index.nlist,
+        'build_s': round(build_time, 3),
+        'exact_ms_per_query': round(exact_time / len(queries) * 1000, 4),
+        'results': []
+    }
+
+    for nprobe in args.nprobe:
+        ann_time, ann = timed(lambda: [index.match(q, nprobe=nprobe)[0] for q in queries])
+        ann_ids = np.array([m.index for m in ann])
+        report['results'].append({
+            'nprobe': nprobe,
+            'recall_at_1': round(float((ann_ids == exact_ids).mean()), 4),
+            'ms_per_query': round(ann_time / len(queries) * 1000, 4),
+            'speedup': round(exact_time / ann_time, 2)
+        })
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"编码数: {report['size']}  用户数: {report['users']}  桶数: {report['nlist']}")
+    print(f"建索引: {report['build_s']}s  精确匹配: {report['exact_ms_per_query']}ms/查询")
+    print("-" * 48)
+    print(f"{'nprobe':>8} {'recall@1':>10} {'ms/查询':>10} {'加速比':>10}")
+    for row in report['results']:
+        print(f"{row['nprobe']:>8} {row['recall_at_1']:>10.4f} "
+              f"{row['ms_per_query']:>10.4f} {row['speedup']:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+检测缩放基准测试 - 每个缩放比例的耗时与精度
+Detection scale benchmark - latency/accuracy trade-off per detect_scale
+
+以 scale=1.0（原图检测）为基准，对每个缩放比例统计：
+  - 检测 / 编码耗时
+  - 检测召回：与基准检测框 IoU >= 0.5 的比例
+  - 编码偏移：与基准编码的平均欧氏距离（远小于识别阈值0.4即可）
+  - 识别准确率：图片按 <目录>/<用户名>/xxx.jpg 组织并提供模型时统计
+
+用法:
+  python3 benchmarks/bench_detect_scale.py --images faces
+  python3 benchmarks/bench_detect_scale.py --images fixtures/ --scales 1 0.5 0.33 0.25 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from camera import IMAGE_EXTENSIONS, load_rgb_image
+from detection import FaceDetector
+from matcher import EncodingMatcher
+from model_store import ModelStore
+
+
+def find_images(root, limit):
+    """递归查找图片，返回 (路径, 用户名)；用户名取上一级目录名"""
+    images = []
+    for directory, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((os.path.join(directory, name), os.path.basename(directory)))
+    return images[:limit] if limit else images
+
+
+def iou(a, b):
+    """两个 (top, right, bottom, left) 框的交并比"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def run_scale(detector, frames):
+    """对所有图片检测+编码，返回每张图的结果和耗时"""
+    results = []
+    for image in frames:
+        start = time.perf_counter()
+        locations = detector.detect(image)
+        detected = time.perf_counter()
+        encodings = detector.encode(image, locations)
+        encoded = time.perf_counter()
+        results.append({
+            'locations': locations,
+            'encodings': encodings,
+            'detect_ms': (detected - start) * 1000,
+            'encode_ms': (encoded - detected) * 1000
+        })
+    return results
+
+
+def compare(baseline, results):
+    """与基准结果比较：检测召回和编码偏移"""
+    expected = matched = 0
+    drift = []
+    for base, result in zip(baseline, results):
+        expected += len(base['locations'])
+        for box, encoding in zip(base['locations'], base['encodings']):
+            overlaps = [iou(box, other) for other in result['locations']]
+            if overlaps and max(overlaps) >= 0.5:
+                matched += 1
+                other = result['encodings'][int(np.argmax(overlaps))]
+                drift.append(float(np.linalg.norm(np.asarray(encoding) - np.asarray(other))))
+    return (matched / expected if expected else 0.0), (float(np.mean(drift)) if drift else 0.0)
+
+
+def identity_accuracy(matcher, labels, results, tolerance):
+    """每张图取第一张脸，统计识别为正确用户的比例"""
+    correct = 0
+    for label, result in zip(labels, results):
+        if not result['encodings']:
+            continue
+        match = matcher.match(result['encodings'][0])[0]
+        if match.name == label and match.distance <= tolerance:
+            correct += 1
+    return correct / len(labels) if labels else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检测缩放比例基准测试')
+    parser.add_argument('--images', default='faces', help='测试图片目录（递归）')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5, 0.33, 0.25])
+    parser.add_argument('--upsample', type=int, default=1)
+    parser.add_argument('--limit', type=int, default=0, help='最多使用多少张图片')
+    parser.add_argument('--model', default='', help='模型文件，用于统计识别准确率')
+    parser.add_argument('--tolerance', type=float, default=0.4)
+    parser.add_argument('--json', action='store_true', help='输出JSON')
+    args = parser.parse_args()
+
+    images = find_images(args.images, args.limit)
+    if not images:
+        print(f"✗ 没有找到测试图片: {args.images}")
+        return 1
+
+    # 预先解码，耗时只统计检测和编码
+    frames = [load_rgb_image(path) for path, _ in images]
+    labels = [label for _, label in images]
+
+    matcher = None
+    if args.model and os.path.exists(args.model):
+        matcher = EncodingMatcher.from_model(ModelStore(args.model).as_model())
+
+    baseline = run_scale(FaceDetector(scale=1.0, upsample=args.upsample), frames)
+    report = {'images': len(frames), 'upsample': args.upsample, 'results': []}
+
+    for scale in args.scales:
+        results = baseline if scale >= 1.0 else run_scale(
+            FaceDetector(scale=scale, upsample=args.upsample), frames)
+        recall, drift = compare(baseline, results)
+        row = {
+            'scale': scale,
+            'detect_ms': round(float(np.mean([r['detect_ms'] for r in results])), 1),
+            'encode_ms': round(float(np.mean([r['encode_ms'] for r in results])), 1),
+            'detection_recall': round(recall, 4),
+            'encoding_drift': round(drift, 4)
+        }
+        if matcher is not None:
+            row['identity_accuracy'] = round(
+                identity_accuracy(matcher, labels, results, args.tolerance), 4)
+        report['results'].append(row)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"图片数: {report['images']}  upsample: {args.upsample}")
+    print("-" * 64)
+    header = f"{'scale':>6} {'检测ms':>9} {'编码ms':>9} {'检测召回':>9} {'编码偏移':>9}"
+    if matcher is not None:
+        header += f" {'识别准确率':>9}"
+    print(header)
+    for row in report['results']:
+        line = (f"{row['scale']:>6.2f} {row['detect_ms']:>9.1f} {row['encode_ms']:>9.1f} "
+                f"{row['detection_recall']:>9.3f} {row['encoding_drift']:>9.4f}")
+        if 'identity_accuracy' in row:
+            line += f" {row['identity_accuracy']:>9.3f}"
+        print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+端到端基准测试 - 回放相机 + 固定人脸库 + 模拟Mac服务
+End-to-end benchmark - replay camera, fixture gallery and stub Mac unlock server
+
+用FaceUnlockSystem完整运行N次识别（取帧 -> 检测 -> 编码 -> 匹配 -> Mac解锁），统计：
+  - 吞吐量（次/秒）
+  - 端到端（触发到Mac返回）和各阶段延迟的 p50/p95/p99
+  - 内存峰值（主进程和识别子进程）
+输入全部来自文件（录制的帧目录、人脸库目录或模型文件），结果可复现；
+与保存的基准结果比较时，超过阈值的退化会列出并以非零退出码结束。
+
+用法:
+  python3 benchmarks/bench_e2e.py --frames fixtures/frames --gallery faces
+  python3 benchmarks/bench_e2e.py --frames fixtures/frames --model models/face_model.bin --mode single
+  python3 benchmarks/bench_e2e.py --frames fixtures/frames --gallery faces --save-baseline benchmarks/baseline.json
+  python3 benchmarks/bench_e2e.py --frames fixtures/frames --gallery faces --baseline benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'core'))
+sys.path.insert(0, os.path.join(ROOT, 'utils'))
+from camera import IMAGE_EXTENSIONS, load_rgb_image
+from detection import FaceDetector
+from matcher import build_prototype_index
+from model_store import save_store
+from mac_stub_server import StubMacServer
+from main import FaceUnlockSystem
+
+
+def build_gallery(gallery_dir, store_path):
+    """把 <目录>/<用户名>/xxx.jpg 编码成模型文件（每张图取第一张脸）"""
+    detector = FaceDetector(scale=1.0)
+    encodings, names = [], []
+    for user in sorted(os.listdir(gallery_dir)):
+        user_dir = os.path.join(gallery_dir, user)
+        if not os.path.isdir(user_dir):
+            continue
+        for name in sorted(os.listdir(user_dir)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = load_rgb_image(os.path.join(user_dir, name))
+            locations = detector.detect(image) if image is not None else []
+            if locations:
+                encodings.append(detector.encode(image, locations[:1])[0])
+                names.append(user)
+
+    if not encodings:
+        return 0
+    encodings = np.asarray(encodings, dtype=np.float32)
+    save_store(store_path, encodings, names, meta={'source': gallery_dir},
+               prototype_index=build_prototype_index(encodings, names, 4))
+    return len(names)
+
+
+def make_config(args, workdir, mac_port):
+    """以config.template.json为基础，相机改为回放、Mac指向模拟服务"""
+    with open(os.path.join(ROOT, 'config.template.json')) as f:
+        config = json.load(f)
+
+    config['camera'].update({
+        'backend': 'replay',
+        'replay_path': os.path.abspath(args.frames),
+        'replay_fps': args.fps,
+        'replay_loop': True,
+        'replay_preload': True
+    })
+    config['mac'].update({
+        'enabled': True,
+        'host': '127.0.0.1',
+        'port': mac_port,
+        'speculative_wake': not args.no_wake
+    })
+    config['mac'].pop('key', None)
+    if args.mode == 'single':
+        config['recognition']['burst_frames'] = 1
+    if args.index:
+        config['recognition']['index'] = args.index
+    config.setdefault('performance', {})['pipeline'] = False
+    if args.workers:
+        config['performance']['max_workers'] = args.workers
+    config.setdefault('system', {})['log_dir'] = os.path.join(workdir, 'logs')
+
+    path = os.path.join(workdir, 'config.json')
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+    return path
+
+
+def percentiles(values):
+    """毫秒延迟的分位数"""
+    if not values:
+        return {'count': 0}
+    data = np.asarray(values, dtype=np.float64)
+    return {
+        'count': len(values),
+        'mean': round(float(data.mean()), 2),
+        'p50': round(float(np.percentile(data, 50)), 2),
+        'p95': round(float(np.percentile(data, 95)), 2),
+        'p99': round(float(np.percentile(data, 99)), 2),
+        'max': round(float(data.max()), 2)
+    }
+
+
+def unlocks_finished(system):
+    stats = system.mac.stats
+    return stats['succeeded'] + stats['failed']
+
+
+def run_attempts(system, attempts, unlock_timeout=20.0):
+    """依次识别，成功时等待Mac返回；返回每次的记录"""
+    records = []
+    for _ in range(attempts):
+        before = unlocks_finished(system)
+        start = time.perf_counter()
+        success = system.run_once(source='bench')
+        recognized = time.perf_counter()
+
+        if success:
+            deadline = time.monotonic() + unlock_timeout
+            while unlocks_finished(system) == before and time.monotonic() < deadline:
+                time.sleep(0.001)
+        finished = time.perf_counter()
+
+        records.append({
+            'success': bool(success),
+            'recognition_ms': (recognized - start) * 1000,
+            'e2e_ms': (finished - start) * 1000,
+            'timings': dict(system.last_result['timings_ms']) if system.last_result else {}
+        })
+    return records
+
+
+def peak_rss_mb(pid=None):
+    """进程内存峰值(VmHWM)；读不到/proc时退回getrusage"""
+    path = f"/proc/{pid or 'self'}/status"
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid is None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return None
+
+
+def memory_report(system):
+    memory = {'main_peak_mb': peak_rss_mb()}
+    if system.pool is not None:
+        workers = [peak_rss_mb(pid) for pid in getattr(system.pool, '_processes', {}) or {}]
+        workers = [w for w in workers if w is not None]
+        if workers:
+            memory['worker_peak_mb'] = max(workers)
+            memory['workers_total_peak_mb'] = round(sum(workers), 1)
+    return memory
+
+
+# 比较基准时检查的指标：(路径, 越大越差)
+TRACKED = [
+    (('throughput_per_s',), False),
+    (('e2e_ms', 'p50'), True),
+    (('e2e_ms', 'p95'), True),
+    (('e2e_ms', 'p99'), True),
+    (('memory_mb', 'main_peak_mb'), True)
+]
+
+
+def lookup(report, path):
+    value = report
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(report, baseline, threshold, min_delta_ms=1.0):
+    """返回超过阈值的退化列表"""
+    tracked = list(TRACKED)
+    for stage in report.get('stages_ms', {}):
+        tracked.append((('stages_ms', stage, 'p95'), True))
+
+    regressions = []
+    for path, higher_is_worse in tracked:
+        current, base = lookup(report, path), lookup(baseline, path)
+        if current is None or not base:
+            continue
+        change = (current - base) / base
+        worse = change > threshold if higher_is_worse else change < -threshold
+        # 毫秒级以下的波动不算退化
+        if worse and path[0] != 'throughput_per_s' and abs(current - base) < min_delta_ms:
+            worse = False
+        if worse:
+            regressions.append({
+                'metric': '.'.join(path),
+                'baseline': base,
+                'current': current,
+                'change': round(change, 4)
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端基准测试')
+    parser.add_argument('--frames', required=True, help='录制的帧目录（或视频文件），按文件名顺序回放')
+    parser.add_argument('--gallery', help='人脸库目录 <用户名>/xxx.jpg，基准开始前编码成模型')
+    parser.add_argument('--model', help='已训练的模型文件 (face_model.bin)')
+    parser.add_argument('--attempts', type=int, default=30, help='计时的识别次数')
+    parser.add_argument('--warmup', type=int, default=3, help='预热次数（不计入结果）')
+    parser.add_argument('--mode', choices=['burst', 'single'], default='burst',
+                        help='burst=连拍投票（进程池），single=单帧识别')
+    parser.add_argument('--fps', type=float, default=15, help='回放帧率')
+    parser.add_argument('--workers', type=int, default=0, help='识别进程数 (0=按配置)')
+    parser.add_argument('--index', choices=['auto', 'exact', 'prototype', 'ivf'], help='匹配索引')
+    parser.add_argument('--unlock-delay', type=float, default=0.05, help='模拟Mac解锁耗时（秒）')
+    parser.add_argument('--wake-delay', type=float, default=0.2, help='模拟屏幕唤醒耗时（秒）')
+    parser.add_argument('--no-wake', action='store_true', help='关闭预唤醒')
+    parser.add_argument('--output', help='结果写入文件（默认输出到标准输出）')
+    parser.add_argument('--baseline', help='与保存的基准结果比较')
+    parser.add_argument('--threshold', type=float, default=0.10, help='退化阈值（相对变化）')
+    parser.add_argument('--save-baseline', help='把本次结果保存为基准')
+    args = parser.parse_args()
+
+    if not args.gallery and not args.model:
+        parser.error('需要 --gallery 或 --model')
+    if not os.path.exists(args.frames):
+        print(f"✗ 帧目录不存在: {args.frames}", file=sys.stderr)
+        return 1
+
+    workdir = tempfile.mkdtemp(prefix='bench_e2e_')
+    server = StubMacServer(port=0, unlock_delay=args.unlock_delay, wake_delay=args.wake_delay).start()
+
+    # 系统初始化和识别过程的输出转到标准错误，标准输出只留JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        model_path = args.model
+        if args.gallery:
+            model_path = os.path.join(workdir, 'face_model.bin')
+            count = build_gallery(args.gallery, model_path)
+            if not count:
+                print(f"✗ 人脸库中没有可用的人脸: {args.gallery}")
+                server.stop()
+                return 1
+            print(f"✓ 人脸库: {count} 个编码")
+
+        system = FaceUnlockSystem(make_config(args, workdir, server.port), model_path)
+        try:
+            run_attempts(system, args.warmup)
+            wall_start = time.perf_counter()
+            records = run_attempts(system, args.attempts)
+            wall = time.perf_counter() - wall_start
+            memory = memory_report(system)
+        finally:
+            system.close()
+            server.stop()
+
+    stages = {}
+    for record in records:
+        for stage, ms in record['timings'].items():
+            stages.setdefault(stage, []).append(ms)
+
+    report = {
+        'config': {
+            'frames': args.frames,
+            'gallery': args.gallery,
+            'model': args.model,
+            'mode': args.mode,
+            'attempts': args.attempts,
+            'fps': args.fps,
+            'workers': system.pool_workers if system.pool is not None else 0,
+            'unlock_delay': args.unlock_delay,
+            'wake_delay': args.wake_delay,
+            'speculative_wake': not args.no_wake
+        },
+        'attempts': len(records),
+        'successes': sum(r['success'] for r in records),
+        'wall_s': round(wall, 3),
+        'throughput_per_s': round(len(records) / wall, 3) if wall > 0 else 0.0,
+        'e2e_ms': percentiles([r['e2e_ms'] for r in records]),
+        'recognition_ms': percentiles([r['recognition_ms'] for r in records]),
+        'stages_ms': {stage: percentiles(values) for stage, values in sorted(stages.items())},
+        'memory_mb': memory,
+        'mac_server': dict(server.counters)
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report['baseline'] = {'path': args.baseline, 'threshold': args.threshold,
+                              'regressions': regressions}
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(text + '\n')
+        print(f"✓ 基准结果已保存: {args.save_baseline}", file=sys.stderr)
+
+    for item in regressions:
+        print(f"✗ 退化: {item['metric']} {item['baseline']} -> {item['current']} "
+              f"({item['change']:+.1%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+启动时间基准测试 - 各子命令从启动到第一行输出的时间，以及是否导入了重量级库
+Startup benchmark - time-to-first-output per CLI subcommand and heavy-import check
+
+每个命令在新进程中运行多次（python3 run.py <命令>），取第一字节输出时间的中位数；
+同时用 -X importtime 检查 config/stats/status/--help 是否导入了 face_recognition、dlib、
+numpy、OpenCV。超出预算或导入了重量级库时以非零退出码结束。
+
+用法:
+  python3 benchmarks/bench_startup.py
+  python3 benchmarks/bench_startup.py --budget-ms 300 --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 不需要识别库的命令
+LIGHT_COMMANDS = [
+    ['--help'],
+    ['config'],
+    ['stats'],
+    ['status'],
+]
+HEAVY_MODULES = ('face_recognition', 'dlib', 'numpy', 'cv2', 'requests')
+
+
+def first_output_ms(command):
+    """启动进程，返回收到第一字节输出的时间(ms)和退出码"""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'run.py'] + command, cwd=ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    proc.stdout.read(1)
+    elapsed = (time.perf_counter() - start) * 1000
+    proc.stdout.read()
+    return elapsed, proc.wait()
+
+
+def python_startup_ms():
+    """解释器本身的启动时间，作为参照"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'])
+    return (time.perf_counter() - start) * 1000
+
+
+def heavy_imports(command):
+    """-X importtime 输出中出现的重量级顶层模块"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'run.py'] + command, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    found = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        name = line.rsplit('|', 1)[-1].strip().split('.')[0]
+        if name in HEAVY_MODULES:
+            found.add(name)
+    return sorted(found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动时间基准测试')
+    parser.add_argument('--runs', type=int, default=5, help='每个命令运行次数')
+    parser.add_argument('--budget-ms', type=float, default=400, help='第一行输出的时间预算(ms)')
+    args = parser.parse_args()
+
+    baseline = statistics.median(python_startup_ms() for _ in range(args.runs))
+
+    results = []
+    failures = []
+    for command in LIGHT_COMMANDS:
+        samples = [first_output_ms(command)[0] for _ in range(args.runs)]
+        median = statistics.median(samples)
+        heavy = heavy_imports(command)
+        results.append({
+            'command': ' '.join(command),
+            'first_output_ms': round(median, 1),
+            'max_ms': round(max(samples), 1),
+            'heavy_imports': heavy
+        })
+        if median > args.budget_ms:
+            failures.append(f"{' '.join(command)}: {median:.0f}ms > {args.budget_ms:.0f}ms")
+        if heavy:
+            failures.append(f"{' '.join(command)}: 导入了 {', '.join(heavy)}")
+
+    print(json.dumps({
+        'python_startup_ms': round(baseline, 1),
+        'budget_ms': args.budget_ms,
+        'commands': results
+    }, indent=2, ensure_ascii=False))
+
+    for failure in failures:
+        print(f"✗ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
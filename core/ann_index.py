@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+近似最近邻索引 - 倒排文件 (IVF)
+Approximate nearest-neighbour index - inverted file (IVF) in numpy
+
+编码先按粗聚类中心分桶，查询时只扫描最近的 nprobe 个桶。
+nprobe 越大召回越高、耗时越长；nprobe == nlist 时等价于精确匹配。
+新用户注册时可以直接 add() 追加编码，不需要重新聚类。
+"""
+import os
+
+import numpy as np
+
+from matcher import MatchResult, kmeans, pairwise_distances
+
+
+class IVFIndex:
+    """IVF近似最近邻索引"""
+
+    def __init__(self, centroids, nprobe=8):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        self.nprobe = nprobe
+
+        dim = self.centroids.shape[1]
+        # 按桶连续排列的编码（与faiss的invlists类似）
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.sq_norms = np.empty(0, dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.names = np.empty(0, dtype=object)
+        self.offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+
+        # add()追加的编码先放在这里，下次查询前合并
+        self.pending = []
+        self.trained_size = 0
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.ids) + sum(len(p[1]) for p in self.pending)
+
+    @classmethod
+    def build(cls, encodings, names, nlist=0, nprobe=8, sample_size=20000, seed=0):
+        """聚类并建立索引；nlist<=0时按 4*sqrt(N) 自动选择"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(len(names), -1)
+        if nlist <= 0:
+            nlist = max(1, int(4 * np.sqrt(len(encodings))))
+        nlist = min(nlist, len(encodings))
+
+        # 粗聚类只用采样数据训练
+        rng = np.random.default_rng(seed)
+        sample = encodings
+        if len(encodings) > sample_size:
+            sample = encodings[rng.choice(len(encodings), sample_size, replace=False)]
+
+        index = cls(kmeans(sample, nlist, iterations=10, seed=seed), nprobe)
+        index.add(encodings, names, np.arange(len(encodings)))
+        index.compact()
+        index.trained_size = len(index)
+        return index
+
+    def assign(self, encodings):
+        """每个编码所属的桶"""
+        return pairwise_distances(encodings, self.centroids, self.centroid_norms).argmin(axis=1)
+
+    def add(self, encodings, names, ids=None):
+        """增量插入编码（例如新注册的用户）"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(len(names), -1)
+        if ids is None:
+            start = int(self.ids.max()) + 1 if len(self.ids) else 0
+            start = max([start] + [int(p[2].max()) + 1 for p in self.pending if len(p[2])])
+            ids = np.arange(start, start + len(encodings))
+        self.pending.append((encodings, np.array(names, dtype=object), np.asarray(ids, dtype=np.int64)))
+
+    def compact(self):
+        """把待合并的编码写入按桶排列的连续数组"""
+        if not self.pending:
+            return
+
+        vectors = np.concatenate([self.vectors] + [p[0] for p in self.pending])
+        names = np.concatenate([self.names] + [p[1] for p in self.pending])
+        ids = np.concatenate([self.ids] + [p[2] for p in self.pending])
+        self.pending = []
+
+        cells = self.assign(vectors)
+        order = np.argsort(cells, kind='stable')
+        self.vectors = np.ascontiguousarray(vectors[order])
+        self.sq_norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self.names = names[order]
+        self.ids = ids[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(cells, minlength=self.nlist))))
+
+    def needs_rebuild(self, growth=2.0):
+        """增量插入过多后，聚类中心可能不再代表数据分布"""
+        return self.trained_size > 0 and len(self) > self.trained_size * growth
+
+    def search(self, query, nprobe=None):
+        """单个查询：返回被扫描编码的 (距离, 行号)；索引非空时至少扫描到一个编码"""
+        self.compact()
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        coarse = pairwise_distances(query, self.centroids, self.centroid_norms)[0]
+        cells = np.argpartition(coarse, nprobe - 1)[:nprobe]
+        rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells])
+        if len(rows) == 0:
+            # 最近的几个桶都是空的（增量插入或聚类不均时会出现）：改为扫描最近的nprobe个非空桶
+            sizes = np.diff(self.offsets)
+            cells = [c for c in np.argsort(coarse) if sizes[c] > 0][:nprobe]
+            rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells]
+                                  or [np.empty(0, dtype=np.int64)])
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.float32), rows
+
+        distances = pairwise_distances(query, self.vectors[rows], self.sq_norms[rows])[0]
+        return distances, rows
+
+    def match(self, queries, tolerance=None, nprobe=None):
+        """批量匹配，结果格式与EncodingMatcher.match相同：每个查询一个结果，与输入顺序对应"""
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        if len(queries) == 0 or len(self) == 0:
+            return []
+
+        results = []
+        for query in queries:
+            distances, rows = self.search(query, nprobe)
+
+            best = int(distances.argmin())
+            name = self.names[rows[best]]
+            others = distances[self.names[rows] != name]
+            runner_up = float(others.min()) if len(others) else float('inf')
+
+            results.append(MatchResult(
+                int(self.ids[rows[best]]), name, float(distances[best]),
+                runner_up - float(distances[best])
+            ))
+        return results
+
+    def save(self, path):
+        """保存索引（原子替换）"""
+        self.compact()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                vectors=self.vectors,
+                ids=self.ids,
+                names=self.names.astype(str),
+                offsets=self.offsets,
+                trained_size=np.array(self.trained_size)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, nprobe=8):
+        """加载索引"""
+        with np.load(path) as data:
+            index = cls(data['centroids'], nprobe)
+            index.vectors = np.ascontiguousarray(data['vectors'])
+            index.sq_norms = np.einsum('ij,ij->i', index.vectors, index.vectors)
+            index.ids = data['ids']
+            index.names = data['names'].astype(object)
+            index.offsets = data['offsets']
+            index.trained_size = int(data['trained_size'])
+        return index
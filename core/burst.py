@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+连拍投票识别 - 多帧并行编码，K/N帧一致即提前结束
+Burst recognition - encode several frames in parallel, stop once K of N agree
+
+单帧识别遇到模糊或闭眼的一帧就失败，用户要再等一个check_interval。
+连拍模式从常驻相机连续取N个不同的帧，交给进程池（workers.py）并行检测+编码，
+每帧按与单帧完全相同的规则判定，只要有K帧判定为同一用户就立即返回，
+剩余的帧直接取消。
+阈值本身不降低，只是给了每次尝试多个机会。
+
+所有进程都在忙时继续读取新帧，只保留质量评分最高的一帧，
+有进程空闲时提交它，因此送去编码的总是这段时间内最好的帧。
+剩余帧已不可能凑够K票时立即停止，不再提交新帧。
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from workers import detect_and_encode
+
+
+class BurstVoter:
+    """逐帧累计判定结果，某个用户达到K票即胜出"""
+
+    def __init__(self, frames, agree):
+        self.frames = frames
+        self.agree = agree
+        self.processed = 0
+        self.votes = {}
+        self.winner = None
+        # 质量门限的拒绝原因 -> 次数（整帧拒绝和子进程中的人脸拒绝）
+        self.rejections = {}
+
+    def reject(self, reason):
+        """记录一次质量拒绝（不计入已处理帧）"""
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+
+    def add(self, result):
+        """加入一帧的判定结果（None表示该帧未识别）"""
+        self.processed += 1
+        if result is None:
+            return self.winner
+
+        self.votes.setdefault(result['name'], []).append(result)
+        if self.winner is None and len(self.votes[result['name']]) >= self.agree:
+            self.winner = result['name']
+        return self.winner
+
+    @property
+    def hopeless(self):
+        """剩余帧全部投给票数最多的用户也无法达到K票"""
+        best = max((len(v) for v in self.votes.values()), default=0)
+        return best + (self.frames - self.processed) < self.agree
+
+    def fused(self):
+        """融合胜出用户的各帧结果：平均距离，最小间隔"""
+        if self.winner is None:
+            return None
+        results = self.votes[self.winner]
+        distance = sum(r['distance'] for r in results) / len(results)
+        return {
+            'name': self.winner,
+            'confidence': 1 - distance,
+            'distance': distance,
+            'margin': min(r['margin'] for r in results),
+            'votes': len(results),
+            'frames': self.processed
+        }
+
+
+class BurstRecognizer:
+    """在共享进程池上投票识别"""
+
+    def __init__(self, pool, workers=2, frames=5, agree=2, window=3.0, quality_gate=None):
+        self.pool = pool
+        self.frames = frames
+        self.agree = agree
+        self.window = window
+        self.workers = max(1, workers)
+        # 主进程的质量门限用于选帧评分和汇总子进程的拒绝原因
+        self.quality_gate = quality_gate
+
+        self.stats = {'bursts': 0, 'early_exits': 0, 'frames': 0, 'time_ms': 0.0}
+
+    @classmethod
+    def from_config(cls, pool, workers, recognition_config, quality_gate=None):
+        """从recognition配置创建"""
+        return cls(
+            pool,
+            workers=workers,
+            frames=recognition_config.get('burst_frames', 5),
+            agree=recognition_config.get('burst_agree', 2),
+            window=recognition_config.get('burst_window', 3.0),
+            quality_gate=quality_gate
+        )
+
+    def recognize(self, frames, decide):
+        """
+        对frames（逐个产出RGB帧的迭代器）投票识别。
+        decide(检测框, 编码列表) 在主线程中执行，返回单帧判定结果或None。
+        """
+        start = time.perf_counter()
+        voter = BurstVoter(self.frames, self.agree)
+        pending = set()
+
+        def collect(timeout):
+            if not pending:
+                return
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                try:
+                    locations, encodings, reasons = future.result()
+                except Exception as e:
+                    print(f"⚠ 连拍帧处理失败: {e}")
+                    voter.add(None)
+                    continue
+                for reason in reasons:
+                    voter.reject(reason)
+                if self.quality_gate is not None and (locations or reasons):
+                    self.quality_gate.record_faces(len(locations), reasons)
+                voter.add(decide(locations, encodings))
+
+        submitted = 0
+        candidate = None  # (分数, 帧)
+        source = iter(frames)
+        exhausted = False
+        while voter.winner is None and not voter.hopeless and submitted < self.frames:
+            # 有空闲进程时提交当前最好的候选帧
+            if candidate is not None and len(pending) < self.workers:
+                pending.add(self.pool.submit(detect_and_encode, candidate[1]))
+                candidate = None
+                submitted += 1
+                collect(0)
+                continue
+
+            if exhausted:
+                if candidate is None or not pending:
+                    break
+                collect(None)
+                continue
+
+            frame = next(source, None)
+            if frame is None:
+                exhausted = True
+                continue
+
+            score = 0.0
+            if self.quality_gate is not None:
+                score, reason = self.quality_gate.frame_score(frame)
+                if reason is not None:
+                    voter.reject(reason)
+                    collect(0)
+                    continue
+            if candidate is None or score >= candidate[0]:
+                candidate = (score, frame)
+            collect(0)
+
+        # 已无法凑够K票时提前结束；取帧超时时按实际帧数判断
+        hopeless = voter.hopeless
+        voter.frames = submitted
+        while pending and voter.winner is None and not voter.hopeless:
+            collect(None)
+
+        for future in pending:
+            future.cancel()
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stats['bursts'] += 1
+        self.stats['frames'] += voter.processed
+        self.stats['time_ms'] += elapsed
+        if pending or (hopeless and submitted < self.frames):
+            self.stats['early_exits'] += 1
+
+        result = voter.fused()
+        if result is not None:
+            result['elapsed_ms'] = elapsed
+        return result, voter
+
+    def get_stats(self):
+        """连拍统计"""
+        bursts = self.stats['bursts']
+        return {
+            'bursts': bursts,
+            'early_exits': self.stats['early_exits'],
+            'avg_frames': round(self.stats['frames'] / bursts, 2) if bursts else 0.0,
+            'avg_ms': round(self.stats['time_ms'] / bursts, 1) if bursts else 0.0
+        }
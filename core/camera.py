@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+相机后端 - 常驻取流 / 单次拍照 / 文件回放
+Camera backends - persistent streaming, one-shot capture and file replay
+
+所有后端的 read() 都返回内存中的 RGB numpy 数组 (H, W, 3, uint8)，
+不再经过 /tmp 下的临时JPEG文件。
+"""
+import os
+import subprocess
+import tempfile
+import time
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+try:
+    import cv2
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+try:
+    from picamera2 import Picamera2
+    HAS_PICAMERA2 = True
+except ImportError:
+    HAS_PICAMERA2 = False
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.h264', '.mjpeg')
+
+
+def load_rgb_image(path):
+    """读取图片文件为RGB数组"""
+    if HAS_CV2:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    # 没有OpenCV时退回PIL
+    from PIL import Image
+    with Image.open(path) as img:
+        return np.asarray(img.convert('RGB'))
+
+
+class CameraBackend:
+    """相机后端基类"""
+
+    name = 'base'
+    # 常驻取流的后端可以被后台线程持续读取
+    streaming = False
+
+    def __init__(self, width=1296, height=972):
+        self.width = width
+        self.height = height
+        self.is_open = False
+        # 最近一次读取中JPEG/图片解码的耗时（秒），不需要解码的后端为None
+        self.decode_seconds = None
+
+    def open(self):
+        """打开相机，成功返回True"""
+        self.is_open = True
+        return True
+
+    def read(self):
+        """读取一帧RGB图像，失败返回None"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放相机"""
+        self.is_open = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class Picamera2Camera(CameraBackend):
+    """Picamera2常驻后端 - 传感器保持取流，读帧无需重新启动相机"""
+
+    name = 'picamera2'
+    streaming = True
+
+    def __init__(self, width=1296, height=972, warmup_ms=500, buffer_count=4):
+        super().__init__(width, height)
+        self.warmup_ms = warmup_ms
+        self.buffer_count = buffer_count
+        self.picam2 = None
+
+    def open(self):
+        if not HAS_PICAMERA2:
+            print("✗ picamera2未安装")
+            return False
+
+        try:
+            self.picam2 = Picamera2()
+            # libcamera的"BGR888"在内存中的字节顺序是R,G,B，正好是RGB数组
+            config = self.picam2.create_video_configuration(
+                main={"size": (self.width, self.height), "format": "BGR888"},
+                buffer_count=self.buffer_count
+            )
+            self.picam2.configure(config)
+            self.picam2.start()
+
+            # 自动曝光只在启动时收敛一次，而不是每次拍照都等待
+            if self.warmup_ms > 0:
+                time.sleep(self.warmup_ms / 1000.0)
+
+            self.is_open = True
+            print(f"✓ Picamera2已启动 {self.width}x{self.height}")
+            return True
+
+        except Exception as e:
+            print(f"✗ Picamera2启动失败: {e}")
+            self.close()
+            return False
+
+    def read(self):
+        if not self.is_open:
+            return None
+
+        try:
+            return self.picam2.capture_array("main")
+        except Exception as e:
+            print(f"✗ 读取帧失败: {e}")
+            return None
+
+    def close(self):
+        if self.picam2 is not None:
+            try:
+                self.picam2.stop()
+                self.picam2.close()
+            except Exception:
+                pass
+            self.picam2 = None
+        self.is_open = False
+
+
+class RpicamCamera(CameraBackend):
+    """rpicam-jpeg单次拍照后端 - 每帧启动一个子进程（兼容旧系统）"""
+
+    name = 'rpicam'
+    streaming = False
+
+    def __init__(self, width=1296, height=972, warmup_ms=500, timeout=5):
+        super().__init__(width, height)
+        self.warmup_ms = warmup_ms
+        self.timeout = timeout
+        self.temp_file = os.path.join(tempfile.gettempdir(), 'face_capture.jpg')
+
+    def read(self):
+        cmd = [
+            'rpicam-jpeg',
+            '-o', self.temp_file,
+            '--width', str(self.width),
+            '--height', str(self.height),
+            '-t', str(self.warmup_ms),
+            '-n'  # 不显示预览
+        ]
+
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=self.timeout)
+
+            if result.returncode != 0 or not os.path.exists(self.temp_file):
+                print("✗ 拍照失败")
+                if result.stderr:
+                    print(f"  错误: {result.stderr.decode()}")
+                return None
+
+            start = time.perf_counter()
+            image = load_rgb_image(self.temp_file)
+            self.decode_seconds = time.perf_counter() - start
+            return image
+
+        except subprocess.TimeoutExpired:
+            print("✗ 拍照超时")
+            return None
+        except Exception as e:
+            print(f"✗ 拍照错误: {e}")
+            return None
+        finally:
+            try:
+                os.remove(self.temp_file)
+            except OSError:
+                pass
+
+
+class ReplayCamera(CameraBackend):
+    """文件回放后端 - 从图片目录或视频文件读取帧，用于无相机环境测试和基准测试"""
+
+    name = 'replay'
+    streaming = True
+
+    def __init__(self, source, loop=True, fps=0, preload=True):
+        super().__init__(0, 0)
+        self.source = source
+        self.loop = loop
+        self.fps = fps
+        self.preload = preload
+
+        self.files = []
+        self.frames = []
+        self.video = None
+        self.position = 0
+        self.last_read = 0.0
+
+    def open(self):
+        if not self.source or not os.path.exists(self.source):
+            print(f"✗ 回放源不存在: {self.source}")
+            return False
+
+        if os.path.isdir(self.source):
+            self.files = sorted(
+                os.path.join(self.source, f) for f in os.listdir(self.source)
+                if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not self.files:
+                print(f"✗ 回放目录中没有图片: {self.source}")
+                return False
+
+            # 预先解码，回放时不计入解码耗时
+            if self.preload:
+                self.frames = [f for f in map(load_rgb_image, self.files) if f is not None]
+                if not self.frames:
+                    print("✗ 回放图片解码失败")
+                    return False
+
+            first = self.frames[0] if self.frames else load_rgb_image(self.files[0])
+
+        elif self.source.lower().endswith(VIDEO_EXTENSIONS):
+            if not HAS_CV2:
+                print("✗ 回放视频需要OpenCV")
+                return False
+            self.video = cv2.VideoCapture(self.source)
+            if not self.video.isOpened():
+                print(f"✗ 无法打开视频: {self.source}")
+                return False
+            first = None
+        else:
+            # 单张图片
+            first = load_rgb_image(self.source)
+            if first is None:
+                print(f"✗ 无法读取图片: {self.source}")
+                return False
+            self.frames = [first]
+
+        if first is not None:
+            self.height, self.width = first.shape[:2]
+        else:
+            self.width = int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self.height = int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        self.position = 0
+        self.is_open = True
+        print(f"✓ 回放源已打开: {self.source} ({self.width}x{self.height})")
+        return True
+
+    def _pace(self):
+        """按设定帧率限速，fps<=0时不限速"""
+        if self.fps > 0:
+            wait = self.last_read + 1.0 / self.fps - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self.last_read = time.monotonic()
+
+    def read(self):
+        if not self.is_open:
+            return None
+
+        self._pace()
+
+        if self.video is not None:
+            ok, frame = self.video.read()
+            if not ok and self.loop:
+                self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = self.video.read()
+            if not ok:
+                return None
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        count = len(self.frames) if self.frames else len(self.files)
+        if self.position >= count:
+            if not self.loop:
+                return None
+            self.position = 0
+
+        index = self.position
+        self.position += 1
+
+        if self.frames:
+            return self.frames[index]
+        start = time.perf_counter()
+        image = load_rgb_image(self.files[index])
+        self.decode_seconds = time.perf_counter() - start
+        return image
+
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+        self.frames = []
+        self.is_open = False
+
+
+def create_camera(camera_config):
+    """根据配置创建相机后端"""
+    backend = camera_config.get('backend', 'rpicam')
+    width = camera_config.get('width', 1296)
+    height = camera_config.get('height', 972)
+    warmup_ms = camera_config.get('warmup_ms', 500)
+
+    if backend == 'replay':
+        return ReplayCamera(
+            camera_config.get('replay_path', ''),
+            loop=camera_config.get('replay_loop', True),
+            fps=camera_config.get('replay_fps', 30),
+            preload=camera_config.get('replay_preload', True)
+        )
+
+    if backend == 'picamera2':
+        if HAS_PICAMERA2:
+            return Picamera2Camera(width, height, warmup_ms=warmup_ms)
+        print("⚠ picamera2不可用，退回rpicam-jpeg单次拍照")
+
+    return RpicamCamera(width, height, warmup_ms=warmup_ms)
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+命令行入口 - 非交互子命令，重量级库按需导入
+Command-line entry - headless subcommands with lazy heavy imports
+
+config/stats 只读配置文件和事件日志，不导入face_recognition(dlib)、numpy、OpenCV；
+once/continuous/manual/test 才导入识别系统并打开相机、加载模型。
+识别守护进程(daemon)运行时，once/status/reload 只作为客户端通过Unix套接字请求它。
+不带子命令时进入原来的交互菜单。
+
+用法:
+  python3 run.py daemon          # 常驻识别守护进程（持有相机、模型和Mac连接）
+  python3 run.py once            # 识别一次，成功返回0，失败返回1，
+                                 # 持续监控在激活窗口内未得出结果返回2（可用于脚本）
+  python3 run.py status          # 守护进程状态
+  python3 run.py reload          # 守护进程重新加载模型
+  python3 run.py continuous      # 持续监控（systemd服务用）
+  python3 run.py manual          # 手动触发
+  python3 run.py test            # 相机/模型/Mac服务/完整流程测试
+  python3 run.py config [recognition.tolerance]
+  python3 run.py stats [--json]  # 从事件日志汇总识别统计
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# once 的退出码
+EXIT_SUCCESS = 0
+EXIT_FAILED = 1
+EXIT_QUEUED = 2     # 守护进程在持续监控中，流水线在激活窗口内没有得出识别结果
+
+
+def load_config_file(path):
+    """只读取配置文件（不创建默认配置）"""
+    if not os.path.exists(path):
+        print(f"✗ 配置文件不存在: {path}")
+        print("  复制模板: cp config.template.json config.json")
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        print(f"✗ 配置文件格式错误: {e}")
+        return None
+
+
+def percentile(values, q):
+    """已排序列表的分位数（最近秩）"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def daemon_client(args):
+    """识别守护进程在运行时返回客户端，否则返回None"""
+    from daemon import DaemonClient
+    client = DaemonClient.from_config(args.config)
+    return client if client.available() else None
+
+
+def print_result(result):
+    """打印守护进程返回的识别结果"""
+    if result.get('queued'):
+        print(f"ℹ 已投递到持续监控: {result.get('error')}")
+    elif result.get('success'):
+        print(f"✓ 识别成功: {result['user']} (置信度 {result['confidence']:.2f}, "
+              f"{result['timings_ms'].get('total', 0):.0f}ms)")
+    else:
+        print(f"✗ 识别失败: {result.get('error')}")
+
+
+def create_system(args):
+    """导入识别系统（加载dlib等库）并初始化；守护进程已占用相机时除非指定--local否则返回None"""
+    if daemon_client(args) is not None:
+        if not getattr(args, 'local', False):
+            print("✗ 识别守护进程正在运行，相机和模型已被占用")
+            print("  通过守护进程使用 once/status/reload，或加 --local 强制在本进程中打开相机")
+            return None
+        print("⚠ 识别守护进程正在运行，仍在本进程中打开相机 (--local)")
+    print("加载识别库...", flush=True)
+    start = time.perf_counter()
+    from main import FaceUnlockSystem
+    print(f"✓ 识别库加载完成 ({time.perf_counter() - start:.1f}秒)")
+    return FaceUnlockSystem(args.config, args.model)
+
+
+def cmd_once(args):
+    """识别一次（守护进程运行时由它识别）"""
+    client = None if args.local else daemon_client(args)
+    if client is not None:
+        from daemon import DaemonError
+        try:
+            result = client.recognize(source=args.source)
+        except DaemonError as e:
+            print(f"✗ {e}")
+            return 1
+        print_result(result)
+        if result.get('queued'):
+            return EXIT_QUEUED
+        return EXIT_SUCCESS if result.get('success') else EXIT_FAILED
+
+    system = create_system(args)
+    if system is None:
+        return EXIT_FAILED
+    try:
+        success = system.run_once(source=args.source)
+    finally:
+        system.close()
+    return EXIT_SUCCESS if success else EXIT_FAILED
+
+
+def cmd_continuous(args):
+    """持续监控"""
+    system = create_system(args)
+    if system is None:
+        return 1
+    system.run_continuous()
+    return 0
+
+
+def cmd_manual(args):
+    """手动触发"""
+    system = create_system(args)
+    if system is None:
+        return 1
+    system.run_manual()
+    return 0
+
+
+def cmd_test(args):
+    """测试模式"""
+    system = create_system(args)
+    if system is None:
+        return 1
+    try:
+        system.run_test()
+    finally:
+        system.close()
+    return 0
+
+
+def cmd_daemon(args):
+    """运行识别守护进程"""
+    import signal
+    from daemon import serve
+
+    system = create_system(args)
+    if system is None:
+        return 1
+    # systemd停止服务时发送SIGTERM，与Ctrl+C一样正常关闭
+    signal.signal(signal.SIGTERM, system.signal_handler)
+    serve(system, continuous=args.continuous)
+    return 0
+
+
+def cmd_status(args):
+    """守护进程状态"""
+    client = daemon_client(args)
+    if client is None:
+        print("ℹ 识别守护进程未运行 (python3 run.py daemon)")
+        return 1
+    status = client.call('status', check_mac=args.check_mac)
+    if args.json:
+        print(json.dumps(status, indent=2, ensure_ascii=False))
+        return 0
+
+    print(f"✓ 识别守护进程运行中 (pid {status['pid']}, 已运行 {status['uptime_s']:.0f}秒)")
+    print(f"  相机: {status['camera']}  {'持续监控' if status['continuous'] else '按需识别'}")
+    print(f"  授权用户: {', '.join(status['users'])}  人脸数据: {status['encodings']} 个")
+    if 'mac_ok' in status:
+        print(f"  Mac服务: {'正常' if status['mac_ok'] else '未响应'}")
+    if status['last_result']:
+        print(f"  最近一次识别 ({status['last_result']['time']}):")
+        print_result(status['last_result'])
+    return 0
+
+
+def cmd_reload(args):
+    """守护进程重新加载模型"""
+    client = daemon_client(args)
+    if client is None:
+        print("ℹ 识别守护进程未运行")
+        return 1
+    from daemon import DaemonError
+    try:
+        response = client.call('reload')
+    except DaemonError as e:
+        print(f"✗ {e}")
+        return 1
+    print(f"✓ 模型已重新加载: {', '.join(response['users'])} ({response['encodings']} 个编码)")
+    return 0
+
+
+def cmd_config(args):
+    """显示配置（或其中一项）"""
+    config = load_config_file(args.config)
+    if config is None:
+        return 1
+
+    value = config
+    if args.key:
+        for part in args.key.split('.'):
+            if not isinstance(value, dict) or part not in value:
+                print(f"✗ 配置项不存在: {args.key}")
+                return 1
+            value = value[part]
+
+    if isinstance(value, (dict, list)):
+        print(json.dumps(value, indent=2, ensure_ascii=False))
+    else:
+        print(value)
+    return 0
+
+
+def summarize(records):
+    """汇总识别记录：次数、成功率、按触发源/用户、阶段耗时分位数"""
+    summary = {
+        'attempts': 0,
+        'successful': 0,
+        'failed': 0,
+        'first': None,
+        'last': None,
+        'by_source': {},
+        'by_user': {},
+        'timings_ms': {}
+    }
+    timings = {}
+    for record in records:
+        success = record.get('outcome') == 'success'
+        summary['attempts'] += 1
+        summary['successful' if success else 'failed'] += 1
+        summary['first'] = summary['first'] or record.get('ts')
+        summary['last'] = record.get('ts')
+
+        source = summary['by_source'].setdefault(record.get('source') or 'unknown',
+                                                 {'attempts': 0, 'successful': 0})
+        source['attempts'] += 1
+        source['successful'] += success
+        if success and record.get('user'):
+            summary['by_user'][record['user']] = summary['by_user'].get(record['user'], 0) + 1
+
+        for stage, ms in (record.get('timings_ms') or {}).items():
+            timings.setdefault(stage, []).append(ms)
+
+    for stage, values in timings.items():
+        values.sort()
+        summary['timings_ms'][stage] = {
+            'count': len(values),
+            'p50': round(percentile(values, 50), 1),
+            'p95': round(percentile(values, 95), 1)
+        }
+    total = summary['attempts']
+    summary['success_rate'] = round(summary['successful'] / total, 4) if total else 0.0
+    return summary
+
+
+def cmd_stats(args):
+    """从事件日志汇总识别统计（不需要运行中的系统）"""
+    from event_log import EventLog
+
+    config = load_config_file(args.config) or {}
+    system_config = dict(config.get('system', {}))
+    if args.log_dir:
+        system_config['log_dir'] = args.log_dir
+    log = EventLog.from_config(system_config)
+    if not log.files():
+        print(f"ℹ 没有事件日志: {log.path}")
+        return 0
+
+    summary = summarize(log.read('recognition'))
+    unlocks = {'succeeded': 0, 'failed': 0}
+    for record in log.read('mac_unlock'):
+        unlocks['succeeded' if record.get('success') else 'failed'] += 1
+    summary['mac_unlock'] = unlocks
+
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+        return 0
+
+    print("\n" + "="*40)
+    print("📊 统计信息（事件日志）")
+    print("-"*40)
+    if summary['attempts']:
+        print(f"时间范围: {summary['first']} ~ {summary['last']}")
+    print(f"总尝试: {summary['attempts']}")
+    print(f"成功: {summary['successful']}")
+    print(f"失败: {summary['failed']}")
+    print(f"成功率: {summary['success_rate']:.1%}")
+    for source, stats in sorted(summary['by_source'].items()):
+        print(f"触发[{source}]: {stats['attempts']} 次  成功 {stats['successful']}")
+    if summary['by_user']:
+        print("用户: " + '  '.join(f"{user} {count}" for user, count in
+                                   sorted(summary['by_user'].items(), key=lambda item: -item[1])))
+    for stage, stats in summary['timings_ms'].items():
+        print(f"耗时[{stage}]: p50 {stats['p50']:.0f}ms  p95 {stats['p95']:.0f}ms")
+    if unlocks['succeeded'] or unlocks['failed']:
+        print(f"Mac解锁: 成功 {unlocks['succeeded']}  失败 {unlocks['failed']}")
+    print("="*40)
+    return 0
+
+
+def cmd_menu(args):
+    """交互菜单（不带子命令时）"""
+    print("加载识别库...", flush=True)
+    from main import main as menu
+    return menu(args.config, args.model)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='run.py', description='人脸识别解锁系统')
+    parser.add_argument('--config', default='config.json', help='配置文件 (默认 config.json)')
+    parser.add_argument('--model', help='模型文件 (默认 models/face_model.bin)')
+    parser.set_defaults(func=cmd_menu)
+    commands = parser.add_subparsers(title='命令', metavar='<命令>')
+
+    daemon = commands.add_parser('daemon', help='常驻识别守护进程')
+    daemon.add_argument('--continuous', action='store_true', help='同时运行持续监控')
+    daemon.set_defaults(func=cmd_daemon)
+
+    once = commands.add_parser('once', help='识别一次，成功返回0，失败返回1，只投递未识别返回2')
+    once.add_argument('--source', default='manual', help='记录到事件日志的触发来源')
+    once.add_argument('--local', action='store_true', help='不使用守护进程，在本进程中识别')
+    once.set_defaults(func=cmd_once)
+
+    status = commands.add_parser('status', help='守护进程状态')
+    status.add_argument('--check-mac', action='store_true', help='同时检查Mac服务')
+    status.add_argument('--json', action='store_true', help='以JSON输出')
+    status.set_defaults(func=cmd_status)
+
+    commands.add_parser('reload', help='守护进程重新加载模型').set_defaults(func=cmd_reload)
+
+    for name, func, text in (('continuous', cmd_continuous, '持续监控'),
+                             ('manual', cmd_manual, '手动触发（交互）'),
+                             ('test', cmd_test, '相机、模型、Mac服务和完整流程测试')):
+        command = commands.add_parser(name, help=text)
+        command.add_argument('--local', action='store_true', help='守护进程运行时仍在本进程中打开相机')
+        command.set_defaults(func=func)
+
+    config = commands.add_parser('config', help='显示配置')
+    config.add_argument('key', nargs='?', help='只显示某一项，例如 recognition.tolerance')
+    config.set_defaults(func=cmd_config)
+
+    stats = commands.add_parser('stats', help='从事件日志汇总识别统计')
+    stats.add_argument('--log-dir', help='日志目录 (默认取配置中的system.log_dir)')
+    stats.add_argument('--json', action='store_true', help='以JSON输出')
+    stats.set_defaults(func=cmd_stats)
+    return parser
+
+
+def main(argv=None):
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
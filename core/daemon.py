@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+识别守护进程 - 一个常驻进程持有相机、模型和Mac解锁连接，通过Unix套接字提供识别
+Recognition daemon - one resident process owns the camera, model and unlock client over a Unix socket
+
+协议: 每行一个JSON请求 {"op": ..., 参数...}，每行一个JSON响应 {"ok": true/false, ...}。
+  ping       存活检查
+  recognize  识别一次（source=触发来源，wait=是否等待结果，timeout=等待秒数）；
+             识别进行中时再次请求合并到同一次识别
+  status     运行状态和最近一次结果（check_mac=true 时同时检查Mac服务）
+  stats      统计（prometheus=true 时附带/metrics文本）
+  reload     重新加载模型文件（等进行中的识别结束后替换）
+
+客户端（run.py、web_trigger.py、按钮回调）只依赖标准库，
+不加载dlib和模型，连接和请求在毫秒级完成。
+套接字放在只有当前用户可访问的目录(0700)中，绑定后再改为0600。
+"""
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+
+# core目录下的模块（从仓库根目录导入core.daemon时同样可用）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from jobs import JobManager
+
+
+# 每个用户私有的运行目录。不用$XDG_RUNTIME_DIR：systemd系统服务中没有这个变量，
+# 守护进程和客户端会算出不同的路径
+DEFAULT_SOCKET_DIR = f"/tmp/face_unlock-{os.getuid()}"
+DEFAULT_SOCKET_PATH = os.path.join(DEFAULT_SOCKET_DIR, 'daemon.sock')
+
+
+def socket_path(config_path='config.json'):
+    """从配置文件读取套接字路径（daemon.socket），读不到时用默认路径"""
+    try:
+        with open(config_path) as f:
+            return json.load(f).get('daemon', {}).get('socket') or DEFAULT_SOCKET_PATH
+    except (OSError, ValueError):
+        return DEFAULT_SOCKET_PATH
+
+
+def private_dir(directory):
+    """创建（或检查）只有当前用户可访问的目录；被他人抢先创建或权限过宽时报错"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"套接字目录不安全（须为当前用户所有且权限为0700）: {directory}")
+
+
+class DaemonError(Exception):
+    """守护进程不可用或返回错误"""
+
+
+class DaemonClient:
+    """守护进程客户端（只用标准库）"""
+
+    def __init__(self, path=DEFAULT_SOCKET_PATH, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+
+    @classmethod
+    def from_config(cls, config_path='config.json', timeout=30.0):
+        return cls(socket_path(config_path), timeout)
+
+    def call(self, op, timeout=None, **params):
+        """发送一个请求并返回响应字典；连接失败或守护进程报错时抛出DaemonError"""
+        request = dict(params, op=op)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout or self.timeout)
+                sock.connect(self.path)
+                sock.sendall(json.dumps(request).encode() + b'\n')
+                with sock.makefile('rb') as f:
+                    line = f.readline()
+        except OSError as e:
+            raise DaemonError(f"无法连接识别守护进程 ({self.path}): {e}")
+
+        if not line:
+            raise DaemonError("识别守护进程关闭了连接")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise DaemonError(response.get('error', '未知错误'))
+        return response
+
+    def available(self):
+        """守护进程是否在运行"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            self.call('ping', timeout=1.0)
+            return True
+        except DaemonError:
+            return False
+
+    def recognize(self, source='client', timeout=30.0):
+        """识别一次并等待结果，返回最近一次识别结果字典（与last_result相同）"""
+        response = self.call('recognize', timeout=timeout + 5.0, source=source, wait=True,
+                             wait_timeout=timeout)
+        job = response['job']
+        if job['state'] == 'error':
+            raise DaemonError(job['error'])
+        return job['result']
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """一个连接上可以连续发送多个请求"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = self.server.daemon.dispatch(request)
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            try:
+                self.wfile.write(json.dumps(response, ensure_ascii=False, default=str).encode() + b'\n')
+            except OSError:
+                return
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class RecognitionDaemon:
+    """识别守护进程：一个FaceUnlockSystem，多个客户端"""
+
+    def __init__(self, system, path=DEFAULT_SOCKET_PATH):
+        self.system = system
+        self.path = path
+        # 识别和重新加载模型互斥
+        self.lock = threading.Lock()
+        self.jobs = JobManager(self._recognize)
+        self.server = None
+        self.started = time.time()
+        self.requests = {}
+
+    @classmethod
+    def from_config(cls, system):
+        return cls(system, system.config.get('daemon', {}).get('socket') or DEFAULT_SOCKET_PATH)
+
+    def _recognize(self, source='daemon'):
+        with self.lock:
+            previous = self.system.last_result
+            if self.system.trigger(source) is None and self.system.scheduler is not None:
+                # 持续监控运行中：已投递到事件调度器，等流水线在激活窗口内给出结果
+                return self._wait_decision(source, previous)
+            return self.system.last_result
+
+    def _wait_decision(self, source, previous, poll=0.05):
+        """等待持续监控得出下一个识别结果；窗口内没有结果（例如画面中没有人脸）时返回queued"""
+        window = self.system.config.get('events', {}).get('active_window', 5.0)
+        deadline = time.monotonic() + window + 1.0
+        while time.monotonic() < deadline:
+            result = self.system.last_result
+            if result is not previous and result is not None:
+                return result
+            time.sleep(poll)
+        return {'source': source, 'queued': True, 'success': False,
+                'error': f"持续监控在 {window:.0f} 秒内没有得出结果"}
+
+    def _prepare_path(self):
+        """清理上次异常退出留下的套接字文件；已有守护进程在运行时报错"""
+        if not os.path.exists(self.path):
+            return
+        if DaemonClient(self.path).available():
+            raise RuntimeError(f"识别守护进程已在运行: {self.path}")
+        os.unlink(self.path)
+
+    def start(self):
+        """在后台线程中开始服务"""
+        # 套接字总是放在私有目录中：目录是0700，绑定到chmod之间其他用户也无法连接。
+        # 不改umask：相机、日志等线程已在运行，umask是整个进程共享的
+        private_dir(os.path.dirname(os.path.abspath(self.path)))
+        self._prepare_path()
+        self.server = _Server(self.path, _Handler)
+        os.chmod(self.path, 0o600)
+        self.server.daemon = self
+        threading.Thread(target=self.server.serve_forever, name='daemon-server', daemon=True).start()
+        print(f"✓ 识别守护进程: {self.path}")
+        return self
+
+    def stop(self):
+        """停止服务并删除套接字文件"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def dispatch(self, request):
+        """处理一个请求，返回响应字典"""
+        op = request.get('op')
+        handler = getattr(self, f"op_{op}", None)
+        if handler is None:
+            return {'ok': False, 'error': f"未知操作: {op}"}
+        self.requests[op] = self.requests.get(op, 0) + 1
+        return handler(request)
+
+    def op_ping(self, request):
+        return {'ok': True, 'pid': os.getpid()}
+
+    def op_recognize(self, request):
+        job, coalesced = self.jobs.submit(source=request.get('source') or 'daemon')
+        if request.get('wait', True):
+            self.jobs.wait_finished(job, float(request.get('wait_timeout', 30.0)))
+        return {'ok': True, 'coalesced': coalesced, 'job': job.as_dict()}
+
+    def op_status(self, request):
+        system = self.system
+        status = {
+            'ok': True,
+            'pid': os.getpid(),
+            'uptime_s': round(time.time() - self.started, 1),
+            'busy': self.jobs.busy,
+            'camera': system.camera.name,
+            'continuous': system.scheduler is not None,
+            'users': system.model.get('users', []),
+            'encodings': len(system.matcher),
+            'mac_enabled': system.mac is not None,
+            'last_result': system.last_result
+        }
+        if request.get('check_mac'):
+            status['mac_ok'] = system.check_mac_service()
+        return status
+
+    def op_stats(self, request):
+        system = self.system
+        stats = {
+            'ok': True,
+            'attempts': dict(system.stats, start_time=system.stats['start_time'].isoformat()),
+            'jobs': self.jobs.get_stats(),
+            'requests': dict(self.requests),
+            'capture': system.capture_thread.get_stats() if system.capture_thread else None,
+            'mac': system.mac.get_stats() if system.mac else None,
+            'quality': system.quality.get_stats() if system.quality else None,
+            'tracking': system.tracker.get_stats() if system.tracker else None,
+            'event_log': system.event_log.get_stats()
+        }
+        if request.get('prometheus'):
+            stats['prometheus'] = system.metrics.render()
+        return stats
+
+    def op_reload(self, request):
+        with self.lock:
+            success = self.system.reload_model()
+        return {
+            'ok': success,
+            'error': None if success else '模型加载失败，继续使用原模型',
+            'users': self.system.model.get('users', []),
+            'encodings': len(self.system.matcher)
+        }
+
+
+def serve(system, continuous=False):
+    """运行守护进程直到收到退出信号；continuous=True 时同时运行持续监控"""
+    daemon = RecognitionDaemon.from_config(system).start()
+    try:
+        if continuous:
+            system.run_continuous()
+        else:
+            print("等待客户端请求，按 Ctrl+C 停止\n")
+            threading.Event().wait()
+    finally:
+        daemon.stop()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+人脸检测 - 缩小图检测 + 原图编码
+Face detection - detect on a downscaled copy, encode at full resolution
+
+HOG检测的耗时与像素数成正比，在缩小的图上检测可以快数倍；
+检测框再按比例放大回原图，关键点和128维编码仍在原图上计算，
+因此编码精度不受缩放影响。
+"""
+import time
+
+import numpy as np
+
+try:
+    import face_recognition
+    HAS_FACE_RECOGNITION = True
+except ImportError:
+    HAS_FACE_RECOGNITION = False
+
+try:
+    import cv2
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+
+def downscale(image, scale):
+    """按比例缩小图片"""
+    if scale >= 1.0:
+        return image
+
+    if HAS_CV2:
+        return cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    # 没有OpenCV时按整数步长抽样
+    step = max(1, int(round(1.0 / scale)))
+    return np.ascontiguousarray(image[::step, ::step])
+
+
+def rescale_locations(locations, scale_y, scale_x, shape):
+    """把缩小图上的检测框 (top, right, bottom, left) 换算回原图坐标"""
+    height, width = shape[:2]
+    rescaled = []
+    for top, right, bottom, left in locations:
+        rescaled.append((
+            max(0, int(round(top / scale_y))),
+            min(width, int(round(right / scale_x))),
+            min(height, int(round(bottom / scale_y))),
+            max(0, int(round(left / scale_x)))
+        ))
+    return rescaled
+
+
+class FaceDetector:
+    """两级分辨率的人脸检测与编码"""
+
+    def __init__(self, scale=0.5, upsample=1, model='hog', num_jitters=1):
+        self.scale = scale
+        self.upsample = upsample
+        self.model = model
+        self.num_jitters = num_jitters
+
+    @classmethod
+    def from_config(cls, recognition_config):
+        """从recognition配置创建"""
+        return cls(
+            scale=recognition_config.get('detect_scale', 0.5),
+            upsample=recognition_config.get('detect_upsample', 1),
+            model=recognition_config.get('detect_model', 'hog')
+        )
+
+    def detect(self, image):
+        """检测人脸，返回原图坐标下的检测框"""
+        small = downscale(image, self.scale)
+        locations = face_recognition.face_locations(
+            small, number_of_times_to_upsample=self.upsample, model=self.model
+        )
+        if small is image:
+            return locations
+
+        # 实际缩放比例（抽样时与设定值可能略有不同）
+        scale_y = small.shape[0] / image.shape[0]
+        scale_x = small.shape[1] / image.shape[1]
+        return rescale_locations(locations, scale_y, scale_x, image.shape)
+
+    def encode(self, image, locations):
+        """在原图上计算关键点和编码"""
+        if not locations:
+            return []
+        return face_recognition.face_encodings(image, locations, num_jitters=self.num_jitters)
+
+
+def small_gray(image, width):
+    """缩小并转为灰度，供前置过滤使用"""
+    scale = min(1.0, width / image.shape[1])
+    small = downscale(image, scale)
+    if small.ndim == 2:
+        return small
+    if HAS_CV2:
+        return cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    # ITU-R BT.601 亮度
+    return (small @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).astype(np.uint8)
+
+
+class StageStats:
+    """单个过滤阶段的命中率和耗时"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.hits = 0
+        self.time_ms = 0.0
+
+    def record(self, hit, elapsed):
+        self.calls += 1
+        self.hits += int(hit)
+        self.time_ms += elapsed * 1000
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'hits': self.hits,
+            'hit_rate': round(self.hits / self.calls, 3) if self.calls else 0.0,
+            'avg_ms': round(self.time_ms / self.calls, 2) if self.calls else 0.0,
+            'total_ms': round(self.time_ms, 1)
+        }
+
+
+class MotionGate:
+    """第一级：帧差运动检测"""
+
+    def __init__(self, width=160, pixel_threshold=25, min_changed_ratio=0.002):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.previous = None
+
+    def check(self, gray):
+        """与上一帧相比，变化像素比例超过阈值时触发"""
+        previous, self.previous = self.previous, gray
+        if previous is None or previous.shape != gray.shape:
+            return True
+
+        if HAS_CV2:
+            diff = cv2.absdiff(gray, previous)
+        else:
+            diff = np.abs(gray.astype(np.int16) - previous).astype(np.uint8)
+        changed = np.count_nonzero(diff > self.pixel_threshold)
+        return changed >= self.min_changed_ratio * gray.size
+
+
+class HaarGate:
+    """第二级：小灰度图上的Haar级联人脸检测（与capture.py的check_face相同的分类器）"""
+
+    def __init__(self, width=320, min_neighbors=4):
+        self.width = width
+        self.min_neighbors = min_neighbors
+        self.cascade = None
+
+        if HAS_CV2:
+            for path in ('haarcascade_frontalface_default.xml',
+                         cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'):
+                cascade = cv2.CascadeClassifier(path)
+                if not cascade.empty():
+                    self.cascade = cascade
+                    break
+
+        if self.cascade is None:
+            print("⚠ Haar分类器不可用，跳过第二级过滤")
+
+    def check(self, gray):
+        """检测到任意人脸时触发"""
+        if self.cascade is None:
+            return True
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=1.2, minNeighbors=self.min_neighbors, minSize=(24, 24)
+        )
+        return len(faces) > 0
+
+
+class StagedDetector:
+    """分级检测：运动 -> Haar -> HOG检测+编码，前面的阶段未触发时跳过昂贵的阶段"""
+
+    def __init__(self, motion_gate=None, haar_gate=None, hold_seconds=5.0):
+        self.motion_gate = motion_gate
+        self.haar_gate = haar_gate
+        self.hold_seconds = hold_seconds
+        self.last_face_time = None
+
+        self.stages = {
+            'motion': StageStats('motion'),
+            'haar': StageStats('haar'),
+            'detect': StageStats('detect')
+        }
+
+    @classmethod
+    def from_config(cls, prefilter_config):
+        """从prefilter配置创建"""
+        motion = None
+        if prefilter_config.get('motion', True):
+            motion = MotionGate(
+                width=prefilter_config.get('motion_width', 160),
+                pixel_threshold=prefilter_config.get('motion_threshold', 25),
+                min_changed_ratio=prefilter_config.get('min_changed_ratio', 0.002)
+            )
+        haar = None
+        if prefilter_config.get('haar', True):
+            haar = HaarGate(width=prefilter_config.get('haar_width', 320))
+        return cls(motion, haar, prefilter_config.get('hold_seconds', 5.0))
+
+    def passes(self, image, now=None):
+        """前两级过滤，返回True表示值得做完整检测"""
+        now = now if now is not None else time.monotonic()
+
+        # 刚确认过有人脸时，站着不动也继续识别
+        holding = (self.last_face_time is not None and
+                   now - self.last_face_time < self.hold_seconds)
+
+        if self.motion_gate is not None and not holding:
+            start = time.perf_counter()
+            hit = self.motion_gate.check(small_gray(image, self.motion_gate.width))
+            self.stages['motion'].record(hit, time.perf_counter() - start)
+            if not hit:
+                return False
+        elif self.motion_gate is not None:
+            # 保持期间仍然更新参考帧
+            self.motion_gate.previous = small_gray(image, self.motion_gate.width)
+
+        if self.haar_gate is not None:
+            start = time.perf_counter()
+            hit = self.haar_gate.check(small_gray(image, self.haar_gate.width))
+            self.stages['haar'].record(hit, time.perf_counter() - start)
+            if not hit:
+                return False
+
+        return True
+
+    def record_detection(self, found, elapsed, now=None):
+        """记录完整检测阶段的结果"""
+        self.stages['detect'].record(found, elapsed)
+        if found:
+            self.last_face_time = now if now is not None else time.monotonic()
+
+    def get_stats(self):
+        """各阶段统计"""
+        return {name: stage.as_dict() for name, stage in self.stages.items()}
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+训练编码缓存 - 重新训练时只处理新增或修改过的照片
+Encoding cache - retrain only images that were added or changed
+
+每张照片按 (路径, mtime, 大小, sha256) 记录编码结果或失败状态。
+mtime和大小都没变时直接命中；变了再计算sha256，内容相同（例如只是被touch
+或复制过）仍然命中。缓存整体写入一个.npz文件并原子替换。
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+STATUS_OK = 'ok'
+STATUS_NO_FACE = 'no_face'
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """文件内容哈希"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EncodingCache:
+    """照片编码缓存"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.encodings = np.empty((0, 128), dtype=np.float32)
+        self.by_sha = {}
+
+        # 本次训练的结果，save()时只保存这些（已删除的照片自然被丢弃）
+        self.current = {}
+        self.current_encodings = []
+        # 未命中时已经算过的哈希，record()时复用
+        self.hashes = {}
+
+        self.stats = {'hits': 0, 'rehashed': 0, 'misses': 0}
+
+    def load(self):
+        """读取已有缓存，不存在或损坏时从空缓存开始"""
+        if not os.path.exists(self.path):
+            return self
+
+        try:
+            with np.load(self.path) as data:
+                self.entries = json.loads(str(data['index']))
+                self.encodings = data['encodings']
+        except Exception as e:
+            print(f"⚠ 编码缓存损坏，将重新编码: {e}")
+            self.entries = {}
+            return self
+
+        self.by_sha = {entry['sha256']: entry for entry in self.entries.values()}
+        return self
+
+    def _encoding_of(self, entry):
+        if entry['status'] != STATUS_OK:
+            return None
+        return self.encodings[entry['row']]
+
+    def lookup(self, key, path):
+        """查询缓存，命中返回 (True, 状态, 编码)，未命中返回 (False, None, None)"""
+        stat = os.stat(path)
+        entry = self.entries.get(key)
+
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            self.stats['hits'] += 1
+            self.record(key, path, entry['status'], self._encoding_of(entry),
+                        sha256=entry['sha256'], stat=stat)
+            return True, entry['status'], self._encoding_of(entry)
+
+        # 元数据变了，按内容再查一次
+        sha256 = file_sha256(path)
+        entry = self.by_sha.get(sha256)
+        if entry:
+            self.stats['rehashed'] += 1
+            self.record(key, path, entry['status'], self._encoding_of(entry),
+                        sha256=sha256, stat=stat)
+            return True, entry['status'], self._encoding_of(entry)
+
+        self.stats['misses'] += 1
+        self.hashes[key] = sha256
+        return False, None, None
+
+    def record(self, key, path, status, encoding, sha256=None, stat=None):
+        """记录一张照片的处理结果（读取出错的照片不要记录，下次重试）"""
+        stat = stat or os.stat(path)
+        if sha256 is None:
+            sha256 = self.hashes.pop(key, None) or file_sha256(path)
+        # stat也可以是已有的缓存条目（保留旧条目时）
+        if isinstance(stat, dict):
+            mtime, size = stat['mtime'], stat['size']
+        else:
+            mtime, size = stat.st_mtime, stat.st_size
+
+        entry = {
+            'mtime': mtime,
+            'size': size,
+            'sha256': sha256,
+            'status': status,
+            'row': -1
+        }
+        if status == STATUS_OK:
+            entry['row'] = len(self.current_encodings)
+            self.current_encodings.append(np.asarray(encoding, dtype=np.float32))
+        self.current[key] = entry
+
+    def removed(self):
+        """上次训练有、这次不存在的照片"""
+        return [key for key in self.entries if key not in self.current]
+
+    def save(self, merge=False):
+        """保存本次训练的缓存（原子替换）；merge=True时保留本次未涉及的旧条目（增量注册用）"""
+        if merge:
+            for key, entry in self.entries.items():
+                if key not in self.current:
+                    self.record(key, None, entry['status'], self._encoding_of(entry),
+                                sha256=entry['sha256'], stat=entry)
+        encodings = (np.stack(self.current_encodings) if self.current_encodings
+                     else np.empty((0, 128), dtype=np.float32))
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, index=np.array(json.dumps(self.current)), encodings=encodings)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+结构化事件日志 - 后台线程批量写入JSON Lines，按大小轮转
+Structured event log - buffered JSON-lines writer thread with size-based rotation
+
+识别线程只把记录放进有界队列（不阻塞，队列满时丢弃并计数），
+后台线程批量写入并定期flush。文件超过system.max_log_size_mb时轮转，
+保留system.log_rotation_count个旧文件，可选gzip压缩。
+"""
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+
+class EventLog:
+    """JSON Lines事件日志"""
+
+    def __init__(self, log_dir='logs', filename='face_unlock.log', max_bytes=10 * 1024 * 1024,
+                 backups=5, compress=True, flush_interval=1.0, queue_size=1024):
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, filename)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.flush_interval = flush_interval
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.file = None
+
+        self.stats = {
+            'written': 0,
+            'dropped': 0,
+            'rotations': 0,
+            'errors': 0
+        }
+
+    @classmethod
+    def from_config(cls, system_config):
+        """从system配置创建"""
+        return cls(
+            log_dir=system_config.get('log_dir', 'logs'),
+            max_bytes=int(system_config.get('max_log_size_mb', 10) * 1024 * 1024),
+            backups=system_config.get('log_rotation_count', 5),
+            compress=system_config.get('log_compress', True),
+            flush_interval=system_config.get('log_flush_interval', 1.0)
+        )
+
+    def start(self):
+        """启动后台写入线程"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='event-log', daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """写完已排队的记录后停止"""
+        if self.thread is not None:
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.thread.join(timeout)
+            self.thread = None
+
+    def write(self, event, **fields):
+        """记录一个事件（不阻塞；队列满时丢弃）"""
+        record = {'ts': datetime.now().isoformat(timespec='milliseconds'), 'event': event}
+        record.update(fields)
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def _open(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def _backup_name(self, index):
+        name = f"{self.path}.{index}"
+        return name + '.gz' if self.compress else name
+
+    def _rotate(self):
+        """face_unlock.log -> .1(.gz) -> .2(.gz) ... 超出数量的删除"""
+        self.file.close()
+        self.file = None
+
+        oldest = self._backup_name(self.backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for index in range(self.backups - 1, 0, -1):
+            source = self._backup_name(index)
+            if os.path.exists(source):
+                os.replace(source, self._backup_name(index + 1))
+
+        if self.backups > 0:
+            if self.compress:
+                with open(self.path, 'rb') as src, gzip.open(self._backup_name(1), 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self._backup_name(1))
+        else:
+            os.remove(self.path)
+
+        self.stats['rotations'] += 1
+        self._open()
+
+    def _write_batch(self, records):
+        try:
+            if self.file is None:
+                self._open()
+            for record in records:
+                self.file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                self.stats['written'] += 1
+                if self.max_bytes and self.file.tell() >= self.max_bytes:
+                    self._rotate()
+            self.file.flush()
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"⚠ 日志记录失败: {e}")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # 一次取出队列中已有的全部记录，合并成一次写入
+            records = []
+            item = first
+            while True:
+                if item is None:
+                    stopping = True
+                else:
+                    records.append(item)
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if records:
+                self._write_batch(records)
+
+            # 批量写入之间稍作等待，让高频事件攒成一批
+            if not stopping:
+                time.sleep(min(0.05, self.flush_interval))
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def files(self):
+        """现有的日志文件，从最旧的轮转文件到当前文件"""
+        paths = []
+        for index in range(self.backups, 0, -1):
+            for name in (f"{self.path}.{index}.gz", f"{self.path}.{index}"):
+                if os.path.exists(name):
+                    paths.append(name)
+        if os.path.exists(self.path):
+            paths.append(self.path)
+        return paths
+
+    def read(self, event=None):
+        """按时间顺序读出已写入的记录（可只取某类事件），跳过无法解析的行"""
+        for path in self.files():
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event is None or record.get('event') == event:
+                        yield record
+
+    def get_stats(self):
+        """写入统计"""
+        stats = dict(self.stats)
+        stats['queued'] = self.queue.qsize()
+        return stats
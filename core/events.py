@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+事件调度 - 持续监控模式由触发事件驱动，不再固定间隔轮询
+Event scheduler - event-driven continuous mode instead of fixed-interval polling
+
+各触发源（运动检测、PIR/GPIO按钮、Web、定时器）把事件放进同一个队列，
+主循环阻塞等待事件或下一个定时器到期，空闲时几乎不占CPU。
+冷却期是一个定时器，期间到达的事件直接丢弃并计数。
+每个触发源分别统计从触发到得出识别结果的延迟。
+"""
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+from detection import MotionGate, small_gray
+
+
+class TriggerEvent:
+    """一次触发"""
+
+    __slots__ = ('source', 'timestamp', 'info')
+
+    def __init__(self, source, info=None):
+        self.source = source
+        self.timestamp = time.monotonic()
+        self.info = info or {}
+
+
+class LatencyStats:
+    """触发到识别结果的延迟"""
+
+    def __init__(self):
+        self.samples = []
+
+    def record(self, ms):
+        self.samples.append(ms)
+        # 只保留最近的样本
+        if len(self.samples) > 1000:
+            del self.samples[:500]
+
+    def as_dict(self):
+        if not self.samples:
+            return {'count': 0}
+        ordered = sorted(self.samples)
+        return {
+            'count': len(ordered),
+            'p50_ms': round(ordered[len(ordered) // 2], 1),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+            'max_ms': round(ordered[-1], 1)
+        }
+
+
+class EventScheduler:
+    """触发事件队列 + 定时器"""
+
+    def __init__(self, max_latency_age=30.0):
+        self.queue = queue.Queue()
+        self.timers = []
+        self.timer_seq = itertools.count()
+        self.lock = threading.Lock()
+        self.running = False
+
+        self.cooldown_until = 0.0
+        # 尚未得出结果的触发：来源 -> 最早的触发时间
+        self.pending = {}
+        self.max_latency_age = max_latency_age
+
+        self.received = {}
+        self.dropped = {}
+        self.latency = {}
+
+    def post(self, source, **info):
+        """投递一个触发事件（任意线程可调用）"""
+        self.queue.put(TriggerEvent(source, info))
+
+    def call_later(self, delay, callback, *args):
+        """delay秒后在调度线程中执行callback，返回可用于cancel的句柄"""
+        entry = [time.monotonic() + delay, next(self.timer_seq), callback, args]
+        with self.lock:
+            heapq.heappush(self.timers, entry)
+        # 唤醒调度线程重新计算等待时间
+        self.queue.put(None)
+        return entry
+
+    def cancel(self, entry):
+        """取消定时器"""
+        entry[2] = None
+
+    def every(self, interval, source):
+        """每interval秒投递一次source事件"""
+        def tick():
+            self.post(source)
+            self.call_later(interval, tick)
+        return self.call_later(interval, tick)
+
+    def start_cooldown(self, seconds, on_end=None):
+        """进入冷却期，结束时调用on_end"""
+        self.cooldown_until = time.monotonic() + seconds
+        with self.lock:
+            self.pending.clear()
+
+        def end():
+            self.cooldown_until = 0.0
+            if on_end is not None:
+                on_end()
+
+        return self.call_later(seconds, end)
+
+    @property
+    def in_cooldown(self):
+        return time.monotonic() < self.cooldown_until
+
+    def mark_pending(self, event):
+        """记录等待结果的触发（同一来源只记最早一次）"""
+        with self.lock:
+            self.pending.setdefault(event.source, event.timestamp)
+
+    def discard(self, source):
+        """触发没有产生识别（例如前置过滤未通过），不计延迟"""
+        with self.lock:
+            self.pending.pop(source, None)
+
+    def resolve(self):
+        """得出识别结果：记录所有等待中的触发源的延迟"""
+        now = time.monotonic()
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for source, timestamp in pending.items():
+            age = now - timestamp
+            if age <= self.max_latency_age:
+                self.latency.setdefault(source, LatencyStats()).record(age * 1000)
+
+    def _run_due_timers(self):
+        now = time.monotonic()
+        while True:
+            with self.lock:
+                if not self.timers or self.timers[0][0] > now:
+                    return
+                _, _, callback, args = heapq.heappop(self.timers)
+            if callback is not None:
+                callback(*args)
+
+    def _next_timeout(self):
+        with self.lock:
+            if not self.timers:
+                return None
+            return max(0.0, self.timers[0][0] - time.monotonic())
+
+    def run(self, handler):
+        """调度主循环，handler(event) 在本线程中执行；stop()后返回"""
+        self.running = True
+        while self.running:
+            try:
+                event = self.queue.get(timeout=self._next_timeout())
+            except queue.Empty:
+                event = None
+
+            self._run_due_timers()
+            if event is None:
+                continue
+
+            self.received[event.source] = self.received.get(event.source, 0) + 1
+            if self.in_cooldown:
+                self.dropped[event.source] = self.dropped.get(event.source, 0) + 1
+                continue
+            handler(event)
+
+    def stop(self):
+        """停止主循环"""
+        self.running = False
+        self.queue.put(None)
+
+    def get_stats(self):
+        """各触发源的事件数、冷却期丢弃数和延迟"""
+        sources = set(self.received) | set(self.latency)
+        return {
+            source: {
+                'received': self.received.get(source, 0),
+                'dropped': self.dropped.get(source, 0),
+                'latency': self.latency[source].as_dict() if source in self.latency else {'count': 0}
+            }
+            for source in sorted(sources)
+        }
+
+
+class MotionSource(threading.Thread):
+    """运动触发源：以较低帧率对环形缓冲中的新帧做帧差，有变化时投递motion事件；冷却期内休眠"""
+
+    def __init__(self, buffer, scheduler, motion_gate=None, fps=5.0, debounce=1.0):
+        super().__init__(name='motion-source', daemon=True)
+        self.buffer = buffer
+        self.scheduler = scheduler
+        self.gate = motion_gate or MotionGate()
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.debounce = debounce
+        self.running = False
+        self.last_post = 0.0
+        self.rebase = False
+
+    def start(self):
+        self.running = True
+        super().start()
+
+    def run(self):
+        seq = 0
+        while self.running:
+            started = time.monotonic()
+            # 冷却期内不分析；结束后第一帧只作为新的参考帧
+            if self.scheduler.in_cooldown:
+                self.rebase = True
+                time.sleep(min(1.0, max(0.0, self.scheduler.cooldown_until - started)))
+                continue
+
+            ref = self.buffer.acquire(after_seq=seq, timeout=1.0)
+            if ref is None:
+                continue
+            try:
+                seq = ref.seq
+                gray = small_gray(ref.array, self.gate.width)
+            finally:
+                self.buffer.release(ref)
+
+            moved = self.gate.check(gray) and not self.rebase
+            self.rebase = False
+            now = time.monotonic()
+            if moved and not self.scheduler.in_cooldown and now - self.last_post >= self.debounce:
+                self.last_post = now
+                self.scheduler.post('motion')
+
+            # 限制分析帧率，空闲时CPU占用很低
+            remaining = self.interval - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def stop(self):
+        self.running = False
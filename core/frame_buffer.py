@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+帧环形缓冲 - 后台采集线程 + 最新帧语义
+Frame ring buffer - background capture thread with latest-frame semantics
+
+采集线程把相机帧写入预分配的若干槽位，消费者总是拿到最新的一帧，
+不需要等待，也不会为每帧重新分配内存。消费者持有帧期间该槽位被锁定，
+采集线程会跳过它写入其他槽位。
+事件驱动模式下没有识别进行时，采集线程降到空闲帧率（只够运动检测用），
+触发后wake()立即恢复全帧率。
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import cv2
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+
+class FrameRef:
+    """被锁定的一帧（array为缓冲区视图，release前不会被覆盖）"""
+
+    __slots__ = ('slot', 'seq', 'timestamp', 'array')
+
+    def __init__(self, slot, seq, timestamp, array):
+        self.slot = slot
+        self.seq = seq
+        self.timestamp = timestamp
+        self.array = array
+
+
+class FrameRingBuffer:
+    """预分配的帧环形缓冲"""
+
+    def __init__(self, shape, slots=4, dtype=np.uint8):
+        if slots < 3:
+            # 至少需要: 最新帧 + 一个被消费者锁定的帧 + 一个写入槽
+            raise ValueError("slots必须 >= 3")
+
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.buffers = np.empty((slots,) + self.shape, dtype=dtype)
+        self.seqs = [0] * slots
+        self.timestamps = [0.0] * slots
+        self.pins = [0] * slots
+
+        self.cond = threading.Condition(threading.Lock())
+        self.latest_slot = -1
+        self.latest_seq = 0
+
+        # 计数器
+        self.produced = 0
+        self.consumed = 0
+        self.dropped = 0
+        self.overruns = 0
+        self.last_consumed_seq = 0
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def claim_slot(self):
+        """为写入选择一个槽位：不是最新帧、没有被锁定，优先最旧的"""
+        with self.cond:
+            best = None
+            for slot in range(self.slots):
+                if slot == self.latest_slot or self.pins[slot]:
+                    continue
+                if best is None or self.seqs[slot] < self.seqs[best]:
+                    best = slot
+            if best is None:
+                self.overruns += 1
+            return best
+
+    def write(self, frame, timestamp=None):
+        """把一帧拷贝进缓冲并发布，没有可用槽位时返回False"""
+        slot = self.claim_slot()
+        if slot is None:
+            return False
+
+        target = self.buffers[slot]
+        if frame.shape == self.shape:
+            np.copyto(target, frame)
+        elif HAS_CV2 and frame.ndim == len(self.shape) and frame.shape[2:] == self.shape[2:]:
+            # 尺寸不同的帧直接缩放进槽位，不额外分配
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=target)
+        else:
+            with self.cond:
+                self.overruns += 1
+            return False
+
+        self.publish(slot, timestamp)
+        return True
+
+    def publish(self, slot, timestamp=None):
+        """发布写好的槽位为最新帧"""
+        with self.cond:
+            self.latest_seq += 1
+            self.seqs[slot] = self.latest_seq
+            self.timestamps[slot] = timestamp if timestamp is not None else time.monotonic()
+            self.latest_slot = slot
+            self.produced += 1
+            self.cond.notify_all()
+
+    def acquire(self, after_seq=0, timeout=None):
+        """锁定并返回最新帧；after_seq>0时等待比它更新的帧，超时返回None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.cond:
+            while self.latest_slot < 0 or self.latest_seq <= after_seq:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+
+            slot = self.latest_slot
+            seq = self.seqs[slot]
+            timestamp = self.timestamps[slot]
+            self.pins[slot] += 1
+
+            # 两次消费之间被覆盖、从未被读到的帧记为丢帧
+            if seq > self.last_consumed_seq:
+                if self.last_consumed_seq:
+                    self.dropped += seq - self.last_consumed_seq - 1
+                self.last_consumed_seq = seq
+            self.consumed += 1
+
+            lag = (time.monotonic() - timestamp) * 1000
+            self.lag_ms = lag if self.consumed == 1 else self.lag_ms * 0.9 + lag * 0.1
+            self.max_lag_ms = max(self.max_lag_ms, lag)
+
+        return FrameRef(slot, seq, timestamp, self.buffers[slot])
+
+    def release(self, ref):
+        """解除锁定"""
+        with self.cond:
+            self.pins[ref.slot] -= 1
+
+    @contextmanager
+    def latest(self, after_seq=0, timeout=None):
+        """with buffer.latest() as ref: ...  ref为None表示超时"""
+        ref = self.acquire(after_seq, timeout)
+        try:
+            yield ref
+        finally:
+            if ref is not None:
+                self.release(ref)
+
+    def get_stats(self):
+        """采集计数器快照"""
+        with self.cond:
+            return {
+                'produced': self.produced,
+                'consumed': self.consumed,
+                'dropped': self.dropped,
+                'overruns': self.overruns,
+                'consumer_lag_ms': round(self.lag_ms, 1),
+                'max_consumer_lag_ms': round(self.max_lag_ms, 1),
+                'latest_seq': self.latest_seq
+            }
+
+
+class CaptureThread(threading.Thread):
+    """后台采集线程 - 持续从常驻相机读帧写入环形缓冲"""
+
+    def __init__(self, camera, slots=4):
+        super().__init__(name='capture', daemon=True)
+        self.camera = camera
+        self.slots = slots
+        self.buffer = None
+        self.ready = threading.Event()
+        self.running = False
+        self.fps = 0.0
+        self.errors = 0
+
+        # 空闲帧率：idle_interval>0且不在全帧率期间时，两次读帧之间休眠
+        self.idle_interval = 0.0
+        self.full_rate_until = float('inf')
+        self.woken = threading.Event()
+
+    @property
+    def idle(self):
+        return self.idle_interval > 0 and time.monotonic() >= self.full_rate_until
+
+    def set_idle_rate(self, fps):
+        """启用空闲帧率（fps<=0关闭），立即进入空闲状态"""
+        self.idle_interval = 1.0 / fps if fps > 0 else 0.0
+        self.full_rate_until = 0.0 if fps > 0 else float('inf')
+
+    def wake(self, seconds):
+        """在接下来seconds秒内以相机全帧率采集（可重复调用延长）"""
+        self.full_rate_until = max(self.full_rate_until, time.monotonic() + seconds)
+        self.woken.set()
+
+    def start(self):
+        self.running = True
+        super().start()
+
+    def run(self):
+        # 第一帧决定缓冲区尺寸
+        frame = None
+        while self.running and frame is None:
+            frame = self.camera.read()
+            if frame is None:
+                self.errors += 1
+                time.sleep(0.1)
+
+        if frame is None:
+            return
+
+        self.buffer = FrameRingBuffer(frame.shape, self.slots, frame.dtype)
+        self.buffer.write(frame)
+        self.ready.set()
+
+        last = time.monotonic()
+        while self.running:
+            if self.idle:
+                # 空闲时不读帧、不拷贝；wake()立即结束等待
+                remaining = last + self.idle_interval - time.monotonic()
+                if remaining > 0 and self.woken.wait(remaining):
+                    self.woken.clear()
+                    continue
+                self.woken.clear()
+
+            frame = self.camera.read()
+            now = time.monotonic()
+
+            if frame is None:
+                self.errors += 1
+                time.sleep(0.05)
+                continue
+
+            self.buffer.write(frame, now)
+
+            # 采集帧率（指数平滑）
+            interval = now - last
+            last = now
+            if interval > 0:
+                instant = 1.0 / interval
+                self.fps = instant if self.fps == 0 else self.fps * 0.9 + instant * 0.1
+
+    def wait_ready(self, timeout=5.0):
+        """等待第一帧到达"""
+        return self.ready.wait(timeout)
+
+    def stop(self, timeout=2.0):
+        """停止采集线程"""
+        self.running = False
+        if self.is_alive():
+            self.join(timeout)
+
+    def get_stats(self):
+        """采集线程统计"""
+        stats = self.buffer.get_stats() if self.buffer else {}
+        stats['producer_fps'] = round(self.fps, 1)
+        stats['read_errors'] = self.errors
+        stats['idle'] = self.idle
+        return stats
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+识别任务管理 - Web触发改为异步任务
+Recognition jobs - asynchronous, job-based triggering for the web service
+
+提交后立即返回任务ID，识别在后台线程中执行，结果通过轮询或SSE获取。
+同一时间只运行一个识别任务；任务排队或进行中时再次触发，
+合并到这个任务上（返回同一个任务ID），而不是拒绝请求。
+"""
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+STATE_QUEUED = 'queued'
+STATE_RUNNING = 'running'
+STATE_DONE = 'done'
+STATE_ERROR = 'error'
+
+FINISHED_STATES = (STATE_DONE, STATE_ERROR)
+
+
+class RecognitionJob:
+    """一次识别任务"""
+
+    def __init__(self, job_id, context=None):
+        self.id = job_id
+        # 提交时的参数，原样传给run()
+        self.context = context or {}
+        self.state = STATE_QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        # 合并到本任务的触发次数
+        self.triggers = 1
+        # 每次状态变化递增，SSE据此判断是否有新消息
+        self.version = 0
+
+    @property
+    def is_finished(self):
+        return self.state in FINISHED_STATES
+
+    def as_dict(self):
+        data = {
+            'job_id': self.id,
+            'state': self.state,
+            'triggers': self.triggers,
+            'created': self.created,
+            'result': self.result,
+            'error': self.error
+        }
+        if self.started is not None:
+            data['queued_ms'] = round((self.started - self.created) * 1000, 1)
+        if self.finished is not None:
+            data['elapsed_ms'] = round((self.finished - self.started) * 1000, 1)
+        return data
+
+
+class JobManager:
+    """识别任务队列：单线程执行，重复触发合并"""
+
+    def __init__(self, run, history=50):
+        # run(**context) 执行一次识别并返回结果字典
+        self.run = run
+        self.history = history
+        self.jobs = OrderedDict()
+        self.current = None
+        self.cond = threading.Condition()
+        self.counter = itertools.count(1)
+        self.stats = {
+            'submitted': 0,
+            'coalesced': 0,
+            'completed': 0,
+            'errors': 0
+        }
+
+    @property
+    def busy(self):
+        """是否有任务排队或进行中"""
+        return self.current is not None
+
+    def submit(self, **context):
+        """提交识别任务，返回 (任务, 是否合并到进行中的任务)；context作为run()的参数"""
+        with self.cond:
+            if self.current is not None:
+                self.current.triggers += 1
+                self.stats['coalesced'] += 1
+                return self.current, True
+
+            job = RecognitionJob(f"{next(self.counter)}-{uuid.uuid4().hex[:8]}", context)
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.history:
+                self.jobs.popitem(last=False)
+            self.current = job
+            self.stats['submitted'] += 1
+
+        threading.Thread(target=self._execute, args=(job,), name=f'job-{job.id}',
+                         daemon=True).start()
+        return job, False
+
+    def _update(self, job, state, **fields):
+        with self.cond:
+            job.state = state
+            for key, value in fields.items():
+                setattr(job, key, value)
+            job.version += 1
+            if job.is_finished:
+                self.current = None
+                self.stats['completed' if state == STATE_DONE else 'errors'] += 1
+            self.cond.notify_all()
+
+    def _execute(self, job):
+        self._update(job, STATE_RUNNING, started=time.time())
+        try:
+            result = self.run(**job.context)
+        except Exception as e:
+            self._update(job, STATE_ERROR, finished=time.time(), error=str(e))
+            return
+        self._update(job, STATE_DONE, finished=time.time(), result=result)
+
+    def get(self, job_id):
+        """按ID取任务，不存在（或已从历史中移除）返回None"""
+        with self.cond:
+            return self.jobs.get(job_id)
+
+    def wait(self, job, version, timeout=None):
+        """等待任务状态变化（version之后），返回是否有变化"""
+        with self.cond:
+            return self.cond.wait_for(lambda: job.version > version, timeout)
+
+    def wait_finished(self, job, timeout=None):
+        """等待任务结束，返回是否已结束"""
+        with self.cond:
+            return self.cond.wait_for(lambda: job.is_finished, timeout)
+
+    def get_stats(self):
+        """任务统计"""
+        with self.cond:
+            stats = dict(self.stats)
+            stats['current'] = self.current.id if self.current is not None else None
+        return stats
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Mac解锁客户端 - 常驻连接 + 后台发送队列
+Mac unlock client - keep-alive session with a background dispatch queue
+
+请求分两条通道，各有一个后台线程和一个保持连接的requests.Session：
+  解锁通道: /unlock 和 prewarm() 的 /status（预热的正是/unlock要用的连接）
+  辅助通道: /wake 和 check_status()
+/unlock不会排在进行中的/wake（最长3秒）后面，check_status也不会被15秒的解锁请求卡住。
+识别线程只把请求放进队列（fire-and-forget），不会因为Mac端输入密码而卡住。
+检测到人脸时调用prewarm()提前建立连接，与编码/匹配并行；
+或者调用speculative_wake()发送/wake点亮屏幕（同时预热解锁通道的连接），
+确认匹配后再发/unlock，屏幕唤醒的耗时与识别重叠。
+
+重试策略：只在连接建立失败时重试（请求还没送达Mac），带抖动的指数退避；
+读超时说明Mac已收到请求、可能正在输入密码，不重试，按原逻辑视为成功。
+已建立的连接在发送后被断开时，/unlock可能已经送达，也不重试，避免Mac收到两次解锁；
+GET请求（/status）没有副作用，任何连接错误都可以重试。
+"""
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+
+UNLOCK_KEY = 'face_unlock_2024'
+
+
+class _Lane:
+    """一条发送通道：请求队列 + 后台线程 + 保持连接的Session（只有该线程使用，一个连接足够）"""
+
+    def __init__(self, name, queue_size):
+        self.name = name
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        self.session.mount('http://', adapter)
+
+
+def request_not_sent(error):
+    """连接错误是否发生在建立连接阶段（请求一定没有发出）"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # requests把urllib3的MaxRetryError放在args[0]，真正的原因在.reason
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, NewConnectionError)
+
+
+class UnlockDispatcher:
+    """Mac解锁请求调度器"""
+
+    def __init__(self, host='localhost', port=5001, key=UNLOCK_KEY, timeout=15.0,
+                 connect_timeout=2.0, retries=2, backoff=0.2, max_backoff=2.0,
+                 keepalive=30.0, wake_valid=10.0, queue_size=8):
+        self.base_url = f"http://{host}:{port}"
+        self.key = key
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.keepalive = keepalive
+        self.wake_valid = wake_valid
+
+        self.unlock_lane = _Lane('mac-dispatch', queue_size)
+        self.side_lane = _Lane('mac-side', queue_size)
+        # 解锁通道的连接最近一次收到响应的时间（prewarm据此判断连接是否仍有效）
+        self.last_contact = 0.0
+        self.prewarm_pending = False
+        self.wake_started = 0.0
+        self.wake_finished = None
+
+        self.stats = {
+            'sent': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'retries': 0,
+            'dropped': 0,
+            'prewarms': 0,
+            'wakes': 0,
+            'woken_unlocks': 0,
+            'wake_saved_ms': 0.0,
+            'time_ms': 0.0
+        }
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, mac_config):
+        """从mac配置创建"""
+        return cls(
+            host=mac_config.get('host', 'localhost'),
+            port=mac_config.get('port', 5001),
+            key=mac_config.get('key', UNLOCK_KEY),
+            timeout=mac_config.get('timeout', 15.0),
+            connect_timeout=mac_config.get('connect_timeout', 2.0),
+            retries=mac_config.get('retries', 2),
+            backoff=mac_config.get('retry_backoff', 0.2),
+            wake_valid=mac_config.get('wake_valid', 10.0)
+        )
+
+    @property
+    def lanes(self):
+        return (self.unlock_lane, self.side_lane)
+
+    def start(self):
+        """启动两条通道的后台发送线程"""
+        for lane in self.lanes:
+            if lane.thread is None:
+                lane.thread = threading.Thread(target=self._run, args=(lane,), name=lane.name,
+                                               daemon=True)
+                lane.thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """停止后台线程（已排队的请求发送完为止）"""
+        for lane in self.lanes:
+            if lane.thread is not None:
+                lane.queue.put(None)
+                lane.thread.join(timeout)
+                lane.thread = None
+            lane.session.close()
+
+    def _run(self, lane):
+        while True:
+            job = lane.queue.get()
+            if job is None:
+                break
+            future, method, path, payload, timeout = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._request(method, path, payload, timeout, lane))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _request(self, method, path, payload, timeout, lane=None):
+        """发送请求，连接失败时带抖动退避重试；返回 (状态, 响应JSON或错误信息)"""
+        lane = lane or self.unlock_lane
+        session = lane.session
+        url = self.base_url + path
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = session.request(
+                    method, url, json=payload, timeout=(self.connect_timeout, timeout)
+                )
+                if lane is self.unlock_lane:
+                    self.last_contact = time.monotonic()
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {'text': response.text}
+                status = 'ok' if response.status_code == 200 else f'http_{response.status_code}'
+                break
+            except requests.exceptions.ConnectionError as e:
+                # 只有请求未送达（或请求没有副作用）时才能安全重试
+                retryable = method == 'GET' or request_not_sent(e)
+                if attempt >= self.retries or not retryable:
+                    status, body = 'connection_error', {'error': str(e)}
+                    break
+                attempt += 1
+                with self.lock:
+                    self.stats['retries'] += 1
+                delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+                time.sleep(delay * random.uniform(0.5, 1.5))
+            except requests.exceptions.Timeout as e:
+                # 请求已送达，Mac端可能仍在处理
+                if lane is self.unlock_lane:
+                    self.last_contact = time.monotonic()
+                status, body = 'timeout', {'error': str(e)}
+                break
+            except Exception as e:
+                status, body = 'error', {'error': str(e)}
+                break
+
+        elapsed = (time.perf_counter() - start) * 1000
+        return status, body, elapsed
+
+    def submit(self, method, path, payload=None, timeout=None, side=False):
+        """把请求放入队列（side=True时走辅助通道），返回Future；队列满时丢弃并返回None"""
+        future = Future()
+        job = (future, method, path, payload, timeout or self.timeout)
+        lane = self.side_lane if side else self.unlock_lane
+        try:
+            lane.queue.put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                self.stats['dropped'] += 1
+            return None
+        return future
+
+    def _track(self, future, callback=None):
+        """统计解锁请求结果，完成后调用callback(成功, 状态, 响应)"""
+        with self.lock:
+            self.stats['sent'] += 1
+
+        def done(f):
+            try:
+                status, body, elapsed = f.result()
+            except Exception as e:
+                status, body, elapsed = 'error', {'error': str(e)}, 0.0
+            # 超时按原逻辑视为成功：Mac端可能仍在输入密码
+            success = status in ('ok', 'timeout')
+            with self.lock:
+                self.stats['succeeded' if success else 'failed'] += 1
+                self.stats['time_ms'] += elapsed
+            if callback is not None:
+                callback(success, status, body)
+
+        future.add_done_callback(done)
+        return future
+
+    def unlock_async(self, user, callback=None):
+        """发送解锁请求，立即返回（fire-and-forget）"""
+        future = self.submit('POST', '/unlock', {'user': user, 'key': self.key})
+        if future is None:
+            print("⚠ 解锁队列已满，丢弃本次请求")
+            return None
+        return self._track(future, callback)
+
+    def unlock(self, user):
+        """发送解锁请求并等待结果，返回 (成功, 状态, 响应)"""
+        result = {}
+        finished = threading.Event()
+
+        def done(*args):
+            result['value'] = args
+            finished.set()
+
+        # 回调在Future完成后才执行，等回调而不是等Future
+        if self.unlock_async(user, done) is None:
+            return False, 'dropped', {}
+        finished.wait()
+        return result['value']
+
+    def wake_async(self):
+        """只唤醒屏幕，立即返回（辅助通道，不阻塞随后的/unlock）"""
+        return self.submit('POST', '/wake', timeout=3.0, side=True)
+
+    def speculative_wake(self):
+        """预先唤醒屏幕（屏幕仍处于上次唤醒的有效期内时跳过），同时预热解锁通道的连接"""
+        now = time.monotonic()
+        if now - self.wake_started < self.wake_valid:
+            return None
+        self.prewarm()
+
+        self.wake_started = now
+        self.wake_finished = None
+        future = self.wake_async()
+        if future is None:
+            self.wake_started = 0.0
+            return None
+        with self.lock:
+            self.stats['wakes'] += 1
+
+        def done(_):
+            self.wake_finished = time.monotonic()
+
+        future.add_done_callback(done)
+        return future
+
+    def wake_savings(self, record=False):
+        """
+        预唤醒节省的时间(ms)：发送/unlock之前唤醒已经进行的部分。
+        没有预唤醒时Mac端要在收到/unlock后才开始点亮屏幕。
+        """
+        now = time.monotonic()
+        if not self.wake_started or now - self.wake_started > self.wake_valid:
+            return 0.0
+        finished = self.wake_finished if self.wake_finished is not None else now
+        saved = (min(finished, now) - self.wake_started) * 1000
+        if record:
+            with self.lock:
+                self.stats['woken_unlocks'] += 1
+                self.stats['wake_saved_ms'] += saved
+        return saved
+
+    def prewarm(self):
+        """提前建立到Mac的连接（最近用过的连接仍有效时跳过）"""
+        if self.prewarm_pending or time.monotonic() - self.last_contact < self.keepalive:
+            return None
+        self.prewarm_pending = True
+        future = self.submit('GET', '/status', timeout=2.0)
+        if future is None:
+            self.prewarm_pending = False
+            return None
+        with self.lock:
+            self.stats['prewarms'] += 1
+
+        def done(_):
+            self.prewarm_pending = False
+
+        future.add_done_callback(done)
+        return future
+
+    def check_status(self, timeout=2.0):
+        """查询Mac服务状态，返回响应JSON，失败返回None（辅助通道，不排在解锁请求后面）"""
+        future = self.submit('GET', '/status', timeout=timeout, side=True)
+        if future is None:
+            return None
+        try:
+            status, body, _ = future.result(timeout=timeout * (self.retries + 2))
+        except Exception:
+            return None
+        return body if status == 'ok' else None
+
+    def get_stats(self):
+        """发送统计"""
+        with self.lock:
+            stats = dict(self.stats)
+        finished = stats['succeeded'] + stats['failed']
+        time_ms = stats.pop('time_ms')
+        stats['avg_ms'] = round(time_ms / finished, 1) if finished else 0.0
+        woken = stats['woken_unlocks']
+        saved_ms = stats.pop('wake_saved_ms')
+        stats['avg_wake_saved_ms'] = round(saved_ms / woken, 1) if woken else 0.0
+        stats['queued'] = sum(lane.queue.qsize() for lane in self.lanes)
+        return stats
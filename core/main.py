@@ -7,12 +7,31 @@ import os
 import sys
 import pickle
 import json
-import subprocess
+import math
 import time
-import requests
 from datetime import datetime
 import signal
 import threading
+from contextlib import contextmanager
+
+# core目录下的模块（从仓库根目录导入core.main时同样可用）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from camera import create_camera
+from frame_buffer import CaptureThread
+from matcher import EncodingMatcher, PrototypeIndex
+from ann_index import IVFIndex
+from model_store import ModelStore, DEFAULT_STORE_PATH, LEGACY_PICKLE_PATH
+from detection import FaceDetector, StagedDetector, MotionGate
+from tracker import FaceTracker
+from burst import BurstRecognizer
+from workers import create_pool, pool_size
+from pipeline import RecognitionPipeline
+from events import EventScheduler, MotionSource
+from quality import QualityGate, REASON_LABELS
+from mac_client import UnlockDispatcher
+from preview import FaceOverlay
+from event_log import EventLog
+from metrics import MetricsRegistry
 
 # 尝试导入face_recognition
 try:
@@ -25,22 +44,83 @@ except ImportError:
     HAS_FACE_RECOGNITION = False
 
 class FaceUnlockSystem:
-    def __init__(self):
-        """初始化系统"""
+    def __init__(self, config_path='config.json', model_path=None):
+        """初始化系统（基准测试等场景可指定配置文件和模型文件）"""
         print("="*50)
         print("人脸识别解锁系统 v3.0")
         print("="*50)
         print("\n初始化中...")
         
         # 加载配置
-        self.load_config()
+        self.load_config(config_path)
         
-        # 加载模型
-        if not self.load_model():
+        # 加载模型（守护进程重新加载时使用同一路径）
+        self.model_path = model_path
+        if not self.load_model(model_path):
             print("\n⚠ 模型加载失败")
             print("请运行: python3 train_model.py")
             sys.exit(1)
         
+        # 检测在缩小图上进行，编码仍用原图
+        self.detector = FaceDetector.from_config(self.config.get('recognition', {}))
+        
+        # 持续监控模式的前置过滤：运动检测 -> Haar -> 完整检测
+        prefilter_config = self.config.get('prefilter', {})
+        self.prefilter = None
+        if prefilter_config.get('enabled', True):
+            self.prefilter = StagedDetector.from_config(prefilter_config)
+        
+        # 编码前的质量检查：模糊、曝光、人脸大小、姿态
+        quality_config = self.config.get('quality', {})
+        self.quality = None
+        if quality_config.get('enabled', True):
+            self.quality = QualityGate.from_config(quality_config)
+        
+        # 持续监控模式下跨帧跟踪人脸，同一个人不必每次重新编码
+        tracking_config = self.config.get('tracking', {})
+        self.tracker = None
+        if tracking_config.get('enabled', True):
+            self.tracker = FaceTracker.from_config(tracking_config)
+        
+        # Mac解锁请求由后台线程通过常驻连接发送，识别线程不等待
+        self.mac = None
+        if self.config.get('mac', {}).get('enabled', False):
+            self.mac = UnlockDispatcher.from_config(self.config['mac']).start()
+        
+        # 初始化相机（常驻后端只在这里启动一次）
+        self.camera = create_camera(self.config.get('camera', {}))
+        if not self.camera.open():
+            print("⚠ 相机打开失败，识别时将无法取帧")
+        
+        # 常驻取流的相机由后台线程持续写入环形缓冲，识别时直接取最新帧
+        self.capture_thread = None
+        if self.camera.is_open and self.camera.streaming:
+            slots = self.config.get('camera', {}).get('ring_slots', 4)
+            self.capture_thread = CaptureThread(self.camera, slots)
+            self.capture_thread.start()
+            if not self.capture_thread.wait_ready():
+                print("⚠ 等待第一帧超时")
+        
+        # 常驻相机上：触发式识别使用连拍投票，持续监控使用分级流水线，
+        # 两者共用检测/编码进程池（大小由performance.max_workers决定），启动时提前拉起
+        recognition = self.config.get('recognition', {})
+        performance = self.config.get('performance', {})
+        self.pool = None
+        self.pool_workers = pool_size(self.config)
+        self.burst = None
+        self.pipeline = None
+        self.scheduler = None
+        use_burst = recognition.get('burst_frames', 5) > 1
+        use_pipeline = performance.get('pipeline', True)
+        if self.capture_thread is not None and (use_burst or use_pipeline):
+            quality_config = self.config.get('quality', {}) if self.quality is not None else None
+            self.pool = create_pool(self.detector, self.pool_workers, quality_config)
+            print(f"  识别进程池: {self.pool_workers} 进程")
+            if use_burst:
+                self.burst = BurstRecognizer.from_config(self.pool, self.pool_workers, recognition,
+                                                         self.quality)
+                print(f"  连拍识别: {self.burst.frames} 帧中 {self.burst.agree} 帧一致")
+        
         # 初始化统计
         self.stats = {
             'total_attempts': 0,
@@ -48,6 +128,17 @@ class FaceUnlockSystem:
             'failed': 0,
             'start_time': datetime.now()
         }
+        # 本次识别各阶段耗时(ms)和最近一次识别结果（供Web任务查询）
+        self.timings = {}
+        self.attempt_start = time.perf_counter()
+        self.trigger_source = None
+        self.last_result = None
+        # 结构化事件日志（后台线程写入，不阻塞识别）
+        self.event_log = EventLog.from_config(self.config.get('system', {})).start()
+        self.metrics = MetricsRegistry()
+        self.register_metrics()
+        # 最近一次识别的人脸框和匹配结果，供Web预览叠加
+        self.overlay = FaceOverlay()
         
         # 设置信号处理
         signal.signal(signal.SIGINT, self.signal_handler)
@@ -55,10 +146,8 @@ class FaceUnlockSystem:
         print("\n✓ 系统初始化完成")
         print("-"*50)
     
-    def load_config(self):
+    def load_config(self, config_file='config.json'):
         """加载配置文件"""
-        config_file = 'config.json'
-        
         if not os.path.exists(config_file):
             print(f"✗ 配置文件不存在: {config_file}")
             self.create_default_config()
@@ -102,26 +191,95 @@ class FaceUnlockSystem:
         default_config = {
             "camera": {
                 "type": "ov5647",
-                "backend": "rpicam",
+                "backend": "picamera2",
                 "width": 1296,
-                "height": 972
+                "height": 972,
+                "warmup_ms": 500
             },
             "mac": {
                 "enabled": False,
                 "host": "192.168.1.100",
                 "port": 5001,
                 "username": "your_username",
-                "password": "your_password"
+                "password": "your_password",
+                "timeout": 15.0,
+                "connect_timeout": 2.0,
+                "retries": 2,
+                "retry_backoff": 0.2,
+                "speculative_wake": True,
+                "wake_valid": 10.0
             },
             "recognition": {
                 "tolerance": 0.4,
                 "check_interval": 3.0,
-                "confidence_threshold": 0.6
+                "confidence_threshold": 0.6,
+                "index": "auto",
+                "prototype_min_encodings": 2000,
+                "prototypes_per_user": 4,
+                "detect_scale": 0.5,
+                "detect_upsample": 1,
+                "burst_frames": 5,
+                "burst_agree": 2,
+                "burst_window": 3.0,
+                "ann": {
+                    "path": "models/face_ann.npz",
+                    "nlist": 0,
+                    "nprobe": 8
+                }
+            },
+            "prefilter": {
+                "enabled": True,
+                "motion": True,
+                "haar": True,
+                "hold_seconds": 5.0
+            },
+            "preview": {
+                "enabled": True,
+                "fps": 10,
+                "client_fps": 10,
+                "width": 640,
+                "quality": 70
+            },
+            "events": {
+                "cooldown": 30,
+                "active_window": 5.0,
+                "motion_fps": 5.0,
+                "idle_fps": 2.0
+            },
+            "quality": {
+                "enabled": True,
+                "min_sharpness": 40.0,
+                "min_brightness": 40.0,
+                "max_brightness": 215.0,
+                "min_face_size": 60,
+                "max_yaw": 0.35
+            },
+            "tracking": {
+                "enabled": True,
+                "iou_threshold": 0.3,
+                "drift_iou": 0.6,
+                "reverify_seconds": 10.0,
+                "max_missing_seconds": 5.0
+            },
+            "performance": {
+                "max_workers": 4,
+                "pipeline": True,
+                "queue_size": 2
+            },
+            "debug": {
+                "profiling": False,
+                "token": ""
+            },
+            "daemon": {
+                "socket": ""
             },
             "authorized_users": ["user1"],
             "system": {
                 "log_level": "INFO",
-                "log_dir": "logs"
+                "log_dir": "logs",
+                "max_log_size_mb": 10,
+                "log_rotation_count": 5,
+                "log_compress": True
             }
         }
         
@@ -131,25 +289,36 @@ class FaceUnlockSystem:
         print("✓ 已创建默认配置文件")
         self.config = default_config
     
-    def load_model(self):
+    def load_model(self, store_path=None):
         """加载人脸识别模型"""
-        model_path = 'models/face_model.pkl'
+        store_path = store_path or DEFAULT_STORE_PATH
+        model_path = LEGACY_PICKLE_PATH
         
-        if not os.path.exists(model_path):
-            print(f"✗ 模型文件不存在: {model_path}")
+        if not os.path.exists(store_path) and not os.path.exists(model_path):
+            print(f"✗ 模型文件不存在: {store_path}")
             return False
         
         try:
-            with open(model_path, 'rb') as f:
-                self.model = pickle.load(f)
+            if os.path.exists(store_path):
+                # 内存映射加载，耗时与编码数量无关，多进程共享页缓存
+                self.model = ModelStore(store_path).as_model()
+                required_keys = ['encodings', 'user_ids', 'users']
+            else:
+                print(f"⚠ 使用旧版pickle模型，建议转换: python3 core/model_store.py convert")
+                with open(model_path, 'rb') as f:
+                    self.model = pickle.load(f)
+                required_keys = ['encodings', 'names', 'users']
             
             # 验证模型内容
-            required_keys = ['encodings', 'names', 'users']
             for key in required_keys:
                 if key not in self.model:
                     print(f"✗ 模型缺少必要数据: {key}")
                     return False
             
+            # 编码整理成连续矩阵，只在加载时做一次（内存映射模型已是该布局）
+            self.matcher = EncodingMatcher.from_model(self.model)
+            self.index = self.load_index()
+            
             print(f"✓ 模型加载成功")
             print(f"  授权用户: {', '.join(self.model.get('users', []))}")
             print(f"  人脸数据: {len(self.model.get('encodings', []))} 个")
@@ -160,50 +329,112 @@ class FaceUnlockSystem:
             print(f"✗ 模型加载错误: {e}")
             return False
     
-    def capture_photo(self):
-        """拍照"""
-        temp_file = "/tmp/face_capture.jpg"
-        
-        # 使用rpicam-jpeg拍照
-        cmd = [
-            'rpicam-jpeg',
-            '-o', temp_file,
-            '--width', str(self.config.get('camera', {}).get('width', 1296)),
-            '--height', str(self.config.get('camera', {}).get('height', 972)),
-            '-t', '500',  # 0.5秒延迟
-            '-n'  # 不显示预览
-        ]
+    def reload_model(self):
+        """重新加载模型文件；失败时保留原模型"""
+        previous = (self.model, self.matcher, self.index)
+        if self.load_model(self.model_path):
+            self.log_event('model_reload', users=self.model.get('users', []),
+                           encodings=len(self.matcher))
+            return True
+        self.model, self.matcher, self.index = previous
+        return False
+    
+    @contextmanager
+    def acquire_frame(self, timeout=2.0):
+        """取一帧RGB图像；取流模式下为环形缓冲中被锁定的最新帧（零拷贝）"""
+        if self.capture_thread is not None:
+            if not self.capture_thread.wait_ready(timeout):
+                yield None
+                return
+            with self.capture_thread.buffer.latest(timeout=timeout) as ref:
+                yield ref.array if ref is not None else None
+            return
         
-        try:
-            result = subprocess.run(cmd, capture_output=True, timeout=5)
-            
-            if result.returncode == 0 and os.path.exists(temp_file):
-                return temp_file
+        if not self.camera.is_open and not self.camera.open():
+            yield None
+            return
+        
+        yield self.camera.read()
+    
+    def load_index(self):
+        """选择匹配索引：IVF近似索引、训练时生成的原型索引，或全量精确匹配"""
+        recognition = self.config.get('recognition', {})
+        index_type = recognition.get('index', 'auto')
+        
+        if index_type == 'ivf':
+            ann_config = recognition.get('ann', {})
+            ann_path = ann_config.get('path', 'models/face_ann.npz')
+            if os.path.exists(ann_path):
+                index = IVFIndex.load(ann_path, nprobe=ann_config.get('nprobe', 8))
+                if len(index) == len(self.matcher):
+                    print(f"  匹配索引: IVF ({index.nlist} 桶, nprobe={index.nprobe})")
+                    return index
+                print("⚠ IVF索引与模型不一致，请重新训练")
             else:
-                print("✗ 拍照失败")
-                if result.stderr:
-                    print(f"  错误: {result.stderr.decode()}")
-                return None
-                
-        except subprocess.TimeoutExpired:
-            print("✗ 拍照超时")
-            return None
-        except Exception as e:
-            print(f"✗ 拍照错误: {e}")
-            return None
+                print(f"⚠ IVF索引不存在: {ann_path}")
+        
+        # 小图库全量精确匹配只需零点几毫秒，auto时不值得用原型索引
+        if index_type == 'auto' and len(self.matcher) < recognition.get('prototype_min_encodings', 2000):
+            index_type = 'exact'
+        
+        if index_type in ('auto', 'prototype') and 'prototype_index' in self.model:
+            try:
+                index = PrototypeIndex(
+                    self.matcher,
+                    self.model['prototype_index'],
+                    max_candidates=recognition.get('max_candidates', 8),
+                    prune_slack=recognition.get('prune_slack', 0.1)
+                )
+                print(f"  匹配索引: 原型索引 ({len(index.prototypes)} 个原型)")
+                return index
+            except ValueError as e:
+                print(f"⚠ {e}")
+        elif index_type == 'prototype':
+            print("⚠ 模型中没有原型索引，请重新训练")
+        
+        print("  匹配索引: 精确匹配")
+        return self.matcher
     
-    def recognize_face(self, image_path):
-        """识别人脸"""
+    def capture_frame(self):
+        """拍照，返回内存中的RGB图像（拷贝，可长期持有）"""
+        with self.acquire_frame() as frame:
+            if frame is None or self.capture_thread is None:
+                return frame
+            return frame.copy()
+    
+    def encode_faces(self, image, face_locations, tracker=None):
+        """计算人脸编码；传入跟踪器时只编码新出现、漂移或到期需要重新验证的人脸"""
+        if tracker is None:
+            return self.detector.encode(image, face_locations), None
+        
+        now = time.monotonic()
+        tracks = tracker.update(face_locations, now)
+        pending = tracker.pending(tracks, now)
+        if pending:
+            fresh = self.detector.encode(image, [face_locations[i] for i in pending])
+            for i, encoding in zip(pending, fresh):
+                tracker.store_encoding(tracks[i], encoding, now)
+        
+        return [track.encoding for track in tracks], tracks
+    
+    def recognize_face(self, image, tracker=None):
+        """识别人脸（image为RGB数组或图片路径；tracker用于跨帧复用编码）"""
         if not HAS_FACE_RECOGNITION:
             print("⚠ face_recognition库未安装")
             return None
         
         try:
-            # 加载图片
-            image = face_recognition.load_image_file(image_path)
+            # 兼容传入图片路径
+            if isinstance(image, str):
+                image = face_recognition.load_image_file(image)
             
             # 检测人脸并编码
-            face_locations = face_recognition.face_locations(image)
+            detect_start = time.perf_counter()
+            face_locations = self.detector.detect(image)
+            self.mark_stage('detect', detect_start)
+            if self.prefilter is not None:
+                self.prefilter.record_detection(bool(face_locations),
+                                                time.perf_counter() - detect_start)
             
             if not face_locations:
                 print("✗ 未检测到人脸")
@@ -211,42 +442,39 @@ class FaceUnlockSystem:
             
             print(f"  检测到 {len(face_locations)} 个人脸")
             
-            # 获取人脸编码
-            face_encodings = face_recognition.face_encodings(image, face_locations)
+            # 编码期间提前唤醒Mac屏幕/建立连接，不等识别结果
+            self.on_faces_detected(face_locations)
+            
+            # 质量不足的人脸不做编码
+            if self.quality is not None:
+                quality_start = time.perf_counter()
+                face_locations, _, reasons = self.quality.filter_faces(image, face_locations)
+                self.mark_stage('quality', quality_start)
+                if not face_locations:
+                    labels = '、'.join(REASON_LABELS.get(r, r) for r in reasons)
+                    print(f"✗ 人脸质量不足: {labels}")
+                    return None
             
-            # 识别每个人脸
+            # 获取人脸编码（跟踪中的人脸复用缓存的编码）
+            encode_start = time.perf_counter()
+            face_encodings, tracks = self.encode_faces(image, face_locations, tracker)
+            self.mark_stage('encode', encode_start)
+            
+            # 所有人脸与所有已知编码一次批量比对
             tolerance = self.config.get('recognition', {}).get('tolerance', 0.4)
             
-            for face_encoding in face_encodings:
-                # 比对已知人脸
-                matches = face_recognition.compare_faces(
-                    self.model['encodings'],
-                    face_encoding,
-                    tolerance=tolerance
-                )
-                
-                if True in matches:
-                    # 找到匹配的人脸
-                    match_index = matches.index(True)
-                    name = self.model['names'][match_index]
-                    
-                    # 计算置信度
-                    face_distances = face_recognition.face_distance(
-                        self.model['encodings'],
-                        face_encoding
-                    )
-                    confidence = 1 - min(face_distances)
-                    
-                    # 检查置信度阈值
-                    min_confidence = self.config.get('recognition', {}).get('confidence_threshold', 0.6)
-                    if confidence >= min_confidence:
-                        return {
-                            'name': name,
-                            'confidence': confidence,
-                            'distance': min(face_distances)
-                        }
-                    else:
-                        print(f"  置信度太低: {confidence:.1%} < {min_confidence:.1%}")
+            match_start = time.perf_counter()
+            matches = self.index.match(face_encodings, tolerance)
+            if tracks is not None:
+                for track, match in zip(tracks, matches):
+                    track.identity = match.name if match.distance <= tolerance else None
+            
+            result = self.decide(matches)
+            self.mark_stage('match', match_start)
+            self.overlay.update(image.shape, face_locations,
+                                [m.name if m.distance <= tolerance else None for m in matches])
+            if result:
+                return result
             
             print("✗ 未识别到授权用户")
             return None
@@ -255,107 +483,260 @@ class FaceUnlockSystem:
             print(f"✗ 识别错误: {e}")
             return None
     
-    def unlock_mac(self, user):
-        """解锁Mac电脑"""
-        mac_config = self.config.get('mac', {})
+    def decide(self, matches, verbose=True):
+        """按距离从小到大，返回第一个在阈值内且置信度足够的匹配"""
+        tolerance = self.config.get('recognition', {}).get('tolerance', 0.4)
+        min_confidence = self.config.get('recognition', {}).get('confidence_threshold', 0.6)
+        
+        for match in sorted(matches, key=lambda m: m.distance):
+            if match.distance > tolerance:
+                break
+            
+            # 计算置信度
+            confidence = 1 - match.distance
+            
+            # 检查置信度阈值
+            if confidence >= min_confidence:
+                return {
+                    'name': match.name,
+                    'confidence': confidence,
+                    'distance': match.distance,
+                    'margin': match.margin
+                }
+            elif verbose:
+                print(f"  置信度太低: {confidence:.1%} < {min_confidence:.1%}")
+        
+        return None
+    
+    def iter_burst_frames(self, duration, timeout=1.0):
+        """在duration秒内从环形缓冲依次取不同的帧（拷贝后立即解锁槽位）"""
+        buffer = self.capture_thread.buffer
+        deadline = time.monotonic() + duration
+        seq = 0
+        while time.monotonic() < deadline:
+            ref = buffer.acquire(after_seq=seq, timeout=timeout)
+            if ref is None:
+                return
+            try:
+                frame = ref.array.copy()
+                seq = ref.seq
+            finally:
+                buffer.release(ref)
+            yield frame
+    
+    def recognize_burst(self):
+        """连拍投票识别：K/N帧判定为同一用户即返回，返回 (结果, 失败原因)"""
+        if not HAS_FACE_RECOGNITION:
+            print("⚠ face_recognition库未安装")
+            return None, None
+        
+        tolerance = self.config.get('recognition', {}).get('tolerance', 0.4)
+        
+        def decide(locations, encodings):
+            if locations:
+                self.on_faces_detected(locations)
+            if not encodings:
+                return None
+            matches = self.index.match(encodings, tolerance)
+            self.overlay.update(self.capture_thread.buffer.shape, locations,
+                                [m.name if m.distance <= tolerance else None for m in matches])
+            return self.decide(matches, verbose=False)
+        
+        result, voter = self.burst.recognize(self.iter_burst_frames(self.burst.window), decide)
         
-        if not mac_config.get('enabled', False):
+        if result:
+            print(f"  连拍: {result['votes']}/{voter.processed} 帧一致  用时 {result['elapsed_ms']:.0f}ms")
+            return result, None
+        
+        # 没有一帧识别出用户且有质量拒绝时，失败原因是质量而不是相机
+        if not voter.votes and voter.rejections:
+            labels = '、'.join(f"{REASON_LABELS.get(r, r)} {n}" for r, n in sorted(voter.rejections.items()))
+            print(f"✗ 人脸质量不足: {labels}")
+            return None, f"人脸质量不足: {labels}"
+        if voter.processed == 0:
+            print("✗ 拍照失败")
+            return None, '拍照失败'
+        
+        print(f"✗ 连拍 {voter.processed} 帧未达成一致")
+        return None, None
+    
+    def unlock_mac(self, user):
+        """解锁Mac电脑（等待结果）"""
+        if self.mac is None:
             print("ℹ Mac解锁未启用")
             return False
         
         print(f"🔓 触发Mac解锁...")
+        start = time.perf_counter()
+        success, status, body = self.mac.unlock(user)
+        self.record_unlock(status, start)
+        self.report_unlock(success, status, body)
+        return success
+    
+    def record_unlock(self, status, start):
+        """解锁耗时（含排队）和结果计数"""
+        self.observe_stage('unlock', time.perf_counter() - start)
+        self.metrics.counter('mac_unlocks_total', 'Mac unlock requests by outcome.',
+                             status=status).inc()
+    
+    def on_faces_detected(self, locations):
+        """检测到人脸：计数，并在编码期间提前唤醒Mac"""
+        self.metrics.counter('faces_detected_total', 'Faces found by the detector.').inc(len(locations))
+        self.wake_mac()
+    
+    def wake_mac(self):
+        """检测到人脸时调用：预先唤醒屏幕（默认）或只建立连接"""
+        if self.mac is None:
+            return
+        if self.config.get('mac', {}).get('speculative_wake', True):
+            self.mac.speculative_wake()
+        else:
+            self.mac.prewarm()
+    
+    def dispatch_unlock(self, user):
+        """发送解锁请求后立即返回，结果由后台线程打印和记录"""
+        if self.mac is None:
+            print("ℹ Mac解锁未启用")
+            return None
         
-        try:
-            # 构建请求URL
-            host = mac_config.get('host', 'localhost')
-            port = mac_config.get('port', 5001)
-            url = f"http://{host}:{port}/unlock"
-            
-            # 发送解锁请求
-            data = {
-                'user': user,
-                'key': 'face_unlock_2024'
-            }
-            
-            # 增加超时时间和重试机制
-            response = requests.post(url, json=data, timeout=15)
-            
-            if response.status_code == 200:
-                result = response.json()
-                print(f"✓ Mac解锁成功")
-                print(f"  状态: {result.get('status')}")
-                return True
-            elif response.status_code == 401:
-                print("✗ Mac解锁失败: 未授权")
-                return False
-            else:
-                print(f"✗ Mac解锁失败: HTTP {response.status_code}")
-                return False
-                
-        except requests.exceptions.Timeout:
-            print("✗ Mac解锁超时 - 但解锁可能仍在进行中")
+        print(f"🔓 触发Mac解锁...")
+        
+        # 识别期间已经完成的唤醒时间不必在解锁时再等
+        saved_ms = self.mac.wake_savings(record=True)
+        if saved_ms:
+            print(f"  预唤醒节省: {saved_ms:.0f}ms")
+        
+        start = time.perf_counter()
+        
+        def done(success, status, body):
+            self.record_unlock(status, start)
+            self.report_unlock(success, status, body)
+            self.log_event('mac_unlock', user=user, success=success, status=status,
+                           wake_saved_ms=round(saved_ms, 1))
+        
+        return self.mac.unlock_async(user, done)
+    
+    def report_unlock(self, success, status, body):
+        """打印解锁结果"""
+        mac_config = self.config.get('mac', {})
+        if status == 'ok':
+            print(f"✓ Mac解锁成功")
+            print(f"  状态: {body.get('status')}")
+        elif status == 'timeout':
             # 超时不一定意味着失败，Mac端可能仍在处理
-            return True
-        except requests.exceptions.ConnectionError:
+            print("✗ Mac解锁超时 - 但解锁可能仍在进行中")
+        elif status == 'http_401':
+            print("✗ Mac解锁失败: 未授权")
+        elif status.startswith('http_'):
+            print(f"✗ Mac解锁失败: HTTP {status[5:]}")
+        elif status == 'connection_error':
             print("✗ 无法连接到Mac解锁服务")
-            print(f"  请确保Mac上的服务运行在 {host}:{port}")
-            return False
-        except Exception as e:
-            print(f"✗ Mac解锁错误: {e}")
-            return False
+            print(f"  请确保Mac上的服务运行在 {mac_config.get('host')}:{mac_config.get('port', 5001)}")
+        else:
+            print(f"✗ Mac解锁错误: {body.get('error')}")
     
     def check_mac_service(self):
         """检查Mac服务状态"""
-        mac_config = self.config.get('mac', {})
-        
-        if not mac_config.get('enabled', False):
+        if self.mac is None:
             return False
         
-        try:
-            host = mac_config.get('host', 'localhost')
-            port = mac_config.get('port', 5001)
-            url = f"http://{host}:{port}/status"
-            
-            response = requests.get(url, timeout=2)
-            
-            if response.status_code == 200:
-                result = response.json()
-                print(f"✓ Mac服务正常: {result.get('status')}")
-                return True
-            else:
-                print(f"⚠ Mac服务异常: HTTP {response.status_code}")
-                return False
-                
-        except:
-            print("⚠ Mac服务未响应")
-            return False
+        result = self.mac.check_status()
+        if result is not None:
+            print(f"✓ Mac服务正常: {result.get('status')}")
+            return True
+        
+        print("⚠ Mac服务未响应")
+        return False
     
-    def run_once(self):
-        """运行一次识别"""
+    def begin_attempt(self, source='manual', started=None):
+        """开始一次识别尝试（source为触发来源，started为开始时刻的perf_counter值，默认现在）"""
         print("\n" + "="*40)
         print(f"识别开始 - {datetime.now().strftime('%H:%M:%S')}")
         print("-"*40)
         
         self.stats['total_attempts'] += 1
+        self.timings = {}
+        self.attempt_start = time.perf_counter() if started is None else started
+        self.trigger_source = source
+    
+    def mark_stage(self, stage, start):
+        """记录本次识别某一阶段的耗时(ms)"""
+        elapsed = time.perf_counter() - start
+        self.timings[stage] = round(elapsed * 1000, 1)
+        self.observe_stage(stage, elapsed)
+    
+    def observe_stage(self, stage, seconds):
+        """阶段耗时直方图"""
+        self.metrics.histogram('stage_seconds', 'Latency of each recognition stage.',
+                               stage=stage).observe(seconds)
+    
+    def record_result(self, result, error=None):
+        """保存最近一次识别的结果和各阶段耗时"""
+        self.mark_stage('total', self.attempt_start)
+        margin = result.get('margin') if result else None
+        self.metrics.counter('attempts_total', 'Recognition attempts by trigger source and outcome.',
+                             source=self.trigger_source or 'unknown',
+                             outcome='success' if result else 'failure').inc()
+        self.last_result = {
+            'source': self.trigger_source,
+            'success': bool(result),
+            'user': result['name'] if result else None,
+            'confidence': round(result['confidence'], 4) if result else None,
+            'distance': round(result['distance'], 4) if result else None,
+            # 只有一个授权用户时没有次优用户，margin为inf（JSON中不合法），记为None
+            'margin': round(margin, 4) if margin is not None and math.isfinite(margin) else None,
+            'error': None if result else (error or '未识别到授权用户'),
+            'timings_ms': dict(self.timings),
+            'time': datetime.now().isoformat(timespec='seconds')
+        }
+        return self.last_result
+    
+    def run_once(self, prefilter=False, track=False, source='manual'):
+        """运行一次识别；prefilter=True时前置过滤未触发返回None（不计入统计），track=True时跨帧复用编码"""
+        # 触发式识别（非持续监控）使用连拍投票
+        if self.burst is not None and not prefilter and not track:
+            self.begin_attempt(source)
+            print("📷 连拍识别中...")
+            burst_start = time.perf_counter()
+            result, error = self.recognize_burst()
+            self.mark_stage('burst', burst_start)
+            return self.finish_attempt(result, error)
         
-        # 拍照
-        print("📷 拍照中...")
-        photo_path = self.capture_photo()
-        
-        if not photo_path:
-            self.stats['failed'] += 1
-            return False
-        
-        # 识别
-        print("🔍 识别中...")
-        result = self.recognize_face(photo_path)
-        
-        # 清理临时文件
-        try:
-            os.remove(photo_path)
-        except:
-            pass
+        capture_start = time.perf_counter()
+        with self.acquire_frame() as frame:
+            if prefilter and frame is not None and not self.prefilter.passes(frame):
+                return None
+            
+            # 持续监控时跳过整帧模糊或曝光异常的帧，等下一帧
+            if prefilter and frame is not None and self.quality is not None:
+                _, reason = self.quality.frame_score(frame)
+                if reason is not None:
+                    return None
+            
+            self.begin_attempt(source)
+            self.mark_stage('capture', capture_start)
+            # 单次拍照的相机：拍照耗时中包含JPEG解码
+            if self.capture_thread is None and self.camera.decode_seconds is not None:
+                self.timings['decode'] = round(self.camera.decode_seconds * 1000, 1)
+                self.observe_stage('decode', self.camera.decode_seconds)
+            
+            # 拍照
+            print("📷 拍照中...")
+            if frame is None:
+                print("✗ 拍照失败")
+                self.stats['failed'] += 1
+                self.record_result(None, '拍照失败')
+                return False
+            
+            # 识别
+            print("🔍 识别中...")
+            result = self.recognize_face(frame, self.tracker if track else None)
         
+        return self.finish_attempt(result)
+    
+    def finish_attempt(self, result, error=None):
+        """处理识别结果：统计、解锁、日志"""
+        self.record_result(result, error)
         if result:
             name = result['name']
             confidence = result['confidence']
@@ -366,22 +747,73 @@ class FaceUnlockSystem:
             
             self.stats['successful'] += 1
             
-            # 解锁Mac
-            if self.config.get('mac', {}).get('enabled', False):
-                self.unlock_mac(name)
-            
-            # 记录日志
-            self.log_event(f"识别成功: {name} ({confidence:.1%})")
+            # 解锁Mac（后台发送，不阻塞识别线程）
+            if self.mac is not None:
+                self.dispatch_unlock(name)
             
+            self.log_recognition()
             return True
         else:
             print("\n✗ 识别失败")
             self.stats['failed'] += 1
-            self.log_event("识别失败: 未识别到授权用户")
+            self.log_recognition()
             return False
     
+    def log_recognition(self):
+        """把最近一次识别结果写入事件日志"""
+        record = dict(self.last_result)
+        record.pop('time', None)
+        record['outcome'] = 'success' if record.pop('success') else 'failure'
+        self.log_event('recognition', **record)
+    
+    def create_pipeline(self):
+        """持续监控流水线：采集、检测、编码、匹配并行进行，由触发事件激活"""
+        performance = self.config.get('performance', {})
+        tolerance = self.config.get('recognition', {}).get('tolerance', 0.4)
+        
+        return RecognitionPipeline(
+            self.capture_thread.buffer,
+            self.pool,
+            self.pool_workers,
+            match=lambda encodings: self.index.match(encodings, tolerance),
+            decide=self.decide,
+            tolerance=tolerance,
+            prefilter=self.prefilter,
+            quality=self.quality,
+            tracker=self.tracker,
+            on_faces=self.on_faces_detected,
+            observe=self.observe_stage,
+            queue_size=performance.get('queue_size', 2),
+            active=False
+        )
+    
+    def setup_gpio_trigger(self):
+        """PIR/GPIO按钮触发源（utils/trigger_handler.py），不可用时跳过"""
+        pir_config = self.config.get('pir_sensor', {})
+        if not pir_config.get('enabled', False):
+            return None
+        
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+        try:
+            from trigger_handler import TriggerHandler
+        except Exception as e:
+            print(f"⚠ GPIO触发不可用: {e}")
+            return None
+        
+        handler = TriggerHandler(lambda: self.scheduler.post('gpio'))
+        handler.setup_gpio_button(pir_config.get('gpio_pin', 17))
+        print(f"  GPIO触发: 引脚 {pir_config.get('gpio_pin', 17)}")
+        return handler
+    
+    def trigger(self, source='web'):
+        """外部触发一次识别：持续监控运行中时投递事件，否则直接识别"""
+        if self.scheduler is not None and self.scheduler.running:
+            self.scheduler.post(source)
+            return None
+        return self.run_once(source=source)
+    
     def run_continuous(self):
-        """持续监控模式"""
+        """持续监控模式（事件驱动）"""
         print("\n=== 持续监控模式 ===")
         print("按 Ctrl+C 停止\n")
         
@@ -389,37 +821,106 @@ class FaceUnlockSystem:
         if self.config.get('mac', {}).get('enabled', False):
             self.check_mac_service()
         
-        interval = self.config.get('recognition', {}).get('check_interval', 3.0)
-        last_success_time = 0
-        cooldown = 30  # 成功后的冷却时间（秒）
+        events_config = self.config.get('events', {})
+        cooldown = events_config.get('cooldown', 30)  # 成功后的冷却时间（秒）
+        # 一次触发后流水线保持工作的时间
+        active_window = events_config.get('active_window', 5.0)
+        
+        self.scheduler = EventScheduler(max_latency_age=active_window + 5.0)
+        
+        def end_cooldown():
+            print("\n▶ 冷却结束，等待触发\n")
+        
+        def on_decision(result, info=None):
+            """得出识别结果：统计各触发源延迟，成功后进入冷却"""
+            self.scheduler.resolve()
+            if self.finish_attempt(result):
+                print(f"\n⏸ 进入冷却期 {cooldown}秒\n")
+                if self.pipeline is not None:
+                    self.pipeline.deactivate()
+                self.scheduler.start_cooldown(cooldown, end_cooldown)
+            self.show_stats()
+        
+        def on_pipeline_decision(result, info):
+            self.overlay.update(info['shape'], info['boxes'], info['names'])
+            # 流水线判定时本次识别已经结束：从这一帧的采集时刻算起，
+            # 各阶段耗时取自流水线（直方图已由流水线记录，这里不重复记录）
+            self.begin_attempt(last_trigger['source'],
+                               started=time.perf_counter() - info['latency_ms'] / 1000)
+            self.timings.update(info['timings_ms'])
+            print(f"🔍 {info['faces']} 个人脸  帧延迟 {info['latency_ms']:.0f}ms")
+            if not result:
+                print("✗ 未识别到授权用户")
+            on_decision(result, info)
+        
+        # 最近一次激活流水线的触发来源
+        last_trigger = {'source': None}
+        
+        def handle(event):
+            self.scheduler.mark_pending(event)
+            
+            # 常驻相机：恢复全帧率采集并激活流水线一段时间，由流水线线程得出结果
+            if self.pipeline is not None:
+                last_trigger['source'] = event.source
+                self.capture_thread.wake(active_window)
+                self.pipeline.activate(active_window)
+                return
+            
+            # 单次拍照：运动和定时触发先经过前置过滤，手动触发直接识别
+            filtered = event.source in ('motion', 'timer') and self.prefilter is not None
+            result = self.run_once(prefilter=filtered, track=True, source=event.source)
+            if result is None:
+                self.scheduler.discard(event.source)
+                return
+            on_decision(result)
+        
+        # 触发源
+        motion = None
+        if self.capture_thread is not None:
+            if self.pool is not None and self.config.get('performance', {}).get('pipeline', True):
+                self.pipeline = self.create_pipeline()
+                self.pipeline.start(on_pipeline_decision)
+                print(f"  流水线: {self.pool_workers} 个检测/编码进程")
+            
+            prefilter_config = self.config.get('prefilter', {})
+            motion = MotionSource(
+                self.capture_thread.buffer,
+                self.scheduler,
+                MotionGate(
+                    width=prefilter_config.get('motion_width', 160),
+                    pixel_threshold=prefilter_config.get('motion_threshold', 25),
+                    min_changed_ratio=prefilter_config.get('min_changed_ratio', 0.002)
+                ),
+                fps=events_config.get('motion_fps', 5.0)
+            )
+            motion.start()
+            print(f"  运动触发: {events_config.get('motion_fps', 5.0):.0f} fps")
+            
+            # 流水线空闲时采集线程只以运动检测需要的帧率读帧
+            if self.pipeline is not None:
+                idle_fps = events_config.get('idle_fps', 2.0)
+                self.capture_thread.set_idle_rate(idle_fps)
+                if idle_fps > 0:
+                    print(f"  空闲采集: {idle_fps:.0f} fps")
+        
+        # 单次拍照的相机没有运动检测，默认按check_interval定时触发
+        default_interval = 0 if self.capture_thread is not None else \
+            self.config.get('recognition', {}).get('check_interval', 3.0)
+        timer_interval = events_config.get('timer_interval') or default_interval
+        if timer_interval:
+            self.scheduler.every(timer_interval, 'timer')
+            print(f"  定时触发: 每 {timer_interval}秒")
+        
+        self.setup_gpio_trigger()
+        print("\n💤 等待触发...\n")
         
         try:
-            while True:
-                current_time = time.time()
-                
-                # 检查冷却时间
-                if last_success_time > 0 and current_time - last_success_time < cooldown:
-                    remaining = cooldown - (current_time - last_success_time)
-                    print(f"⏳ 冷却中... {remaining:.0f}秒", end='\r')
-                    time.sleep(1)
-                    continue
-                
-                # 执行识别
-                success = self.run_once()
-                
-                if success:
-                    last_success_time = current_time
-                    print(f"\n⏸ 进入冷却期 {cooldown}秒\n")
-                
-                # 显示统计
-                self.show_stats()
-                
-                # 等待下次检测
-                print(f"\n💤 等待 {interval}秒...\n")
-                time.sleep(interval)
-                
+            self.scheduler.run(handle)
         except KeyboardInterrupt:
             self.shutdown()
+        finally:
+            if motion is not None:
+                motion.stop()
     
     def run_manual(self):
         """手动触发模式"""
@@ -470,11 +971,11 @@ class FaceUnlockSystem:
     
     def test_camera(self):
         """测试相机"""
-        photo = self.capture_photo()
-        if photo:
-            size = os.path.getsize(photo)
-            print(f"✓ 相机正常 (照片大小: {size/1024:.1f}KB)")
-            os.remove(photo)
+        start = time.time()
+        frame = self.capture_frame()
+        if frame is not None:
+            elapsed = (time.time() - start) * 1000
+            print(f"✓ 相机正常 ({self.camera.name}, {frame.shape[1]}x{frame.shape[0]}, {elapsed:.0f}ms)")
         else:
             print("✗ 相机测试失败")
     
@@ -497,7 +998,83 @@ class FaceUnlockSystem:
     def test_full_process(self):
         """测试完整流程"""
         print("执行完整识别流程...")
-        self.run_once()
+        self.run_once(source='test')
+    
+    def register_metrics(self):
+        """各模块已有的统计在抓取/metrics时读取，不占用识别路径"""
+        def collect():
+            samples = []
+            if self.capture_thread is not None:
+                capture = self.capture_thread.get_stats()
+                samples += [
+                    ('capture_fps', 'gauge', 'Camera producer frame rate.', {},
+                     capture.get('producer_fps', 0)),
+                    ('capture_frames_dropped_total', 'counter', 'Frames overwritten before being read.',
+                     {}, capture.get('dropped', 0)),
+                    ('capture_consumer_lag_seconds', 'gauge', 'Smoothed age of frames when consumed.',
+                     {}, capture.get('consumer_lag_ms', 0) / 1000)
+                ]
+            if self.quality is not None:
+                for level, stats in self.quality.get_stats().items():
+                    # level: frames（整帧检查）/ faces（人脸检查）
+                    labels = {'level': level[:-1]}
+                    samples += [
+                        ('quality_checked_total', 'counter', 'Frames or faces checked by the quality gate.',
+                         labels, stats['checked']),
+                        ('quality_passed_total', 'counter', 'Frames or faces that passed the quality gate.',
+                         labels, stats['passed'])
+                    ]
+                    for reason, count in stats['rejections'].items():
+                        samples.append(('quality_rejections_total', 'counter',
+                                        'Frames or faces rejected by the quality gate.',
+                                        dict(labels, reason=reason), count))
+            if self.tracker is not None:
+                tracking = self.tracker.get_stats()
+                samples += [
+                    ('tracking_encodes_total', 'counter', 'Face encodings computed.', {},
+                     tracking['encodes']),
+                    ('tracking_reuses_total', 'counter', 'Face encodings reused from a track.', {},
+                     tracking['reuses']),
+                    ('tracking_active_tracks', 'gauge', 'Faces currently tracked.', {},
+                     tracking['active_tracks'])
+                ]
+            if self.pipeline is not None:
+                pipeline = self.pipeline.get_stats()
+                samples += [
+                    ('pipeline_frames_dropped_total', 'counter', 'Frames dropped from the pipeline queue.',
+                     {}, pipeline['dropped']),
+                    ('pipeline_frames_skipped_total', 'counter', 'Frames rejected by the prefilter.',
+                     {}, pipeline['skipped']),
+                    ('pipeline_inflight', 'gauge', 'Detect/encode tasks in flight.', {},
+                     pipeline['inflight'])
+                ]
+            if self.scheduler is not None:
+                for source, stats in self.scheduler.get_stats().items():
+                    samples += [
+                        ('triggers_total', 'counter', 'Trigger events received.', {'source': source},
+                         stats['received']),
+                        ('triggers_dropped_total', 'counter', 'Trigger events dropped during cooldown.',
+                         {'source': source}, stats['dropped'])
+                    ]
+            if self.mac is not None:
+                mac = self.mac.get_stats()
+                samples += [
+                    ('mac_retries_total', 'counter', 'Mac requests retried after connect errors.', {},
+                     mac['retries']),
+                    ('mac_dropped_total', 'counter', 'Mac requests dropped on a full queue.', {},
+                     mac['dropped']),
+                    ('mac_wakes_total', 'counter', 'Speculative screen wakes sent.', {}, mac['wakes']),
+                    ('mac_queue_depth', 'gauge', 'Mac requests waiting to be sent.', {}, mac['queued'])
+                ]
+            log = self.event_log.get_stats()
+            samples += [
+                ('log_records_total', 'counter', 'Event log records written.', {}, log['written']),
+                ('log_dropped_total', 'counter', 'Event log records dropped on a full queue.', {},
+                 log['dropped'])
+            ]
+            return samples
+        
+        self.metrics.collector(collect)
     
     def show_stats(self):
         """显示统计信息"""
@@ -517,21 +1094,67 @@ class FaceUnlockSystem:
         print(f"成功: {self.stats['successful']}")
         print(f"失败: {self.stats['failed']}")
         print(f"成功率: {success_rate:.1f}%")
-        print("="*40)
-    
-    def log_event(self, message):
-        """记录事件日志"""
-        log_dir = self.config.get('system', {}).get('log_dir', 'logs')
-        os.makedirs(log_dir, exist_ok=True)
         
-        timestamp = datetime.now()
-        log_file = os.path.join(log_dir, f"face_unlock_{timestamp.strftime('%Y%m%d')}.log")
+        if self.capture_thread is not None:
+            capture = self.capture_thread.get_stats()
+            print(f"采集帧率: {capture.get('producer_fps', 0):.1f} fps")
+            print(f"丢帧: {capture.get('dropped', 0)}  消费延迟: {capture.get('consumer_lag_ms', 0):.0f}ms")
         
-        try:
-            with open(log_file, 'a') as f:
-                f.write(f"{timestamp}: {message}\n")
-        except Exception as e:
-            print(f"⚠ 日志记录失败: {e}")
+        if self.prefilter is not None:
+            for name, stage in self.prefilter.get_stats().items():
+                if stage['calls']:
+                    print(f"过滤[{name}]: 命中率 {stage['hit_rate']:.1%}  "
+                          f"平均 {stage['avg_ms']:.1f}ms  共 {stage['total_ms'] / 1000:.1f}秒")
+        
+        if self.pipeline is not None:
+            pipeline = self.pipeline.get_stats()
+            print(f"流水线: 检测 {pipeline['detect']['count']} 帧 ({pipeline['detect']['avg_ms']:.0f}ms)  "
+                  f"编码 {pipeline['encode']['count']} 次 ({pipeline['encode']['avg_ms']:.0f}ms)  "
+                  f"帧延迟 {pipeline['latency']['avg_ms']:.0f}ms  丢帧 {pipeline['dropped']}")
+        
+        if self.burst is not None and self.burst.stats['bursts']:
+            burst = self.burst.get_stats()
+            print(f"连拍识别: {burst['bursts']} 次  平均 {burst['avg_frames']:.1f} 帧  "
+                  f"{burst['avg_ms']:.0f}ms  提前结束 {burst['early_exits']} 次")
+        
+        if self.scheduler is not None:
+            for source, stats in self.scheduler.get_stats().items():
+                latency = stats['latency']
+                line = f"触发[{source}]: {stats['received']} 次  冷却期丢弃 {stats['dropped']}"
+                if latency['count']:
+                    line += f"  延迟 p50 {latency['p50_ms']:.0f}ms  p95 {latency['p95_ms']:.0f}ms"
+                print(line)
+        
+        if self.mac is not None and self.mac.stats['sent']:
+            mac = self.mac.get_stats()
+            print(f"Mac解锁: 发送 {mac['sent']}  成功 {mac['succeeded']}  失败 {mac['failed']}  "
+                  f"重试 {mac['retries']}  平均 {mac['avg_ms']:.0f}ms")
+            if mac['woken_unlocks']:
+                print(f"预唤醒: {mac['wakes']} 次  平均节省 {mac['avg_wake_saved_ms']:.0f}ms")
+        
+        if self.quality is not None and self.quality.checked:
+            for level, label in (('frames', '整帧'), ('faces', '人脸')):
+                quality = self.quality.get_stats()[level]
+                if not quality['checked']:
+                    continue
+                rejections = '  '.join(f"{REASON_LABELS.get(r, r)} {n}"
+                                       for r, n in sorted(quality['rejections'].items()))
+                print(f"质量检查[{label}]: 通过 {quality['passed']}/{quality['checked']}  "
+                      f"平均 {quality['avg_ms']:.1f}ms  {rejections}")
+        
+        if self.tracker is not None and self.tracker.encodes:
+            tracking = self.tracker.get_stats()
+            print(f"人脸跟踪: 编码 {tracking['encodes']} 次  复用 {tracking['reuses']} 次  "
+                  f"复用率 {tracking['reuse_rate']:.1%}")
+        
+        log = self.event_log.get_stats()
+        if log['dropped'] or log['errors']:
+            print(f"事件日志: 写入 {log['written']}  丢弃 {log['dropped']}  错误 {log['errors']}")
+        print("="*40)
+    
+    def log_event(self, event, **fields):
+        """记录结构化事件日志（放入队列后立即返回）"""
+        self.event_log.write(event, **fields)
     
     def signal_handler(self, signum, frame):
         """信号处理"""
@@ -539,15 +1162,31 @@ class FaceUnlockSystem:
         self.shutdown()
     
     def shutdown(self):
-        """关闭系统"""
+        """关闭系统并退出"""
         print("\n正在关闭系统...")
+        self.close()
         self.show_stats()
         print("\n👋 再见！")
         sys.exit(0)
+    
+    def close(self):
+        """停止所有后台线程和进程池，释放相机"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+        if self.mac is not None:
+            self.mac.stop()
+        if self.capture_thread is not None:
+            self.capture_thread.stop()
+        self.camera.close()
+        self.event_log.stop()
 
 
-def main():
-    """主函数"""
+def main(config_path='config.json', model_path=None):
+    """交互菜单（非交互的子命令见cli.py）"""
     # 检查是否在树莓派上运行
     if not os.path.exists('/usr/bin/rpicam-jpeg'):
         print("⚠ 警告: 未检测到rpicam-jpeg")
@@ -557,7 +1196,7 @@ def main():
     
     # 初始化系统
     try:
-        system = FaceUnlockSystem()
+        system = FaceUnlockSystem(config_path, model_path)
     except Exception as e:
         print(f"\n✗ 系统初始化失败: {e}")
         return 1
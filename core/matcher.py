@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+人脸编码匹配 - 连续矩阵上的批量最近邻
+Face encoding matcher - batched nearest neighbour over a contiguous matrix
+
+模型加载时把所有编码整理成一个 float32 (N, 128) 矩阵并预先计算范数，
+一次矩阵乘法即可得到所有检测到的人脸与所有已知编码之间的欧氏距离。
+"""
+from collections import namedtuple
+
+import numpy as np
+
+
+# index: 原模型中的编码序号, margin: 与最近的"其他用户"的距离差
+MatchResult = namedtuple('MatchResult', ['index', 'name', 'distance', 'margin'])
+
+
+def pairwise_distances(queries, encodings, sq_norms=None):
+    """批量欧氏距离 (M, D) x (N, D) -> (M, N)"""
+    queries = np.asarray(queries, dtype=np.float32)
+    if queries.ndim == 1:
+        queries = queries[np.newaxis, :]
+
+    if sq_norms is None:
+        sq_norms = np.einsum('ij,ij->i', encodings, encodings)
+
+    # |q-k|^2 = |q|^2 + |k|^2 - 2 q·k
+    q_norms = np.einsum('ij,ij->i', queries, queries)
+    d2 = queries @ encodings.T
+    d2 *= -2.0
+    d2 += q_norms[:, np.newaxis]
+    d2 += sq_norms[np.newaxis, :]
+    np.maximum(d2, 0.0, out=d2)
+    return np.sqrt(d2, out=d2)
+
+
+class EncodingMatcher:
+    """已知人脸编码的批量匹配器"""
+
+    def __init__(self, encodings, row_user, users, sq_norms=None, source_index=None):
+        """encodings必须已按用户分组（同一用户的行连续），row_user为每行的用户序号"""
+        self.encodings = encodings
+        self.row_user = row_user
+        self.users = list(users)
+        self.sq_norms = (sq_norms if sq_norms is not None
+                         else np.einsum('ij,ij->i', encodings, encodings))
+        self.source_index = source_index
+        self.user_starts = np.searchsorted(row_user, np.arange(len(self.users)))
+
+    @classmethod
+    def from_names(cls, encodings, names):
+        """从编码列表和姓名列表创建（任意顺序）"""
+        names = list(names)
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(len(names), -1)
+
+        # 按用户分组排列（用户按首次出现的顺序），便于用reduceat求每个用户的最小距离
+        users = list(dict.fromkeys(names))
+        user_ids = {user: i for i, user in enumerate(users)}
+        labels = np.array([user_ids[name] for name in names], dtype=np.int32)
+        order = np.argsort(labels, kind='stable')
+
+        return cls(
+            np.ascontiguousarray(encodings[order]),
+            labels[order],
+            users,
+            source_index=order
+        )
+
+    @classmethod
+    def from_model(cls, model):
+        """从模型字典创建；模型存储文件中的编码已分组，直接使用内存映射"""
+        if 'user_ids' in model:
+            return cls(model['encodings'], model['user_ids'], model['users'],
+                       sq_norms=model.get('sq_norms'))
+        return cls.from_names(model['encodings'], model['names'])
+
+    def __len__(self):
+        return len(self.row_user)
+
+    def name_of(self, row):
+        """矩阵第row行对应的用户名"""
+        return self.users[self.row_user[row]]
+
+    def model_index(self, row):
+        """矩阵第row行在原始模型中的序号"""
+        return int(self.source_index[row]) if self.source_index is not None else int(row)
+
+    def distances(self, queries):
+        """所有查询与所有已知编码的距离矩阵 (M, N)"""
+        return pairwise_distances(queries, self.encodings, self.sq_norms)
+
+    def user_distances(self, distances):
+        """每个用户的最小距离 (M, U)"""
+        return np.minimum.reduceat(distances, self.user_starts, axis=1)
+
+    def match(self, queries, tolerance=None):
+        """批量匹配，每个查询返回一个MatchResult（tolerance仅为与索引接口一致）"""
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        if len(queries) == 0 or len(self) == 0:
+            return []
+
+        distances = self.distances(queries)
+        rows = np.arange(len(queries))
+        best = distances.argmin(axis=1)
+        best_distance = distances[rows, best]
+
+        if len(self.users) > 1:
+            per_user = self.user_distances(distances)
+            per_user[rows, self.row_user[best]] = np.inf
+            margin = per_user.min(axis=1) - best_distance
+        else:
+            margin = np.full(len(queries), np.inf, dtype=np.float32)
+
+        return [
+            MatchResult(self.model_index(b), self.name_of(b), float(d), float(m))
+            for b, d, m in zip(best, best_distance, margin)
+        ]
+
+
+def kmeans(data, k, iterations=20, seed=0):
+    """简单k-means（k-means++初始化），返回 (k', D) 聚类中心"""
+    data = np.asarray(data, dtype=np.float32)
+    k = min(k, len(data))
+    if k <= 0:
+        return np.empty((0, data.shape[1]), dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    centers = [data[rng.integers(len(data))]]
+    closest = pairwise_distances(data, centers[0][np.newaxis, :])[:, 0] ** 2
+    for _ in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            break
+        choice = rng.choice(len(data), p=closest / total)
+        centers.append(data[choice])
+        closest = np.minimum(closest, pairwise_distances(data, data[choice][np.newaxis, :])[:, 0] ** 2)
+    centers = np.array(centers, dtype=np.float32)
+
+    for _ in range(iterations):
+        assign = pairwise_distances(data, centers).argmin(axis=1)
+        updated = centers.copy()
+        for c in range(len(centers)):
+            members = data[assign == c]
+            if len(members):
+                updated[c] = members.mean(axis=0)
+        if np.allclose(updated, centers, atol=1e-5):
+            break
+        centers = updated
+
+    return centers
+
+
+def build_prototype_index(encodings, names, prototypes_per_user=4):
+    """训练时构建原型索引：每个用户一个中心 + 若干k-means原型"""
+    names = list(names)
+    encodings = np.asarray(encodings, dtype=np.float32).reshape(len(names), -1)
+    users = sorted(set(names))
+    name_array = np.array(names, dtype=object)
+
+    centroids = []
+    prototypes = []
+    prototype_users = []
+    for user_id, user in enumerate(users):
+        rows = encodings[name_array == user]
+        centroid = rows.mean(axis=0)
+        centroids.append(centroid)
+
+        # 中心本身也作为一个原型
+        user_prototypes = [centroid]
+        if len(rows) > 1 and prototypes_per_user > 1:
+            user_prototypes.extend(kmeans(rows, prototypes_per_user - 1, seed=user_id))
+        prototypes.extend(user_prototypes)
+        prototype_users.extend([user_id] * len(user_prototypes))
+
+    return {
+        'version': 1,
+        'users': users,
+        'centroids': np.array(centroids, dtype=np.float32),
+        'prototypes': np.array(prototypes, dtype=np.float32),
+        'prototype_users': np.array(prototype_users, dtype=np.int32)
+    }
+
+
+class PrototypeIndex:
+    """
+    原型索引 - 先用原型粗筛候选用户，再对候选用户的全部编码精确重排。
+
+    每个用户记录"半径"：其编码到最近的本人原型的最大距离。由三角不等式，
+    查询到该用户任一编码的距离不小于 (到其最近原型的距离 - 半径)。
+    粗筛后，下界不超过当前第二名距离（最优结果超过tolerance时为tolerance）的
+    被剪掉用户都会补充精确计算：最优距离在tolerance以内时，用户、距离和间隔
+    与精确匹配完全一致；超过tolerance时保证同样被拒绝（tolerance=None时总是一致）。
+    """
+
+    def __init__(self, matcher, index_data, max_candidates=8, prune_slack=0.1):
+        if set(index_data['users']) != set(matcher.users):
+            raise ValueError("原型索引与模型用户不一致，请重新训练")
+
+        self.matcher = matcher
+        self.max_candidates = max_candidates
+        self.prune_slack = prune_slack
+
+        # 原型的用户序号换算为匹配器中的用户序号
+        user_ids = {user: i for i, user in enumerate(matcher.users)}
+        mapping = np.array([user_ids[user] for user in index_data['users']], dtype=np.int32)
+        prototype_users = mapping[np.asarray(index_data['prototype_users'], dtype=np.int32)]
+        order = np.argsort(prototype_users, kind='stable')
+        self.prototypes = np.ascontiguousarray(
+            np.asarray(index_data['prototypes'], dtype=np.float32)[order])
+        self.prototype_users = prototype_users[order]
+        self.sq_norms = np.einsum('ij,ij->i', self.prototypes, self.prototypes)
+        self.prototype_starts = np.searchsorted(
+            self.prototype_users, np.arange(len(matcher.users)))
+
+        # 每个用户在匹配矩阵中的行范围
+        self.row_ranges = list(zip(
+            matcher.user_starts,
+            list(matcher.user_starts[1:]) + [len(matcher)]
+        ))
+        self.radii = self.user_radii()
+
+        self.queries = 0
+        self.rows_scored = 0
+        self.rescored_users = 0
+
+    def user_radii(self):
+        """每个用户的编码到最近本人原型的最大距离（加上float32误差余量）"""
+        prototype_ends = list(self.prototype_starts[1:]) + [len(self.prototypes)]
+        radii = np.zeros(len(self.matcher.users), dtype=np.float32)
+        for user, (start, end) in enumerate(self.row_ranges):
+            if end > start:
+                distances = pairwise_distances(
+                    self.matcher.encodings[start:end],
+                    self.prototypes[self.prototype_starts[user]:prototype_ends[user]])
+                radii[user] = distances.min(axis=1).max()
+        return radii + 1e-4
+
+    def __len__(self):
+        return len(self.matcher)
+
+    def candidates(self, user_distances):
+        """粗筛：距离最近原型不超过 best + prune_slack 的用户（至少两个），最多max_candidates个"""
+        count = min(self.max_candidates, len(user_distances))
+        nearest = np.argpartition(user_distances, count - 1)[:count]
+        nearest = nearest[np.argsort(user_distances[nearest])]
+        limit = user_distances[nearest[0]] + self.prune_slack
+        keep = user_distances[nearest] <= limit
+        keep[:2] = True
+        return nearest[keep]
+
+    def rescore(self, query, users, user_exact, best):
+        """精确计算users的全部编码，更新每个用户的最小距离和最优 (距离, 行)"""
+        rows = np.concatenate([np.arange(*self.row_ranges[u]) for u in users])
+        self.rows_scored += len(rows)
+        if len(rows) == 0:
+            return best
+        exact = pairwise_distances(query, self.matcher.encodings[rows],
+                                   self.matcher.sq_norms[rows])[0]
+        np.minimum.at(user_exact, self.matcher.row_user[rows], exact)
+        i = int(exact.argmin())
+        if exact[i] < best[0]:
+            best = (float(exact[i]), int(rows[i]))
+        return best
+
+    def match(self, queries, tolerance=None):
+        """批量匹配，结果与EncodingMatcher.match相同"""
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        if len(queries) == 0 or len(self) == 0:
+            return []
+
+        proto_distances = pairwise_distances(queries, self.prototypes, self.sq_norms)
+        user_distances = np.minimum.reduceat(proto_distances, self.prototype_starts, axis=1)
+        # 到各用户编码的距离下界
+        lower_bounds = user_distances - self.radii
+
+        results = []
+        for query, per_user, bounds in zip(queries, user_distances, lower_bounds):
+            self.queries += 1
+            user_exact = np.full(len(self.matcher.users), np.inf, dtype=np.float32)
+            scored = np.zeros(len(user_exact), dtype=bool)
+            candidates = self.candidates(per_user)
+            scored[candidates] = True
+            best = self.rescore(query, candidates, user_exact, (np.inf, -1))
+
+            # 被剪掉的用户只要下界足够小就可能改变结果，补充精确计算直到没有这样的用户
+            while True:
+                best_user = self.matcher.row_user[best[1]]
+                others = user_exact.copy()
+                others[best_user] = np.inf
+                runner_up = float(others.min())
+                limit = runner_up
+                if tolerance is not None and best[0] > tolerance:
+                    limit = min(limit, tolerance)
+                extra = np.flatnonzero(~scored & (bounds <= limit))
+                if len(extra) == 0:
+                    break
+                self.rescored_users += len(extra)
+                scored[extra] = True
+                best = self.rescore(query, extra, user_exact, best)
+
+            results.append(MatchResult(
+                self.matcher.model_index(best[1]),
+                self.matcher.name_of(best[1]),
+                best[0],
+                runner_up - best[0]
+            ))
+
+        return results
+
+    def get_stats(self):
+        """索引统计"""
+        return {
+            'queries': self.queries,
+            'avg_rows_scored': round(self.rows_scored / self.queries, 1) if self.queries else 0,
+            'total_rows': len(self),
+            'rescored_users': self.rescored_users
+        }
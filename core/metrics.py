@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+运行指标 - 各阶段延迟直方图、计数器和进程资源，输出Prometheus文本格式
+Metrics - per-stage latency histograms, counters and process gauges in Prometheus text format
+
+热路径上只做一次二分查找和一次无竞争的加锁；
+各模块已有的统计（质量检查、Mac发送、跟踪等）在抓取时由collector读取，不增加热路径开销。
+"""
+import bisect
+import os
+import threading
+
+
+# 延迟直方图的桶上界（秒），覆盖从匹配(~1ms)到Mac解锁(数秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """单调递增计数"""
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Histogram:
+    """累积直方图"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        """返回 ([(上界, 累积次数)], 总和, 总次数)"""
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.bounds + (float('inf'),), counts):
+            running += count
+            cumulative.append((bound, running))
+        return cumulative, total, running
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{escape_label(value)}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+def read_rss_bytes():
+    """当前进程常驻内存（/proc不可用时退回峰值RSS）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_samples():
+    """进程CPU时间、常驻内存和线程数"""
+    times = os.times()
+    return [
+        ('process_cpu_seconds_total', 'counter', 'Total user and system CPU time in seconds.',
+         {}, times.user + times.system),
+        ('process_resident_memory_bytes', 'gauge', 'Resident memory size in bytes.',
+         {}, read_rss_bytes()),
+        ('process_threads', 'gauge', 'Number of Python threads.',
+         {}, threading.active_count())
+    ]
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self, prefix='face_unlock'):
+        self.prefix = prefix
+        # 名字 -> (类型, 说明, {标签元组: 指标})
+        self.families = {}
+        self.collectors = [process_samples]
+        self.lock = threading.Lock()
+
+    def _child(self, kind, factory, name, help_text, labels):
+        full_name = f"{self.prefix}_{name}"
+        key = tuple(sorted(labels.items()))
+        family = self.families.get(full_name)
+        if family is not None:
+            child = family[2].get(key)
+            if child is not None:
+                return child
+
+        with self.lock:
+            family = self.families.setdefault(full_name, (kind, help_text, {}))
+            return family[2].setdefault(key, factory())
+
+    def counter(self, name, help_text='', **labels):
+        """取（或创建）计数器；热路径上应缓存返回值"""
+        return self._child('counter', Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text='', buckets=DEFAULT_BUCKETS, **labels):
+        """取（或创建）直方图"""
+        return self._child('histogram', lambda: Histogram(buckets), name, help_text, labels)
+
+    def collector(self, collect):
+        """注册抓取时调用的函数，返回 [(名字, 类型, 说明, 标签, 值)]，名字不带前缀"""
+        def prefixed():
+            return [(f"{self.prefix}_{name}",) + tuple(rest) for name, *rest in collect()]
+        self.collectors.append(prefixed)
+
+    def render(self):
+        """Prometheus文本格式"""
+        lines = []
+        with self.lock:
+            families = sorted((name, kind, help_text, dict(children))
+                              for name, (kind, help_text, children) in self.families.items())
+
+        for name, kind, help_text, children in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in sorted(children.items()):
+                if kind == 'counter':
+                    lines.append(f"{name}{format_labels(key)} {format_value(metric.value)}")
+                    continue
+                buckets, total, count = metric.snapshot()
+                for bound, cumulative in buckets:
+                    labels = key + (('le', format_value(bound)),)
+                    lines.append(f"{name}_bucket{format_labels(labels)} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(key)} {format_value(round(total, 6))}")
+                lines.append(f"{name}_count{format_labels(key)} {count}")
+
+        # collector的样本按名字分组输出
+        grouped = {}
+        for collect in self.collectors:
+            try:
+                samples = collect()
+            except Exception as e:
+                print(f"⚠ 指标采集失败: {e}")
+                continue
+            for name, kind, help_text, labels, value in samples:
+                entry = grouped.setdefault(name, (kind, help_text, []))
+                entry[2].append((tuple(sorted(labels.items())), value))
+
+        for name, (kind, help_text, samples) in sorted(grouped.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in samples:
+                lines.append(f"{name}{format_labels(key)} {format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
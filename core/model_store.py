@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+人脸模型存储 - 内存映射的二进制格式
+Face model store - versioned, memory-mapped binary format
+
+文件布局:
+  8字节魔数 | uint32 版本 | uint32 头部长度 | JSON头部 | 64字节对齐的数组数据
+
+编码矩阵以float32按用户分组连续存放（与.npy相同的行主序布局），
+用户名只在头部的用户表中存一次，每行只存一个int32用户序号。
+加载时用np.memmap映射整个文件，耗时与编码数量无关，
+多个进程（core/main.py、web_trigger.py）共享同一份页缓存。
+
+转换旧模型:
+  python3 core/model_store.py convert models/face_model.pkl models/face_model.bin
+"""
+import json
+import os
+import pickle
+import struct
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from matcher import EncodingMatcher
+
+
+MAGIC = b'FACEMDL\x00'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+PREAMBLE = struct.Struct('<8sII')
+
+DEFAULT_STORE_PATH = 'models/face_model.bin'
+LEGACY_PICKLE_PATH = 'models/face_model.pkl'
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_store(path, encodings, names, meta=None, prototype_index=None):
+    """写入模型文件（先写临时文件再原子替换），返回写入的行数"""
+    matcher = EncodingMatcher.from_names(encodings, names)
+
+    arrays = {
+        'encodings': matcher.encodings,
+        'user_ids': matcher.row_user.astype(np.int32),
+        'sq_norms': matcher.sq_norms.astype(np.float32)
+    }
+    header = {
+        'version': FORMAT_VERSION,
+        'users': matcher.users,
+        'meta': meta or {},
+        'arrays': {}
+    }
+
+    if prototype_index is not None:
+        arrays['prototypes'] = np.asarray(prototype_index['prototypes'], dtype=np.float32)
+        arrays['prototype_users'] = np.asarray(prototype_index['prototype_users'], dtype=np.int32)
+        arrays['centroids'] = np.asarray(prototype_index['centroids'], dtype=np.float32)
+        header['prototype_index_users'] = list(prototype_index['users'])
+
+    # 头部长度会影响数据偏移，先用占位偏移计算一次长度再修正
+    def layout(data_start):
+        offset = data_start
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            header['arrays'][name] = {
+                'offset': offset,
+                'dtype': array.dtype.str,
+                'shape': list(array.shape)
+            }
+            offset = _align(offset + array.nbytes)
+        return json.dumps(header, ensure_ascii=False).encode('utf-8')
+
+    header_bytes = layout(0)
+    data_start = _align(PREAMBLE.size + len(header_bytes) + 256)
+    header_bytes = layout(data_start)
+    assert PREAMBLE.size + len(header_bytes) <= data_start
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return len(matcher)
+
+
+class ModelStore:
+    """只读的内存映射模型"""
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            magic, version, header_len = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"不是人脸模型文件: {path}")
+            if version > FORMAT_VERSION:
+                raise ValueError(f"模型格式版本过新: v{version}")
+            self.header = json.loads(f.read(header_len).decode('utf-8'))
+
+        self.version = version
+        self.users = self.header['users']
+        self.meta = self.header.get('meta', {})
+
+        # 整个文件只映射一次，各数组是其上的视图
+        self.raw = np.memmap(path, dtype=np.uint8, mode='r')
+        self.arrays = {}
+        for name, spec in self.header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+            start = spec['offset']
+            view = self.raw[start:start + count * dtype.itemsize].view(dtype)
+            self.arrays[name] = view.reshape(spec['shape'])
+
+    @property
+    def encodings(self):
+        return self.arrays['encodings']
+
+    @property
+    def user_ids(self):
+        return self.arrays['user_ids']
+
+    def __len__(self):
+        return len(self.arrays['user_ids'])
+
+    def names(self):
+        """每行的用户名（需要遍历全部行，识别路径中不要调用）"""
+        return [self.users[i] for i in self.user_ids]
+
+    def prototype_index(self):
+        """训练时生成的原型索引，没有则返回None"""
+        if 'prototypes' not in self.arrays:
+            return None
+        return {
+            'version': 1,
+            'users': self.header['prototype_index_users'],
+            'centroids': self.arrays['centroids'],
+            'prototypes': self.arrays['prototypes'],
+            'prototype_users': self.arrays['prototype_users']
+        }
+
+    def as_model(self):
+        """与旧版pickle模型兼容的字典（不含names列表）"""
+        model = dict(self.meta)
+        model.update({
+            'encodings': self.encodings,
+            'user_ids': self.user_ids,
+            'sq_norms': self.arrays.get('sq_norms'),
+            'users': list(self.users),
+            'total_faces': len(self)
+        })
+        index = self.prototype_index()
+        if index is not None:
+            model['prototype_index'] = index
+        return model
+
+
+def convert_pickle(pickle_path=LEGACY_PICKLE_PATH, store_path=DEFAULT_STORE_PATH):
+    """把旧版pickle模型转换为内存映射格式"""
+    with open(pickle_path, 'rb') as f:
+        model = pickle.load(f)
+
+    meta = {
+        key: model[key] for key in ('tolerance', 'trained_at')
+        if key in model
+    }
+    count = save_store(
+        store_path,
+        model['encodings'],
+        model['names'],
+        meta=meta,
+        prototype_index=model.get('prototype_index')
+    )
+    return count
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ('convert', 'info'):
+        print("用法:")
+        print("  python3 core/model_store.py convert [face_model.pkl] [face_model.bin]")
+        print("  python3 core/model_store.py info [face_model.bin]")
+        return 1
+
+    if sys.argv[1] == 'convert':
+        source = sys.argv[2] if len(sys.argv) > 2 else LEGACY_PICKLE_PATH
+        target = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_STORE_PATH
+        count = convert_pickle(source, target)
+        print(f"✓ 已转换 {count} 个人脸编码: {source} -> {target}")
+        return 0
+
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_STORE_PATH
+    store = ModelStore(path)
+    print(f"格式版本: v{store.version}")
+    print(f"训练时间: {store.meta.get('trained_at', '未知')}")
+    print(f"人脸总数: {len(store)}")
+    print(f"用户列表: {', '.join(store.users)}")
+    print(f"原型索引: {'有' if store.prototype_index() is not None else '无'}")
+    print(f"文件大小: {os.path.getsize(path) / 1024:.1f}KB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+持续监控流水线 - 采集 -> 检测 -> 编码 -> 匹配 分级并行
+Continuous-mode pipeline - staged capture/detect/encode/match with bounded queues
+
+  采集线程:  从环形缓冲取新帧，前置过滤（运动/Haar/整帧质量）后拷贝放入有界队列，
+             队列满时丢弃最旧的帧（始终处理最新画面）
+  检测/编码: 在共享进程池中执行，同时在途的任务数不超过进程数
+  匹配:      协调线程中执行（矩阵运算，远快于编码），检测结果按帧序号顺序处理，
+             跟踪器决定哪些人脸需要重新编码
+
+第N帧在子进程中编码时，采集线程已经在准备第N+1帧。
+事件驱动模式下流水线平时处于空闲状态（采集线程阻塞等待），
+由触发事件activate()激活一段时间。
+"""
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from workers import detect_faces, encode_faces
+
+
+class StageTimer:
+    """单个阶段的次数和耗时"""
+
+    def __init__(self):
+        self.count = 0
+        self.time_ms = 0.0
+
+    def record(self, elapsed):
+        self.count += 1
+        self.time_ms += elapsed * 1000
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'avg_ms': round(self.time_ms / self.count, 1) if self.count else 0.0
+        }
+
+
+class FrameJob:
+    """流水线中的一帧"""
+
+    __slots__ = ('seq', 'timestamp', 'image', 'future', 'tracks', 'boxes', 'timings')
+
+    def __init__(self, seq, timestamp, image):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.image = image
+        self.future = None
+        self.tracks = None
+        self.boxes = None
+        # 本帧各阶段耗时(ms)，随判定结果一起交给调用方
+        self.timings = {}
+
+
+class RecognitionPipeline:
+    """持续监控流水线"""
+
+    def __init__(self, buffer, pool, workers, match, decide, tolerance=0.4, prefilter=None,
+                 quality=None, tracker=None, on_faces=None, queue_size=2, active=True,
+                 observe=None):
+        self.buffer = buffer
+        self.pool = pool
+        self.workers = max(1, workers)
+        self.match = match
+        self.decide = decide
+        self.tolerance = tolerance
+        self.prefilter = prefilter
+        self.quality = quality
+        self.tracker = tracker
+        self.on_faces = on_faces
+        # observe(阶段, 秒)：把各阶段耗时同时报给外部指标
+        self.observe = observe
+
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.events = queue.Queue()
+        self.detecting = OrderedDict()
+        self.inflight = 0
+
+        self.running = False
+        self.active_until = float('inf') if active else 0.0
+        self.wakeup = threading.Event()
+        self.capture_thread = None
+        self.thread = None
+
+        self.stages = {
+            'capture': StageTimer(),
+            'detect': StageTimer(),
+            'encode': StageTimer(),
+            'match': StageTimer(),
+            'latency': StageTimer()
+        }
+        self.dropped = 0
+        self.skipped = 0
+        # 采集线程和协调线程都会更新统计，get_stats()可能在其他线程中读取
+        self.lock = threading.Lock()
+
+    def _record(self, stage, elapsed, job=None):
+        with self.lock:
+            self.stages[stage].record(elapsed)
+        if job is not None:
+            job.timings[stage] = round(elapsed * 1000, 1)
+        if self.observe is not None:
+            self.observe(stage, elapsed)
+
+    def activate(self, seconds):
+        """激活流水线seconds秒（可重复调用延长）"""
+        self.active_until = max(self.active_until, time.monotonic() + seconds)
+        self.wakeup.set()
+
+    def deactivate(self):
+        """立即回到空闲状态，丢弃已排队和在途的帧"""
+        self.active_until = 0.0
+        self._drain_frames()
+
+    @property
+    def paused(self):
+        """未激活（冷却期由调用方deactivate()后不再激活）"""
+        return time.monotonic() >= self.active_until
+
+    def _drain_frames(self):
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                return
+
+    def _offer(self, job):
+        """放入有界队列，满时丢弃最旧的帧"""
+        while True:
+            try:
+                self.frames.put_nowait(job)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    with self.lock:
+                        self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _capture_loop(self):
+        """采集阶段：取新帧 -> 前置过滤 -> 拷贝入队"""
+        seq = 0
+        while self.running:
+            if self.paused:
+                # 阻塞等待激活
+                self.wakeup.wait(1.0)
+                self.wakeup.clear()
+                continue
+
+            ref = self.buffer.acquire(after_seq=seq, timeout=0.5)
+            if ref is None:
+                continue
+
+            job = None
+            try:
+                seq = ref.seq
+                start = time.perf_counter()
+                frame = ref.array
+                passed = self.prefilter is None or self.prefilter.passes(frame)
+                if passed and self.quality is not None:
+                    passed = self.quality.frame_score(frame)[1] is None
+                if passed:
+                    job = FrameJob(ref.seq, ref.timestamp, frame.copy())
+                else:
+                    with self.lock:
+                        self.skipped += 1
+                self._record('capture', time.perf_counter() - start, job)
+            finally:
+                self.buffer.release(ref)
+
+            if job is not None:
+                self._offer(job)
+
+    def _submit_detect(self):
+        """有空闲进程时把最新的帧送去检测"""
+        while self.inflight < self.workers and not self.paused:
+            try:
+                job = self.frames.get_nowait()
+            except queue.Empty:
+                return
+            job.future = self.pool.submit(detect_faces, job.image)
+            job.future.add_done_callback(lambda _: self.events.put(('detect', None)))
+            self.detecting[job.seq] = job
+            self.inflight += 1
+
+    def _on_detected(self, job):
+        """检测结果（按帧序号顺序到达）：决定哪些人脸需要编码"""
+        self.inflight -= 1
+        try:
+            locations, reasons, elapsed = job.future.result()
+        except Exception as e:
+            print(f"⚠ 检测失败: {e}")
+            return
+        self._record('detect', elapsed, job)
+
+        if self.quality is not None and (locations or reasons):
+            self.quality.record_faces(len(locations), reasons)
+        if self.prefilter is not None:
+            self.prefilter.record_detection(bool(locations), elapsed)
+        if not locations or self.paused:
+            return
+
+        if self.on_faces is not None:
+            self.on_faces(locations)
+
+        boxes = locations
+        if self.tracker is not None:
+            job.tracks = self.tracker.update(locations, job.timestamp)
+            pending = self.tracker.pending(job.tracks, job.timestamp)
+            if not pending:
+                # 所有人脸都在跟踪中且编码仍有效，身份已知，不重复判定
+                return
+            boxes = [locations[i] for i in pending]
+            job.tracks = [job.tracks[i] for i in pending]
+            for track in job.tracks:
+                track.encoding_pending = True
+
+        job.boxes = boxes
+        future = self.pool.submit(encode_faces, job.image, boxes)
+        future.add_done_callback(lambda f, job=job: self.events.put(('encode', (job, f))))
+        self.inflight += 1
+
+    def _on_encoded(self, job, future, on_decision):
+        """编码结果：匹配并判定"""
+        self.inflight -= 1
+        try:
+            encodings, elapsed = future.result()
+        except Exception as e:
+            print(f"⚠ 编码失败: {e}")
+            for track in job.tracks or []:
+                track.encoding_pending = False
+            return
+        self._record('encode', elapsed, job)
+        if not encodings:
+            return
+
+        start = time.perf_counter()
+        matches = self.match(encodings)
+        names = [m.name if m.distance <= self.tolerance else None for m in matches]
+        if job.tracks is not None:
+            for track, encoding, name in zip(job.tracks, encodings, names):
+                self.tracker.store_encoding(track, encoding, job.timestamp)
+                track.identity = name
+        if self.paused:
+            return
+        result = self.decide(matches)
+        self._record('match', time.perf_counter() - start, job)
+
+        latency = time.monotonic() - job.timestamp
+        self._record('latency', latency)
+        on_decision(result, {
+            'seq': job.seq,
+            'faces': len(encodings),
+            'latency_ms': latency * 1000,
+            'timings_ms': dict(job.timings),
+            'shape': job.image.shape,
+            'boxes': job.boxes,
+            'names': names
+        })
+
+    def run(self, on_decision):
+        """运行流水线直到stop()；on_decision(结果, 信息) 在本线程中调用"""
+        self.running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, name='pipeline-capture',
+                                               daemon=True)
+        self.capture_thread.start()
+
+        try:
+            while self.running:
+                self._submit_detect()
+                try:
+                    kind, payload = self.events.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+                if kind == 'encode':
+                    self._on_encoded(*payload, on_decision)
+                    continue
+
+                # 检测结果按提交顺序处理，保证跟踪器看到的帧是有序的
+                while self.detecting:
+                    seq, job = next(iter(self.detecting.items()))
+                    if not job.future.done():
+                        break
+                    del self.detecting[seq]
+                    self._on_detected(job)
+        finally:
+            self.stop()
+
+    def start(self, on_decision):
+        """在后台线程中运行，on_decision在该线程中调用"""
+        self.thread = threading.Thread(target=self.run, args=(on_decision,), name='pipeline',
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """停止采集线程"""
+        self.running = False
+        self.wakeup.set()
+        if self.capture_thread is not None and self.capture_thread is not threading.current_thread():
+            self.capture_thread.join(timeout=2.0)
+
+    def get_stats(self):
+        """各阶段统计"""
+        with self.lock:
+            stats = {name: stage.as_dict() for name, stage in self.stages.items()}
+            stats['dropped'] = self.dropped
+            stats['skipped'] = self.skipped
+        stats['inflight'] = self.inflight
+        return stats
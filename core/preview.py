@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+实时预览 - 从共享帧缓冲生成带识别结果叠加的MJPEG流
+Live preview - MJPEG stream with a detection/match overlay from the shared frame buffer
+
+一个编码线程负责缩放、画框和JPEG编码，所有观看者共用同一份JPEG，
+增加观看者不增加CPU开销；没有观看者时编码线程阻塞等待，不取帧。
+每个客户端可以单独限制帧率（低于编码帧率时跳过中间帧）。
+"""
+import io
+import threading
+import time
+
+from detection import downscale
+
+try:
+    import cv2
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+
+# 已识别 / 未识别的框颜色 (RGB)
+COLOR_KNOWN = (76, 175, 80)
+COLOR_UNKNOWN = (244, 67, 54)
+
+
+class FaceOverlay:
+    """最近一次识别的人脸框和匹配结果（识别线程写，预览线程读）"""
+
+    def __init__(self, hold_seconds=2.0):
+        self.hold_seconds = hold_seconds
+        self.lock = threading.Lock()
+        self.faces = []
+        self.shape = None
+        self.updated = 0.0
+
+    def update(self, shape, boxes, names):
+        """记录原图尺寸、检测框 (top, right, bottom, left) 和对应的用户名（未识别为None）"""
+        with self.lock:
+            self.shape = shape[:2]
+            self.faces = list(zip(boxes, names))
+            self.updated = time.monotonic()
+
+    def snapshot(self):
+        """返回 (原图尺寸, [(框, 名字)])，超过保持时间后返回空列表"""
+        with self.lock:
+            if time.monotonic() - self.updated > self.hold_seconds:
+                return None, []
+            return self.shape, list(self.faces)
+
+
+def draw_faces(image, shape, faces):
+    """在缩小后的预览图上画框和名字（原地修改）"""
+    if not faces:
+        return image
+    height, width = image.shape[:2]
+    scale_y = height / shape[0]
+    scale_x = width / shape[1]
+    for (top, right, bottom, left), name in faces:
+        box = (max(0, int(left * scale_x)), max(0, int(top * scale_y)),
+               min(width, int(right * scale_x)), min(height, int(bottom * scale_y)))
+        color = COLOR_KNOWN if name else COLOR_UNKNOWN
+        label = name or '?'
+        if HAS_CV2:
+            cv2.rectangle(image, box[:2], box[2:], color, 2)
+            cv2.putText(image, label, (box[0], max(12, box[1] - 6)), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, color, 1, cv2.LINE_AA)
+        else:
+            # 没有OpenCV时直接写像素画边框
+            x0, y0, x1, y1 = box
+            image[y0:y0 + 2, x0:x1] = color
+            image[max(y0, y1 - 2):y1, x0:x1] = color
+            image[y0:y1, x0:x0 + 2] = color
+            image[y0:y1, max(x0, x1 - 2):x1] = color
+    return image
+
+
+def encode_jpeg(image, quality):
+    """RGB数组编码为JPEG字节"""
+    if HAS_CV2:
+        ok, data = cv2.imencode('.jpg', cv2.cvtColor(image, cv2.COLOR_RGB2BGR),
+                                [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return data.tobytes() if ok else None
+    buf = io.BytesIO()
+    Image.fromarray(image).save(buf, format='JPEG', quality=quality)
+    return buf.getvalue()
+
+
+class PreviewStream:
+    """共享编码的MJPEG预览"""
+
+    def __init__(self, buffer, overlay=None, fps=10.0, width=640, quality=70):
+        self.buffer = buffer
+        self.overlay = overlay
+        self.fps = fps
+        self.width = width
+        self.quality = quality
+
+        self.cond = threading.Condition()
+        self.viewers = 0
+        self.jpeg = None
+        self.seq = 0
+        self.running = False
+        self.thread = None
+
+        self.stats = {
+            'encoded': 0,
+            'sent': 0,
+            'encode_ms': 0.0,
+            'clients': 0
+        }
+
+    @property
+    def available(self):
+        return HAS_CV2 or HAS_PIL
+
+    @classmethod
+    def from_config(cls, buffer, overlay, preview_config):
+        """从preview配置创建"""
+        return cls(
+            buffer,
+            overlay,
+            fps=preview_config.get('fps', 10.0),
+            width=preview_config.get('width', 640),
+            quality=preview_config.get('quality', 70)
+        )
+
+    def start(self):
+        """启动编码线程（没有观看者时空闲）"""
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name='preview-encoder', daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """停止编码线程"""
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def _render(self, frame):
+        """缩小 -> 画叠加层 -> JPEG"""
+        small = downscale(frame, min(1.0, self.width / frame.shape[1]))
+        if small is frame:
+            small = frame.copy()
+        if self.overlay is not None:
+            shape, faces = self.overlay.snapshot()
+            draw_faces(small, shape, faces)
+        return encode_jpeg(small, self.quality)
+
+    def _run(self):
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        seq = 0
+        while self.running:
+            with self.cond:
+                self.cond.wait_for(lambda: self.viewers > 0 or not self.running)
+            if not self.running:
+                return
+
+            started = time.monotonic()
+            ref = self.buffer.acquire(after_seq=seq, timeout=1.0)
+            if ref is None:
+                continue
+            try:
+                seq = ref.seq
+                start = time.perf_counter()
+                jpeg = self._render(ref.array)
+            except Exception as e:
+                print(f"⚠ 预览编码失败: {e}")
+                jpeg = None
+            finally:
+                self.buffer.release(ref)
+
+            if jpeg is not None:
+                with self.cond:
+                    self.jpeg = jpeg
+                    self.seq += 1
+                    self.stats['encoded'] += 1
+                    self.stats['encode_ms'] += (time.perf_counter() - start) * 1000
+                    self.cond.notify_all()
+
+            remaining = interval - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def frames(self, max_fps=None):
+        """生成JPEG帧（每个客户端一个生成器）；max_fps为该客户端的帧率上限"""
+        interval = 1.0 / max_fps if max_fps else 0.0
+        with self.cond:
+            self.viewers += 1
+            self.stats['clients'] += 1
+            self.cond.notify_all()
+        try:
+            sent_seq = 0
+            while self.running:
+                started = time.monotonic()
+                with self.cond:
+                    if not self.cond.wait_for(lambda: self.seq > sent_seq or not self.running, 2.0):
+                        continue
+                    if not self.running:
+                        return
+                    sent_seq, jpeg = self.seq, self.jpeg
+                    self.stats['sent'] += 1
+                yield jpeg
+
+                # 客户端限速：编码帧率更高时跳过中间帧
+                remaining = interval - (time.monotonic() - started)
+                if remaining > 0:
+                    time.sleep(remaining)
+        finally:
+            with self.cond:
+                self.viewers -= 1
+
+    def snapshot(self, timeout=2.0):
+        """取一张当前预览JPEG，超时返回None"""
+        with self.cond:
+            self.viewers += 1
+            self.cond.notify_all()
+            try:
+                seq = self.seq
+                if not self.cond.wait_for(lambda: self.seq > seq, timeout):
+                    return None
+                self.stats['sent'] += 1
+                return self.jpeg
+            finally:
+                self.viewers -= 1
+
+    def get_stats(self):
+        """预览统计"""
+        with self.cond:
+            stats = dict(self.stats)
+            stats['viewers'] = self.viewers
+        encode_ms = stats.pop('encode_ms')
+        stats['avg_encode_ms'] = round(encode_ms / stats['encoded'], 1) if stats['encoded'] else 0.0
+        return stats
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+现场诊断 - 按需cProfile、tracemalloc对比和线程栈
+On-demand profiling - cProfile over the next N attempts, tracemalloc diffs and thread stacks
+
+AttemptProfiler只在启用时替换系统实例上的run_once，分析完N次识别后恢复原方法，
+未启用时识别路径上没有任何额外开销。结果保存为pstats文件和文本报告。
+tracemalloc同理，只在start()到stop()之间运行。
+
+注意: cProfile只统计调用线程；连拍识别的检测/编码在子进程中执行，
+这部分在报告里表现为等待进程池结果的时间。
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+from datetime import datetime
+
+
+class AttemptProfiler:
+    """对接下来N次识别做cProfile"""
+
+    def __init__(self, system, output_dir='logs/profiles'):
+        self.system = system
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.profile = None
+        self.remaining = 0
+        self.session = None
+
+    @property
+    def armed(self):
+        return self.remaining > 0
+
+    def arm(self, attempts=5, sort='cumulative'):
+        """分析接下来attempts次run_once，返回会话信息"""
+        with self.lock:
+            if self.armed:
+                return self.status()
+            self.profile = cProfile.Profile()
+            self.remaining = attempts
+            self.session = {
+                'id': datetime.now().strftime('%Y%m%d_%H%M%S'),
+                'state': 'armed',
+                'requested': attempts,
+                'completed': 0,
+                'sort': sort,
+                'attempts': [],
+                'stats_path': None,
+                'report_path': None
+            }
+            original = self.system.run_once
+            profile = self.profile
+
+            def profiled_run_once(*args, **kwargs):
+                profile.enable()
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    profile.disable()
+                    self._attempt_done(profile, time.perf_counter() - start)
+
+            # 实例属性覆盖类方法，分析结束后删除即恢复原方法
+            self.system.run_once = profiled_run_once
+        return self.status()
+
+    def _attempt_done(self, profile, elapsed):
+        with self.lock:
+            if profile is not self.profile:
+                return
+            result = self.system.last_result or {}
+            self.session['attempts'].append({
+                'elapsed_ms': round(elapsed * 1000, 1),
+                'success': result.get('success'),
+                'timings_ms': result.get('timings_ms', {})
+            })
+            self.session['completed'] += 1
+            self.remaining -= 1
+            if self.remaining > 0:
+                return
+            self.system.__dict__.pop('run_once', None)
+            self._write()
+
+    def _write(self):
+        """保存pstats文件和文本报告"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile_{self.session['id']}")
+        stats_path = base + '.pstats'
+        report_path = base + '.txt'
+        self.profile.dump_stats(stats_path)
+
+        out = io.StringIO()
+        out.write(f"cProfile: {self.session['completed']} 次识别\n\n")
+        out.write("各次识别阶段耗时(ms):\n")
+        for i, attempt in enumerate(self.session['attempts'], 1):
+            stages = '  '.join(f"{k} {v:.1f}" for k, v in attempt['timings_ms'].items())
+            out.write(f"  #{i} {attempt['elapsed_ms']:.1f}ms  成功={attempt['success']}  {stages}\n")
+        out.write("\n")
+        pstats.Stats(self.profile, stream=out).sort_stats(self.session['sort']).print_stats(40)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+
+        self.session.update({'state': 'done', 'stats_path': stats_path, 'report_path': report_path})
+        self.profile = None
+
+    def cancel(self):
+        """取消尚未完成的分析"""
+        with self.lock:
+            if self.armed:
+                self.system.__dict__.pop('run_once', None)
+                self.remaining = 0
+                self.profile = None
+                self.session['state'] = 'cancelled'
+        return self.status()
+
+    def status(self):
+        if self.session is None:
+            return {'state': 'idle'}
+        status = dict(self.session)
+        status['attempts'] = list(self.session['attempts'])
+        return status
+
+
+class MemoryTracer:
+    """tracemalloc快照对比"""
+
+    def __init__(self, frames=10):
+        self.frames = frames
+        self.baseline = None
+        self.started_here = False
+
+    @property
+    def running(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        """开始跟踪并记录基准快照"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.started_here = True
+        self.baseline = tracemalloc.take_snapshot()
+        return self.status()
+
+    def diff(self, top=30, key='lineno'):
+        """与基准快照对比，返回文本"""
+        if self.baseline is None or not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        changes = snapshot.filter_traces(filters).compare_to(
+            self.baseline.filter_traces(filters), key)
+
+        current, peak = tracemalloc.get_traced_memory()
+        out = io.StringIO()
+        out.write(f"tracemalloc: 当前 {current / 1024 / 1024:.1f}MB  峰值 {peak / 1024 / 1024:.1f}MB\n")
+        out.write(f"与基准快照相比增长最多的 {top} 处 ({key}):\n\n")
+        for stat in changes[:top]:
+            out.write(f"{stat}\n")
+        return out.getvalue()
+
+    def stop(self):
+        """停止跟踪（只停止由本对象启动的跟踪）"""
+        if self.started_here and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.started_here = False
+        self.baseline = None
+        return self.status()
+
+    def status(self):
+        status = {'running': self.running, 'baseline': self.baseline is not None}
+        if self.running:
+            current, peak = tracemalloc.get_traced_memory()
+            status.update({'current_mb': round(current / 1024 / 1024, 1),
+                           'peak_mb': round(peak / 1024 / 1024, 1)})
+        return status
+
+
+def dump_threads():
+    """所有线程的当前调用栈（文本）"""
+    names = {thread.ident: thread for thread in threading.enumerate()}
+    out = io.StringIO()
+    out.write(f"线程栈 {datetime.now().isoformat(timespec='seconds')}  共 {len(names)} 个线程\n")
+    for ident, frame in sys._current_frames().items():
+        thread = names.get(ident)
+        name = thread.name if thread else '?'
+        daemon = ' daemon' if thread is not None and thread.daemon else ''
+        out.write(f"\n--- {name} (ident={ident}{daemon}) ---\n")
+        out.write(''.join(traceback.format_stack(frame)))
+    return out.getvalue()
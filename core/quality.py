@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+帧质量评估 - 编码前跳过模糊、过暗/过曝、过小或侧脸的帧
+Frame quality gate - skip blurry, badly exposed, tiny or turned faces before encoding
+
+HOG检测+dlib编码一次约1秒，而下面的检查都是在小灰度图上的向量化运算，
+只需几毫秒：
+  - 清晰度: 人脸区域缩放到固定尺寸后的拉普拉斯方差（与人脸大小无关）
+  - 曝光:   人脸区域平均亮度
+  - 大小:   检测框短边像素数
+  - 姿态:   5点关键点估计的左右偏转（鼻尖相对双眼中点的偏移）
+前三项不通过时不再计算关键点。
+"""
+import time
+
+import numpy as np
+
+try:
+    import cv2
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+try:
+    import face_recognition
+    HAS_FACE_RECOGNITION = True
+except ImportError:
+    HAS_FACE_RECOGNITION = False
+
+from detection import small_gray
+
+
+CROP_SIZE = 96
+
+REASON_BLUR = 'blur'
+REASON_DARK = 'dark'
+REASON_BRIGHT = 'bright'
+REASON_SMALL = 'small'
+REASON_POSE = 'pose'
+
+REASON_LABELS = {
+    REASON_BLUR: '模糊',
+    REASON_DARK: '过暗',
+    REASON_BRIGHT: '过曝',
+    REASON_SMALL: '人脸太小',
+    REASON_POSE: '侧脸'
+}
+
+
+def to_gray(image):
+    """RGB转灰度"""
+    if image.ndim == 2:
+        return image
+    if HAS_CV2:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return (image @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).astype(np.uint8)
+
+
+def laplacian_variance(gray):
+    """拉普拉斯算子响应的方差，越大越清晰"""
+    if HAS_CV2:
+        return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+    g = gray.astype(np.float32)
+    lap = (g[:-2, 1:-1] + g[2:, 1:-1] + g[1:-1, :-2] + g[1:-1, 2:] - 4 * g[1:-1, 1:-1])
+    return float(lap.var())
+
+
+def face_crop(gray, box, size=CROP_SIZE):
+    """裁出人脸区域并缩放到固定尺寸"""
+    top, right, bottom, left = box
+    crop = gray[max(0, top):max(top + 1, bottom), max(0, left):max(left + 1, right)]
+    if HAS_CV2:
+        return cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)
+    ys = np.linspace(0, crop.shape[0] - 1, size).astype(np.intp)
+    xs = np.linspace(0, crop.shape[1] - 1, size).astype(np.intp)
+    return crop[np.ix_(ys, xs)]
+
+
+def estimate_yaw(landmarks):
+    """鼻尖相对双眼中点的水平偏移 / 双眼间距，正脸约为0"""
+    left_eye = np.mean(landmarks['left_eye'], axis=0)
+    right_eye = np.mean(landmarks['right_eye'], axis=0)
+    nose = np.mean(landmarks['nose_tip'], axis=0)
+    eye_distance = np.linalg.norm(right_eye - left_eye)
+    if eye_distance <= 0:
+        return 1.0
+    return float(abs(nose[0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance)
+
+
+class QualityCounter:
+    """一类检查（整帧或人脸）的通过数、拒绝原因和耗时"""
+
+    def __init__(self):
+        self.checked = 0
+        self.passed = 0
+        self.rejections = {}
+        self.time_ms = 0.0
+
+    def record(self, passed, reasons, elapsed=0.0):
+        """记录passed个通过和reasons中的每个拒绝"""
+        self.checked += passed + len(reasons)
+        self.passed += passed
+        for reason in reasons:
+            self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        self.time_ms += elapsed * 1000
+
+    def as_dict(self):
+        return {
+            'checked': self.checked,
+            'passed': self.passed,
+            'rejections': dict(self.rejections),
+            'avg_ms': round(self.time_ms / self.checked, 2) if self.checked else 0.0
+        }
+
+
+class QualityGate:
+    """编码前的质量门限"""
+
+    def __init__(self, min_sharpness=40.0, min_brightness=40.0, max_brightness=215.0,
+                 min_face_size=60, max_yaw=0.35, min_frame_sharpness=15.0, frame_width=320):
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_face_size = min_face_size
+        self.max_yaw = max_yaw
+        self.min_frame_sharpness = min_frame_sharpness
+        self.frame_width = frame_width
+
+        # 整帧检查和人脸检查分别计数（一帧可能有多个人脸）
+        self.frames = QualityCounter()
+        self.faces = QualityCounter()
+
+    @classmethod
+    def from_config(cls, quality_config):
+        """从quality配置创建"""
+        return cls(
+            min_sharpness=quality_config.get('min_sharpness', 40.0),
+            min_brightness=quality_config.get('min_brightness', 40.0),
+            max_brightness=quality_config.get('max_brightness', 215.0),
+            min_face_size=quality_config.get('min_face_size', 60),
+            max_yaw=quality_config.get('max_yaw', 0.35),
+            min_frame_sharpness=quality_config.get('min_frame_sharpness', 15.0),
+            frame_width=quality_config.get('frame_width', 320)
+        )
+
+    def exposure_reason(self, brightness):
+        if brightness < self.min_brightness:
+            return REASON_DARK
+        if brightness > self.max_brightness:
+            return REASON_BRIGHT
+        return None
+
+    def frame_score(self, image):
+        """
+        整帧快速评分（不需要检测），返回 (分数, 拒绝原因)。
+        用于连拍选帧和持续监控中跳过明显不可用的帧。
+        """
+        start = time.perf_counter()
+        gray = small_gray(image, self.frame_width)
+        brightness = float(gray.mean())
+        sharpness = laplacian_variance(gray)
+
+        reason = self.exposure_reason(brightness)
+        if reason is None and sharpness < self.min_frame_sharpness:
+            reason = REASON_BLUR
+        self.record_frame(reason, time.perf_counter() - start)
+
+        # 曝光越接近中间值、越清晰分数越高
+        exposure = 1.0 - abs(brightness - 128.0) / 128.0
+        return sharpness * exposure, reason
+
+    def assess_face(self, gray, box):
+        """单个人脸的清晰度/曝光/大小检查，返回 (分数, 拒绝原因)"""
+        top, right, bottom, left = box
+        size = min(bottom - top, right - left)
+        if size < self.min_face_size:
+            return 0.0, REASON_SMALL
+
+        crop = face_crop(gray, box)
+        reason = self.exposure_reason(float(crop.mean()))
+        if reason is not None:
+            return 0.0, reason
+
+        sharpness = laplacian_variance(crop)
+        if sharpness < self.min_sharpness:
+            return 0.0, REASON_BLUR
+        return sharpness, None
+
+    def filter_faces(self, image, locations):
+        """过滤人脸，返回 (保留的检测框, 各框分数, 被拒绝的原因列表)"""
+        start = time.perf_counter()
+        gray = to_gray(image)
+
+        kept, scores, reasons = [], [], []
+        for box in locations:
+            score, reason = self.assess_face(gray, box)
+            if reason is None:
+                kept.append(box)
+                scores.append(score)
+            else:
+                reasons.append(reason)
+
+        # 姿态需要关键点，只对通过前几项检查的人脸计算（5点模型，约1ms）
+        if kept and self.max_yaw and HAS_FACE_RECOGNITION:
+            landmarks = face_recognition.face_landmarks(image, kept, model='small')
+            frontal = []
+            for box, score, points in zip(kept, scores, landmarks):
+                yaw = estimate_yaw(points)
+                if yaw > self.max_yaw:
+                    reasons.append(REASON_POSE)
+                else:
+                    frontal.append((box, score * (1.0 - yaw)))
+            kept = [box for box, _ in frontal]
+            scores = [score for _, score in frontal]
+
+        self.record_faces(len(kept), reasons, time.perf_counter() - start)
+        return kept, scores, reasons
+
+    def record_frame(self, reason, elapsed=0.0):
+        """记录一次整帧检查（reason为None表示通过）"""
+        self.frames.record(0 if reason else 1, [reason] if reason else [], elapsed)
+
+    def record_faces(self, passed, reasons, elapsed=0.0):
+        """
+        记录一次人脸检查：passed个人脸通过，reasons为被拒绝人脸的原因。
+        子进程中的检查结果（保留的检测框数和拒绝原因）也通过它汇总到主进程。
+        """
+        self.faces.record(passed, reasons, elapsed)
+
+    @property
+    def checked(self):
+        return self.frames.checked + self.faces.checked
+
+    def get_stats(self):
+        """质量检查统计：整帧和人脸分别给出通过数和各拒绝原因的次数"""
+        return {
+            'frames': self.frames.as_dict(),
+            'faces': self.faces.as_dict()
+        }
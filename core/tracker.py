@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+人脸跟踪 - 相邻帧之间关联检测框，缓存每个轨迹的编码
+Face tracking - associate boxes across frames and cache encodings per track
+
+同一个人站在相机前时，检测框在相邻帧之间高度重叠。按IoU（不够时按中心
+距离）把新检测框关联到已有轨迹，只有新轨迹、位置漂移过大或超过重新验证
+间隔的轨迹才重新计算128维编码，其余直接复用缓存的编码。
+"""
+import time
+
+
+def box_iou(a, b):
+    """两个 (top, right, bottom, left) 框的交并比"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def box_center(box):
+    return ((box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0)
+
+
+def center_distance(a, b):
+    """中心距离，以两个框的平均宽度为单位"""
+    (ay, ax), (by, bx) = box_center(a), box_center(b)
+    size = ((a[1] - a[3]) + (b[1] - b[3])) / 2.0
+    if size <= 0:
+        return float('inf')
+    return ((ay - by) ** 2 + (ax - bx) ** 2) ** 0.5 / size
+
+
+class Track:
+    """一个被跟踪的人脸"""
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+
+        # 最近一次编码时的框、时间和结果
+        self.encoding = None
+        self.encoded_box = None
+        self.encoded_at = 0.0
+        self.identity = None
+        # 编码任务已提交、结果未返回（流水线中避免同一人脸重复编码）
+        self.encoding_pending = False
+
+
+class FaceTracker:
+    """基于IoU/中心距离的轻量跟踪器"""
+
+    def __init__(self, iou_threshold=0.3, max_center_distance=0.5, drift_iou=0.6,
+                 reverify_seconds=10.0, max_missing_seconds=5.0):
+        self.iou_threshold = iou_threshold
+        self.max_center_distance = max_center_distance
+        self.drift_iou = drift_iou
+        self.reverify_seconds = reverify_seconds
+        self.max_missing_seconds = max_missing_seconds
+
+        self.tracks = []
+        self.next_id = 1
+
+        self.encodes = 0
+        self.reuses = 0
+
+    @classmethod
+    def from_config(cls, tracking_config):
+        """从tracking配置创建"""
+        return cls(
+            iou_threshold=tracking_config.get('iou_threshold', 0.3),
+            drift_iou=tracking_config.get('drift_iou', 0.6),
+            reverify_seconds=tracking_config.get('reverify_seconds', 10.0),
+            max_missing_seconds=tracking_config.get('max_missing_seconds', 5.0)
+        )
+
+    def update(self, locations, now=None):
+        """关联本帧的检测框，返回与locations一一对应的轨迹列表"""
+        now = now if now is not None else time.monotonic()
+
+        # 丢弃太久没出现的轨迹
+        self.tracks = [t for t in self.tracks
+                       if now - t.last_seen <= self.max_missing_seconds]
+
+        # 按IoU从高到低贪心配对
+        pairs = []
+        for i, box in enumerate(locations):
+            for j, track in enumerate(self.tracks):
+                overlap = box_iou(box, track.box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, i, j))
+                elif center_distance(box, track.box) <= self.max_center_distance:
+                    # 快速移动时IoU可能很低，用中心距离兜底（排在IoU配对之后）
+                    pairs.append((-center_distance(box, track.box), i, j))
+        pairs.sort(reverse=True)
+
+        assigned = [None] * len(locations)
+        used = set()
+        for _, i, j in pairs:
+            if assigned[i] is None and j not in used:
+                assigned[i] = self.tracks[j]
+                used.add(j)
+
+        for i, box in enumerate(locations):
+            track = assigned[i]
+            if track is None:
+                track = Track(self.next_id, box, now)
+                self.next_id += 1
+                self.tracks.append(track)
+                assigned[i] = track
+            else:
+                track.box = box
+                track.last_seen = now
+                track.hits += 1
+
+        return assigned
+
+    def needs_encoding(self, track, now=None):
+        """新轨迹、漂移过大或超过重新验证间隔时需要重新编码"""
+        now = now if now is not None else time.monotonic()
+        if track.encoding_pending:
+            return False
+        if track.encoding is None:
+            return True
+        if box_iou(track.box, track.encoded_box) < self.drift_iou:
+            return True
+        return now - track.encoded_at >= self.reverify_seconds
+
+    def pending(self, tracks, now=None):
+        """返回需要重新编码的轨迹下标，并计入统计"""
+        now = now if now is not None else time.monotonic()
+        indices = [i for i, track in enumerate(tracks) if self.needs_encoding(track, now)]
+        self.encodes += len(indices)
+        self.reuses += len(tracks) - len(indices)
+        return indices
+
+    def store_encoding(self, track, encoding, now=None):
+        """记录轨迹的新编码（身份需要重新判定）"""
+        track.encoding = encoding
+        track.encoding_pending = False
+        track.identity = None
+        track.encoded_box = track.box
+        track.encoded_at = now if now is not None else time.monotonic()
+
+    def get_stats(self):
+        """跟踪统计"""
+        total = self.encodes + self.reuses
+        return {
+            'active_tracks': len(self.tracks),
+            'encodes': self.encodes,
+            'reuses': self.reuses,
+            'reuse_rate': round(self.reuses / total, 3) if total else 0.0
+        }
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+识别工作进程池 - 检测和编码在子进程中执行
+Recognition worker pool - detection and encoding run in worker processes
+
+dlib的HOG检测和128维编码计算期间不释放GIL，只有多进程才能并行。
+进程池在系统启动时创建一次，连拍识别和持续监控流水线共用；
+每个子进程在initializer中创建自己的检测器和质量门限，
+face_recognition模型在子进程导入时加载一次。
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from detection import FaceDetector
+from quality import QualityGate
+
+
+# 子进程内的检测器和质量门限，由initializer创建一次
+_worker_detector = None
+_worker_gate = None
+
+
+def init_worker(detector_params, quality_config=None):
+    """进程池初始化：创建检测器（face_recognition模型在导入时加载）"""
+    global _worker_detector, _worker_gate
+    _worker_detector = FaceDetector(**detector_params)
+    if quality_config is not None:
+        _worker_gate = QualityGate.from_config(quality_config)
+
+
+def warm_worker():
+    """空任务，用于提前拉起子进程"""
+    return _worker_detector is not None
+
+
+def detect_faces(image):
+    """
+    检测 + 质量检查，返回 (检测框, 拒绝原因, 耗时秒)。
+    检测框只含通过质量检查的人脸，主进程用len(检测框)和拒绝原因汇总统计。
+    """
+    start = time.perf_counter()
+    locations = _worker_detector.detect(image)
+    reasons = []
+    if _worker_gate is not None and locations:
+        locations, _, reasons = _worker_gate.filter_faces(image, locations)
+    return locations, reasons, time.perf_counter() - start
+
+
+def encode_faces(image, locations):
+    """在原图上编码指定的人脸，返回 (编码列表, 耗时秒)"""
+    start = time.perf_counter()
+    return _worker_detector.encode(image, locations), time.perf_counter() - start
+
+
+def detect_and_encode(image):
+    """检测 + 质量检查 + 编码，返回 (检测框, 编码列表, 拒绝原因)"""
+    locations, reasons, _ = detect_faces(image)
+    return locations, _worker_detector.encode(image, locations), reasons
+
+
+def pool_size(config):
+    """performance.max_workers，不超过CPU核数"""
+    workers = config.get('performance', {}).get('max_workers', 2)
+    return max(1, min(workers, multiprocessing.cpu_count()))
+
+
+def create_pool(detector, workers, quality_config=None):
+    """创建进程池并提前拉起所有子进程（spawn避免fork采集线程）"""
+    detector_params = {
+        'scale': detector.scale,
+        'upsample': detector.upsample,
+        'model': detector.model,
+        'num_jitters': detector.num_jitters
+    }
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+        initargs=(detector_params, quality_config)
+    )
+    for _ in range(workers):
+        pool.submit(warm_worker)
+    return pool
@@ -37,9 +37,14 @@ if [ ! -f "$SCRIPT_DIR/core/main.py" ]; then
     exit 1
 fi
 
-if [ ! -f "$SCRIPT_DIR/models/face_model.pkl" ]; then
-    echo -e "${YELLOW}警告：找不到训练好的模型文件 models/face_model.pkl${NC}"
-    echo -e "${YELLOW}请先运行训练脚本生成模型${NC}"
+if [ ! -f "$SCRIPT_DIR/models/face_model.bin" ]; then
+    if [ -f "$SCRIPT_DIR/models/face_model.pkl" ]; then
+        echo -e "${YELLOW}警告：使用旧版模型 models/face_model.pkl${NC}"
+        echo -e "${YELLOW}建议转换：python3 core/model_store.py convert${NC}"
+    else
+        echo -e "${YELLOW}警告：找不到训练好的模型文件 models/face_model.bin${NC}"
+        echo -e "${YELLOW}请先运行训练脚本生成模型${NC}"
+    fi
 fi
 
 echo -e "${GREEN}✓ 文件检查完成${NC}"
@@ -8,8 +8,8 @@ import os
 # 添加core目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'core'))
 
-# 导入并运行主程序
-from main import main
+# 命令行入口只导入标准库，识别库由需要的子命令再加载
+from cli import main
 
 if __name__ == "__main__":
     sys.exit(main())
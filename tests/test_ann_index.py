@@ -0,0 +1,41 @@
+"""IVFIndex.match 必须每个查询返回一个结果（调用方按位置对应人脸和跟踪）"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from ann_index import IVFIndex
+
+
+def index_with_empty_cell():
+    """两个桶：编码都在(1,0,...)附近，原点附近的桶是空的"""
+    centroids = np.zeros((2, 4), dtype=np.float32)
+    centroids[1, 0] = 1.0
+    index = IVFIndex(centroids, nprobe=1)
+    encodings = np.zeros((3, 4), dtype=np.float32)
+    encodings[:, 0] = [0.9, 1.0, 1.1]
+    index.add(encodings, ['alice', 'bob', 'carol'])
+    index.compact()
+    assert np.diff(index.offsets).tolist() == [0, 3]
+    return index
+
+
+def test_query_landing_in_empty_cell_still_matches():
+    index = index_with_empty_cell()
+    queries = np.zeros((3, 4), dtype=np.float32)
+    queries[0, 0] = 0.05   # 最近的桶是空桶
+    queries[1, 0] = 1.0
+    queries[2, 0] = 0.1    # 同样落在空桶
+
+    results = index.match(queries)
+
+    assert len(results) == len(queries)
+    assert results[0].name == 'alice'
+    assert results[1].name == 'bob'
+    assert results[2].name == 'alice'
+
+
+def test_empty_index_returns_no_results():
+    index = IVFIndex(np.zeros((2, 4), dtype=np.float32), nprobe=1)
+    assert index.match(np.zeros((1, 4), dtype=np.float32)) == []
@@ -0,0 +1,53 @@
+"""连拍投票：无法凑够K票时提前结束，整帧质量拒绝要记录原因"""
+import os
+import sys
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+import burst
+
+
+class InlinePool:
+    """在调用线程中立即执行的进程池替身"""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_result(([], [], []))
+        return future
+
+
+class RejectAllGate:
+    def frame_score(self, frame):
+        return 0.0, 'blur'
+
+    def record(self, reason, elapsed=0.0):
+        pass
+
+
+def test_stops_submitting_once_agreement_is_unreachable():
+    pool = InlinePool()
+    recognizer = burst.BurstRecognizer(pool, workers=1, frames=5, agree=2)
+
+    result, voter = recognizer.recognize(iter(range(20)), lambda locations, encodings: None)
+
+    # 5帧要2票：4帧都未识别后只剩1帧，不可能再凑够2票
+    assert result is None
+    assert pool.submitted == 4
+    assert voter.processed == 4
+    assert recognizer.stats['early_exits'] == 1
+
+
+def test_quality_rejections_are_reported():
+    pool = InlinePool()
+    recognizer = burst.BurstRecognizer(pool, workers=1, frames=5, agree=2, quality_gate=RejectAllGate())
+
+    result, voter = recognizer.recognize(iter(range(3)), lambda locations, encodings: None)
+
+    assert result is None
+    assert pool.submitted == 0
+    assert voter.processed == 0
+    assert voter.rejections == {'blur': 3}
@@ -0,0 +1,34 @@
+"""run.py once 的退出码：只投递到持续监控时不能当作识别成功"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+import cli
+
+
+class FakeClient:
+    def __init__(self, result):
+        self.result = result
+
+    def recognize(self, source='client', timeout=30.0):
+        return self.result
+
+
+@pytest.mark.parametrize('result, code', [
+    ({'success': True, 'user': 'alice', 'confidence': 0.8, 'timings_ms': {'total': 300}}, cli.EXIT_SUCCESS),
+    ({'success': False, 'error': '未识别到授权用户'}, cli.EXIT_FAILED),
+    ({'source': 'manual', 'queued': True}, cli.EXIT_QUEUED),
+])
+def test_once_exit_code_from_daemon(monkeypatch, result, code):
+    monkeypatch.setattr(cli, 'daemon_client', lambda args: FakeClient(result))
+    args = cli.build_parser().parse_args(['once'])
+    assert args.func(args) == code
+
+
+def test_refuses_to_open_camera_held_by_daemon(monkeypatch):
+    monkeypatch.setattr(cli, 'daemon_client', lambda args: FakeClient({}))
+    args = cli.build_parser().parse_args(['continuous'])
+    assert cli.create_system(args) is None
+    assert args.func(args) == 1
@@ -0,0 +1,39 @@
+"""识别守护进程：持续监控中的请求等待流水线给出结果"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from daemon import RecognitionDaemon
+
+
+class ContinuousSystem:
+    """持续监控中的系统替身：trigger只投递，结果由另一个线程稍后写入"""
+
+    def __init__(self, decide_after=None):
+        self.config = {'events': {'active_window': 0.2}}
+        self.scheduler = object()
+        self.last_result = {'success': True, 'user': 'old'}
+        self.decide_after = decide_after
+
+    def trigger(self, source):
+        if self.decide_after is not None:
+            def decide():
+                time.sleep(self.decide_after)
+                self.last_result = {'success': True, 'user': 'alice', 'source': source}
+            threading.Thread(target=decide, daemon=True).start()
+        return None
+
+
+def test_waits_for_pipeline_decision():
+    daemon = RecognitionDaemon(ContinuousSystem(decide_after=0.05), path='/unused')
+    result = daemon._recognize('web')
+    assert result == {'success': True, 'user': 'alice', 'source': 'web'}
+
+
+def test_no_decision_in_window_is_queued_not_success():
+    daemon = RecognitionDaemon(ContinuousSystem(), path='/unused')
+    result = daemon._recognize('web')
+    assert result['queued'] is True
+    assert result['success'] is False
@@ -0,0 +1,126 @@
+"""训练编码缓存：命中、按内容命中、未命中、删除；增量注册也写入缓存"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'core'))
+import encoding_cache
+from encoding_cache import EncodingCache, STATUS_NO_FACE, STATUS_OK
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def first_run(tmp_path):
+    cache = EncodingCache(str(tmp_path / 'cache.npz')).load()
+    a = write(str(tmp_path / 'alice' / 'a.jpg'), b'aaa')
+    b = write(str(tmp_path / 'alice' / 'b.jpg'), b'bbb')
+    for key, path, status, encoding in (('alice/a.jpg', a, STATUS_OK, np.full(128, 0.5)),
+                                        ('alice/b.jpg', b, STATUS_NO_FACE, None)):
+        assert cache.lookup(key, path) == (False, None, None)
+        cache.record(key, path, status, encoding)
+    cache.save()
+    return a, b
+
+
+def test_hit_after_save(tmp_path):
+    a, b = first_run(tmp_path)
+    cache = EncodingCache(str(tmp_path / 'cache.npz')).load()
+
+    hit, status, encoding = cache.lookup('alice/a.jpg', a)
+    assert hit and status == STATUS_OK
+    np.testing.assert_allclose(encoding, 0.5)
+    assert cache.lookup('alice/b.jpg', b) == (True, STATUS_NO_FACE, None)
+    assert cache.stats == {'hits': 2, 'rehashed': 0, 'misses': 0}
+
+
+def test_touched_file_hits_by_content_and_changed_file_misses(tmp_path):
+    a, b = first_run(tmp_path)
+    os.utime(a, (1, 1))
+    write(b, b'changed')
+    cache = EncodingCache(str(tmp_path / 'cache.npz')).load()
+
+    assert cache.lookup('alice/a.jpg', a)[0]
+    assert not cache.lookup('alice/b.jpg', b)[0]
+    assert cache.stats == {'hits': 0, 'rehashed': 1, 'misses': 1}
+
+
+def test_removed_images_are_dropped(tmp_path):
+    a, b = first_run(tmp_path)
+    cache = EncodingCache(str(tmp_path / 'cache.npz')).load()
+    cache.lookup('alice/a.jpg', a)
+    assert cache.removed() == ['alice/b.jpg']
+
+    cache.save()
+    assert list(EncodingCache(str(tmp_path / 'cache.npz')).load().entries) == ['alice/a.jpg']
+
+
+def test_merge_keeps_entries_not_seen_this_run(tmp_path):
+    a, b = first_run(tmp_path)
+    cache = EncodingCache(str(tmp_path / 'cache.npz')).load()
+    c = write(str(tmp_path / 'bob' / 'c.jpg'), b'ccc')
+    cache.lookup('bob/c.jpg', c)
+    cache.record('bob/c.jpg', c, STATUS_OK, np.full(128, 0.25))
+    cache.save(merge=True)
+
+    cache = EncodingCache(str(tmp_path / 'cache.npz')).load()
+    assert sorted(cache.entries) == ['alice/a.jpg', 'alice/b.jpg', 'bob/c.jpg']
+    np.testing.assert_allclose(cache.lookup('alice/a.jpg', a)[2], 0.5)
+    np.testing.assert_allclose(cache.lookup('bob/c.jpg', c)[2], 0.25)
+
+
+@pytest.fixture
+def trainer_env(tmp_path, monkeypatch):
+    """在临时目录中运行训练脚本，编码用计数的替身代替face_recognition"""
+    pytest.importorskip('face_recognition')
+    pytest.importorskip('cv2')
+    sys.path.insert(0, ROOT)
+    import train_model
+
+    monkeypatch.chdir(tmp_path)
+    encoded = []
+
+    def fake_encode(path):
+        encoded.append(os.path.basename(path))
+        return np.random.default_rng(len(encoded)).normal(0, 0.1, 128).astype(np.float32)
+
+    monkeypatch.setattr(train_model, 'encode_image', fake_encode)
+    monkeypatch.setattr(train_model, 'encode_worker', lambda path: (fake_encode(path), None))
+    return train_model, encoded
+
+
+def test_disabled_cache_never_hashes(trainer_env, monkeypatch):
+    train_model, encoded = trainer_env
+    with open('config.json', 'w') as f:
+        json.dump({'performance': {'cache_encodings': False}}, f)
+    write('faces/alice/a.jpg', b'aaa')
+
+    def no_hash(path, chunk_size=None):
+        raise AssertionError('缓存关闭时不应计算哈希')
+
+    monkeypatch.setattr(encoding_cache, 'file_sha256', no_hash)
+    assert train_model.FaceModelTrainer().train_model()
+    assert encoded == ['a.jpg']
+    assert not os.path.exists('models/encoding_cache.npz')
+
+
+def test_enrolled_images_are_cached_for_retrain(trainer_env):
+    train_model, encoded = trainer_env
+    write('faces/alice/a.jpg', b'aaa')
+    assert train_model.FaceModelTrainer().train_model()
+
+    write('faces/bob/b.jpg', b'bbb')
+    assert train_model.FaceModelTrainer().enroll_user('bob')
+    assert encoded == ['a.jpg', 'b.jpg']
+
+    # 完整重新训练时两个用户的照片都命中缓存
+    assert train_model.FaceModelTrainer().train_model()
+    assert encoded == ['a.jpg', 'b.jpg']
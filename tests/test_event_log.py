@@ -0,0 +1,57 @@
+"""事件日志：按大小轮转、压缩旧文件、超出数量的删除，读回时按时间顺序"""
+import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from event_log import EventLog
+
+
+def write_all(log, count):
+    log.start()
+    for i in range(count):
+        log.write('attempt', n=i, padding='x' * 50)
+    log.stop()
+
+
+def test_rotation_keeps_order(tmp_path):
+    log = EventLog(log_dir=str(tmp_path), max_bytes=500, backups=20, flush_interval=0.05)
+    write_all(log, 40)
+
+    files = log.files()
+    assert len(files) > 3
+    assert files[-1] == log.path
+    assert all(name.endswith('.gz') for name in files[:-1])
+    assert os.path.getsize(log.path) < 500
+    with gzip.open(files[0], 'rt', encoding='utf-8') as f:
+        assert '"n": 0' in f.readline()
+
+    assert [record['n'] for record in log.read('attempt')] == list(range(40))
+    assert list(log.read('other')) == []
+    stats = log.get_stats()
+    assert stats['written'] == 40 and stats['rotations'] == len(files) - 1
+    assert stats['errors'] == 0 and stats['dropped'] == 0
+
+
+def test_oldest_backups_are_removed(tmp_path):
+    log = EventLog(log_dir=str(tmp_path), max_bytes=500, backups=2, compress=False,
+                   flush_interval=0.05)
+    write_all(log, 40)
+
+    assert log.files() == [log.path + '.2', log.path + '.1', log.path]
+    assert sorted(os.listdir(str(tmp_path))) == ['face_unlock.log', 'face_unlock.log.1',
+                                                 'face_unlock.log.2']
+    numbers = [record['n'] for record in log.read()]
+    # 留下的是最新的记录，顺序不变
+    assert numbers == list(range(40 - len(numbers), 40))
+    assert log.get_stats()['rotations'] > 2
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    log = EventLog(log_dir=str(tmp_path), queue_size=3)
+    for i in range(5):
+        log.write('attempt', n=i)
+    assert log.get_stats()['dropped'] == 2
+
+    write_all(log, 0)
+    assert [record['n'] for record in log.read()] == [0, 1, 2]
@@ -0,0 +1,60 @@
+"""采集线程：空闲时按空闲帧率读帧，wake()后恢复全帧率"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from frame_buffer import CaptureThread
+
+
+class CountingCamera:
+    """每次读帧约1ms的相机替身"""
+
+    def __init__(self):
+        self.reads = 0
+        self.frame = np.zeros((8, 8, 3), dtype=np.uint8)
+
+    def read(self):
+        self.reads += 1
+        time.sleep(0.001)
+        return self.frame
+
+
+def reads_during(camera, seconds):
+    before = camera.reads
+    time.sleep(seconds)
+    return camera.reads - before
+
+
+def test_idle_rate_and_wake():
+    camera = CountingCamera()
+    thread = CaptureThread(camera)
+    thread.start()
+    try:
+        assert thread.wait_ready()
+        thread.set_idle_rate(10.0)
+        time.sleep(0.15)
+        assert thread.idle
+        assert reads_during(camera, 0.5) <= 7
+
+        thread.wake(0.5)
+        assert not thread.idle
+        assert reads_during(camera, 0.3) > 50
+        time.sleep(0.3)
+        assert thread.idle
+    finally:
+        thread.stop()
+
+
+def test_full_rate_by_default():
+    camera = CountingCamera()
+    thread = CaptureThread(camera)
+    thread.start()
+    try:
+        assert thread.wait_ready()
+        assert not thread.idle
+        assert reads_during(camera, 0.2) > 50
+    finally:
+        thread.stop()
@@ -0,0 +1,58 @@
+"""识别任务：进行中时合并触发，wait_finished等待结束"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from jobs import JobManager
+
+
+def blocking_run():
+    release = threading.Event()
+    calls = []
+
+    def run(**context):
+        calls.append(context)
+        release.wait(5)
+        return {'success': True, 'user': 'alice'}
+
+    return run, release, calls
+
+
+def test_triggers_while_running_are_coalesced():
+    run, release, calls = blocking_run()
+    jobs = JobManager(run)
+
+    first, coalesced = jobs.submit(source='web')
+    assert not coalesced
+    second, coalesced = jobs.submit(source='button')
+    assert coalesced and second is first
+    assert first.triggers == 2
+
+    release.set()
+    assert jobs.wait_finished(first, 5)
+    assert first.result == {'success': True, 'user': 'alice'}
+    assert calls == [{'source': 'web'}]
+    assert jobs.get_stats()['coalesced'] == 1
+
+    # 上一个任务结束后再提交是新任务
+    third, coalesced = jobs.submit(source='web')
+    assert not coalesced and third is not first
+    jobs.wait_finished(third, 5)
+
+
+def test_wait_finished_times_out_and_errors_are_recorded():
+    run, release, _ = blocking_run()
+    jobs = JobManager(run)
+    job, _ = jobs.submit()
+    assert not jobs.wait_finished(job, 0.05)
+    release.set()
+    assert jobs.wait_finished(job, 5)
+
+    def fail():
+        raise RuntimeError('相机不可用')
+
+    failing = JobManager(fail)
+    job, _ = failing.submit()
+    assert failing.wait_finished(job, 5)
+    assert job.state == 'error' and job.error == '相机不可用'
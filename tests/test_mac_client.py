@@ -0,0 +1,106 @@
+"""Mac解锁客户端重试：请求可能已送达时不能重发/unlock"""
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+pytest.importorskip('requests')
+from mac_client import UnlockDispatcher
+from utils.mac_stub_server import StubMacServer
+
+
+class DroppingServer:
+    """读完请求后不回复直接断开连接，统计收到的请求数"""
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        self.requests = 0
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                if conn.recv(65536):
+                    self.requests += 1
+
+    def close(self):
+        self.sock.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def server():
+    server = DroppingServer()
+    yield server
+    server.close()
+
+
+def test_unlock_not_resent_after_disconnect(server):
+    client = UnlockDispatcher(port=server.port, timeout=2.0, retries=2, backoff=0.01)
+    status, body, _ = client._request('POST', '/unlock', {'user': 'alice'}, 2.0)
+
+    assert status == 'connection_error'
+    assert server.requests == 1
+    assert client.stats['retries'] == 0
+
+
+def test_status_retried_after_disconnect(server):
+    client = UnlockDispatcher(port=server.port, timeout=2.0, retries=2, backoff=0.01)
+    status, body, _ = client._request('GET', '/status', None, 2.0)
+
+    assert status == 'connection_error'
+    assert server.requests == 3
+    assert client.stats['retries'] == 2
+
+
+def test_unlock_retried_when_connection_refused():
+    client = UnlockDispatcher(port=free_port(), timeout=2.0, retries=2, backoff=0.01)
+    status, body, _ = client._request('POST', '/unlock', {'user': 'alice'}, 2.0)
+
+    assert status == 'connection_error'
+    assert client.stats['retries'] == 2
+
+
+@pytest.fixture
+def slow_mac():
+    server = StubMacServer(port=0, unlock_delay=1.0, wake_delay=1.0).start()
+    client = UnlockDispatcher(port=server.port, key=server.key, timeout=5.0).start()
+    yield server, client
+    client.stop()
+    server.stop()
+
+
+def test_unlock_not_queued_behind_wake(slow_mac):
+    server, client = slow_mac
+    client.wake_async()
+    future = client.unlock_async('alice')
+    time.sleep(0.3)
+    # /wake还在处理中，/unlock已经送达Mac
+    assert server.counters['requests'] >= 2
+    assert future.result(timeout=5)[0] == 'ok'
+
+
+def test_status_not_queued_behind_unlock(slow_mac):
+    server, client = slow_mac
+    client.unlock_async('alice')
+    time.sleep(0.1)
+    start = time.monotonic()
+    assert client.check_status() == {'status': 'running', 'stub': True}
+    assert time.monotonic() - start < 0.5
@@ -0,0 +1,108 @@
+"""匹配器：批量匹配与逐个暴力计算一致，原型索引与精确匹配一致"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from matcher import EncodingMatcher, PrototypeIndex, build_prototype_index
+
+
+def random_gallery(rng, users=12, per_user=6, dim=128):
+    encodings, names = [], []
+    for u in range(users):
+        center = rng.normal(0, 0.1, dim)
+        for _ in range(per_user):
+            encodings.append(center + rng.normal(0, 0.02, dim))
+            names.append(f"user{u}")
+    return np.array(encodings, dtype=np.float32), names
+
+
+def at_distance(rng, point, distance):
+    direction = rng.normal(0, 1, len(point))
+    return point + direction / np.linalg.norm(direction) * distance
+
+
+def outlier_gallery(rng, dim=128):
+    """alice: 4个紧密簇加1个离群编码；查询距离离群编码0.30，bob距离查询0.52，其他用户更远"""
+    encodings, names = [], []
+    for _ in range(4):
+        center = rng.normal(0, 0.1, dim)
+        for _ in range(10):
+            encodings.append(center + rng.normal(0, 0.005, dim))
+            names.append('alice')
+    outlier = rng.normal(0, 0.1, dim)
+    encodings.append(outlier)
+    names.append('alice')
+
+    query = at_distance(rng, outlier, 0.30)
+    encodings.append(at_distance(rng, query, 0.52))
+    names.append('bob')
+    for u in range(8):
+        encodings.append(at_distance(rng, query, 0.9 + 0.01 * u))
+        names.append(f"other{u}")
+    return np.array(encodings, dtype=np.float32), names, query.astype(np.float32)
+
+
+def test_matcher_agrees_with_brute_force():
+    rng = np.random.default_rng(0)
+    encodings, names = random_gallery(rng)
+    order = rng.permutation(len(names))
+    encodings, names = encodings[order], [names[i] for i in order]
+    matcher = EncodingMatcher.from_names(encodings, names)
+    queries = encodings[:10] + rng.normal(0, 0.02, (10, encodings.shape[1])).astype(np.float32)
+
+    for query, result in zip(queries, matcher.match(queries)):
+        distances = np.linalg.norm(encodings - query, axis=1)
+        best = int(distances.argmin())
+        runner_up = min(d for d, n in zip(distances, names) if n != names[best])
+        assert result.index == best
+        assert result.name == names[best]
+        assert result.distance == pytest.approx(distances[best], abs=1e-4)
+        assert result.margin == pytest.approx(runner_up - distances[best], abs=1e-4)
+
+
+def test_single_user_margin_is_infinite():
+    encodings = np.zeros((2, 4), dtype=np.float32)
+    result = EncodingMatcher.from_names(encodings, ['alice', 'alice']).match(encodings[0])[0]
+    assert result.name == 'alice'
+    assert result.margin == float('inf')
+
+
+@pytest.mark.parametrize('tolerance', [None, 0.4])
+def test_prototype_index_agrees_with_exact(tolerance):
+    rng = np.random.default_rng(1)
+    encodings, names = random_gallery(rng, users=30)
+    matcher = EncodingMatcher.from_names(encodings, names)
+    index = PrototypeIndex(matcher, build_prototype_index(encodings, names), max_candidates=4)
+    queries = np.concatenate([
+        encodings[::7] + rng.normal(0, 0.03, (len(encodings[::7]), encodings.shape[1])),
+        rng.normal(0, 0.1, (10, encodings.shape[1]))
+    ]).astype(np.float32)
+
+    for exact, approx in zip(matcher.match(queries), index.match(queries, tolerance)):
+        if tolerance is not None and exact.distance > tolerance:
+            assert approx.distance > tolerance
+            continue
+        assert approx.name == exact.name
+        assert approx.index == exact.index
+        assert approx.distance == pytest.approx(exact.distance, abs=1e-4)
+        assert approx.margin == pytest.approx(exact.margin, abs=1e-4)
+    assert index.get_stats()['avg_rows_scored'] < len(encodings)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_prototype_index_rescores_pruned_outlier(seed):
+    rng = np.random.default_rng(seed)
+    encodings, names, query = outlier_gallery(rng)
+    matcher = EncodingMatcher.from_names(encodings, names)
+    index = PrototypeIndex(matcher, build_prototype_index(encodings, names))
+
+    exact = matcher.match(query)[0]
+    result = index.match(query, tolerance=0.4)[0]
+
+    assert exact.name == 'alice' and exact.distance == pytest.approx(0.30, abs=1e-3)
+    assert result.name == 'alice'
+    assert result.distance == pytest.approx(exact.distance, abs=1e-4)
+    assert result.margin == pytest.approx(exact.margin, abs=1e-4)
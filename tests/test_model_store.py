@@ -0,0 +1,86 @@
+"""模型存储：保存后内存映射读回的编码、用户、元数据和原型索引与训练结果一致"""
+import os
+import pickle
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from matcher import EncodingMatcher, build_prototype_index
+from model_store import ALIGNMENT, ModelStore, convert_pickle, save_store
+
+
+def gallery():
+    rng = np.random.default_rng(0)
+    names = ['bob', 'alice', 'bob', 'carol', 'alice', 'bob', '张三']
+    encodings = rng.normal(0, 0.1, (len(names), 128)).astype(np.float32)
+    return encodings, names
+
+
+def test_round_trip(tmp_path):
+    encodings, names = gallery()
+    index = build_prototype_index(encodings, names, prototypes_per_user=2)
+    path = str(tmp_path / 'models' / 'face_model.bin')
+    meta = {'tolerance': 0.4, 'trained_at': '2026-01-01T00:00:00'}
+
+    assert save_store(path, encodings, names, meta=meta, prototype_index=index) == len(names)
+    assert not os.path.exists(path + '.tmp')
+    store = ModelStore(path)
+
+    assert len(store) == len(names)
+    assert store.users == ['bob', 'alice', 'carol', '张三']
+    assert store.meta == meta
+    assert isinstance(store.encodings, np.memmap)
+    for spec in store.header['arrays'].values():
+        assert spec['offset'] % ALIGNMENT == 0
+
+    # 读回的行按用户分组，但每个用户的编码集合不变
+    assert sorted(store.names()) == sorted(names)
+    for user in set(names):
+        saved = encodings[[n == user for n in names]]
+        loaded = np.asarray(store.encodings)[[n == user for n in store.names()]]
+        np.testing.assert_array_equal(loaded, saved)
+
+    loaded_index = store.prototype_index()
+    assert loaded_index['users'] == index['users']
+    for key in ('centroids', 'prototypes', 'prototype_users'):
+        np.testing.assert_array_equal(loaded_index[key], index[key])
+
+    queries = encodings + 0.01
+    expected = EncodingMatcher.from_names(encodings, names).match(queries)
+    model = store.as_model()
+    assert model['tolerance'] == 0.4 and model['total_faces'] == len(names)
+    for a, b in zip(EncodingMatcher.from_model(model).match(queries), expected):
+        assert a.name == b.name
+        assert a.distance == pytest.approx(b.distance, abs=1e-5)
+
+
+def test_without_prototype_index(tmp_path):
+    encodings, names = gallery()
+    path = str(tmp_path / 'face_model.bin')
+    save_store(path, encodings, names)
+    store = ModelStore(path)
+    assert store.prototype_index() is None
+    assert 'prototype_index' not in store.as_model()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'face_model.bin'
+    path.write_bytes(b'\x80\x04not a model at all')
+    with pytest.raises(ValueError):
+        ModelStore(str(path))
+
+
+def test_convert_pickle(tmp_path):
+    encodings, names = gallery()
+    pickle_path = str(tmp_path / 'face_model.pkl')
+    with open(pickle_path, 'wb') as f:
+        pickle.dump({'encodings': list(encodings), 'names': names, 'tolerance': 0.45,
+                     'total_faces': len(names)}, f)
+
+    store_path = str(tmp_path / 'face_model.bin')
+    assert convert_pickle(pickle_path, store_path) == len(names)
+    store = ModelStore(store_path)
+    assert store.meta == {'tolerance': 0.45}
+    assert sorted(store.names()) == sorted(names)
@@ -0,0 +1,60 @@
+"""流水线统计：采集线程和协调线程同时更新时，读取到的统计不会是更新到一半的值"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from pipeline import RecognitionPipeline, StageTimer
+
+
+class SlowTimer(StageTimer):
+    """次数和耗时之间留出空档，模拟更新到一半时被其他线程读取"""
+
+    def __init__(self):
+        super().__init__()
+        self.halfway = threading.Event()
+
+    def record(self, elapsed):
+        self.count += 1
+        self.halfway.set()
+        time.sleep(0.1)
+        self.time_ms += elapsed * 1000
+
+
+def make_pipeline():
+    return RecognitionPipeline(buffer=None, pool=None, workers=1, match=None, decide=None,
+                               active=False)
+
+
+def test_stats_are_read_consistently_while_recording():
+    pipeline = make_pipeline()
+    timer = pipeline.stages['capture'] = SlowTimer()
+    writer = threading.Thread(target=pipeline._record, args=('capture', 0.02))
+    writer.start()
+    timer.halfway.wait(1.0)
+    stats = pipeline.get_stats()
+    writer.join()
+    assert stats['capture'] == {'count': 1, 'avg_ms': 20.0}
+
+
+def test_concurrent_records_are_all_counted():
+    pipeline = make_pipeline()
+
+    def record(stage):
+        for _ in range(2000):
+            pipeline._record(stage, 0.001)
+            pipeline._offer(object())
+
+    threads = [threading.Thread(target=record, args=(stage,))
+               for stage in ('capture', 'capture', 'detect')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pipeline.get_stats()
+    assert stats['capture']['count'] == 4000
+    assert stats['detect']['count'] == 2000
+    # 队列容量2，其余的帧都按丢弃计数
+    assert stats['dropped'] == 6000 - pipeline.frames.qsize()
@@ -0,0 +1,50 @@
+"""质量门限：整帧检查和人脸检查分别计数，子进程的检查结果汇总时包含通过数"""
+import os
+import sys
+from concurrent.futures import Future
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+import burst
+from quality import QualityGate, REASON_BLUR, REASON_DARK, REASON_SMALL
+
+
+def test_frame_and_face_counters_are_separate():
+    gate = QualityGate(max_yaw=0)
+    dark = np.zeros((120, 160, 3), dtype=np.uint8)
+    assert gate.frame_score(dark)[1] == REASON_DARK
+
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    kept, _, reasons = gate.filter_faces(image, [(10, 110, 110, 10), (0, 20, 20, 0)])
+    assert len(kept) == 1 and reasons == [REASON_SMALL]
+
+    stats = gate.get_stats()
+    assert stats['frames'] == dict(stats['frames'], checked=1, passed=0, rejections={REASON_DARK: 1})
+    assert stats['faces'] == dict(stats['faces'], checked=2, passed=1, rejections={REASON_SMALL: 1})
+
+
+class WorkerPool:
+    """子进程替身：每帧检测到2个人脸，质量检查保留1个、拒绝1个"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(([(0, 10, 10, 0)], [np.zeros(128)], [REASON_BLUR]))
+        return future
+
+
+class PassingGate(QualityGate):
+    def frame_score(self, image):
+        self.record_frame(None)
+        return 1.0, None
+
+
+def test_worker_passes_are_counted():
+    gate = PassingGate()
+    recognizer = burst.BurstRecognizer(WorkerPool(), workers=1, frames=3, agree=1, quality_gate=gate)
+    recognizer.recognize(iter(range(3)), lambda locations, encodings: None)
+
+    stats = gate.get_stats()
+    assert stats['frames']['checked'] == 3 and stats['frames']['passed'] == 3
+    assert stats['faces'] == dict(stats['faces'], checked=6, passed=3, rejections={REASON_BLUR: 3})
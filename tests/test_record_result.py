@@ -0,0 +1,51 @@
+"""record_result 输出的结果必须是合法JSON（Web任务、SSE和事件日志都直接序列化它）"""
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+pytest.importorskip('requests')
+from main import FaceUnlockSystem
+from matcher import EncodingMatcher
+from metrics import MetricsRegistry
+
+
+def bare_system():
+    """不打开相机、不加载模型，只带record_result用到的属性"""
+    system = object.__new__(FaceUnlockSystem)
+    system.metrics = MetricsRegistry()
+    system.timings = {}
+    system.attempt_start = time.perf_counter()
+    system.trigger_source = 'test'
+    return system
+
+
+def test_one_user_gallery_margin_is_json_safe():
+    encodings = np.full((2, 128), 0.1, dtype=np.float32)
+    matcher = EncodingMatcher.from_names(encodings, ['alice', 'alice'])
+    match = matcher.match(encodings[:1])[0]
+    assert math.isinf(match.margin)
+
+    system = bare_system()
+    result = system.record_result({
+        'name': match.name,
+        'confidence': 1 - match.distance,
+        'distance': match.distance,
+        'margin': match.margin
+    })
+
+    assert result['success'] and result['user'] == 'alice'
+    assert result['margin'] is None
+    json.dumps(result, allow_nan=False)
+
+
+def test_finite_margin_is_kept():
+    system = bare_system()
+    result = system.record_result({'name': 'bob', 'confidence': 0.7, 'distance': 0.3,
+                                   'margin': 0.123456})
+    assert result['margin'] == 0.1235
@@ -4,8 +4,11 @@
 不依赖采集模块
 """
 import os
-import pickle
+import sys
 import json
+import time
+import argparse
+import multiprocessing
 from datetime import datetime
 
 # 检查face_recognition库
@@ -18,10 +21,43 @@ except ImportError as e:
     print("请安装：pip3 install face-recognition opencv-python numpy")
     exit(1)
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'core'))
+from matcher import build_prototype_index
+from ann_index import IVFIndex
+from model_store import ModelStore, save_store
+from encoding_cache import EncodingCache, STATUS_OK, STATUS_NO_FACE
+
+def encode_image(img_path):
+    """编码一张图片，未检测到人脸返回None"""
+    # 加载图片
+    image = face_recognition.load_image_file(img_path)
+    
+    # 查找人脸
+    face_locations = face_recognition.face_locations(image)
+    
+    if not face_locations:
+        return None
+    
+    # 生成编码（只取第一张脸）
+    return face_recognition.face_encodings(image, face_locations)[0]
+
+
+def encode_worker(img_path):
+    """进程池任务：只把编码结果传回主进程，解码后的图片留在子进程里"""
+    try:
+        return encode_image(img_path), None
+    except Exception as e:
+        return None, str(e)
+
+
 class FaceModelTrainer:
-    def __init__(self, faces_dir="faces", model_dir="models"):
+    def __init__(self, faces_dir="faces", model_dir="models", workers=1):
         self.faces_dir = faces_dir
         self.model_dir = model_dir
+        self.workers = max(1, workers)
+        
+        self.model_path = os.path.join(model_dir, 'face_model.bin')
+        self.cache_path = os.path.join(model_dir, 'encoding_cache.npz')
         
         # 创建模型目录
         os.makedirs(model_dir, exist_ok=True)
@@ -68,6 +104,57 @@ class FaceModelTrainer:
         
         return face_data
     
+    def encode_image(self, img_path):
+        """编码一张图片，未检测到人脸返回None"""
+        return encode_image(img_path)
+    
+    def encode_many(self, img_paths):
+        """按顺序逐个产出 (编码, 错误)；workers>1时由进程池并行编码"""
+        if self.workers <= 1 or len(img_paths) <= 1:
+            for img_path in img_paths:
+                yield encode_worker(img_path)
+            return
+        
+        # imap保证结果顺序与输入一致，子进程各自读图，主进程只持有编码
+        with multiprocessing.Pool(min(self.workers, len(img_paths))) as pool:
+            for result in pool.imap(encode_worker, img_paths, chunksize=1):
+                yield result
+    
+    def ann_config(self):
+        """IVF近似索引配置"""
+        recognition = self.config.get('recognition', {})
+        ann = recognition.get('ann', {})
+        return {
+            'enabled': recognition.get('index') == 'ivf',
+            'path': ann.get('path', os.path.join(self.model_dir, 'face_ann.npz')),
+            'nlist': ann.get('nlist', 0),
+            'nprobe': ann.get('nprobe', 8)
+        }
+    
+    def build_ann_index(self, encodings, names):
+        """全量构建IVF近似索引"""
+        ann = self.ann_config()
+        if not ann['enabled']:
+            return
+        
+        index = IVFIndex.build(encodings, names, nlist=ann['nlist'], nprobe=ann['nprobe'])
+        index.save(ann['path'])
+        print(f"  - IVF索引: {ann['path']} ({index.nlist} 桶)")
+    
+    def save_model(self, encodings, names):
+        """保存为内存映射模型文件，同时生成原型索引"""
+        # 构建原型索引，识别时先粗筛候选用户再精确匹配
+        prototypes_per_user = self.config.get('recognition', {}).get('prototypes_per_user', 4)
+        prototype_index = build_prototype_index(encodings, names, prototypes_per_user)
+        
+        meta = {
+            'tolerance': self.config.get('recognition_tolerance', 0.4),
+            'trained_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        save_store(self.model_path, encodings, names, meta=meta,
+                   prototype_index=prototype_index)
+        return prototype_index
+    
     def train_model(self):
         """训练人脸识别模型"""
         print("\n=== 开始训练人脸识别模型 ===\n")
@@ -91,12 +178,40 @@ class FaceModelTrainer:
         known_encodings = []
         known_names = []
         
+        # 编码缓存：未变化的照片直接复用上次的结果
+        use_cache = self.config.get('performance', {}).get('cache_encodings', True)
+        cache = EncodingCache(self.cache_path)
+        if use_cache:
+            cache.load()
+        
         total_images = sum(info['count'] for info in face_data.values())
         processed = 0
         
-        print(f"处理 {total_images} 张图片...")
+        # 先查缓存，未命中的照片交给编码器（可能是进程池）按顺序流式返回
+        cached = {}
+        misses = []
+        for person_name, info in face_data.items():
+            for img_name in info['images']:
+                img_path = os.path.join(info['path'], img_name)
+                cache_key = os.path.join(person_name, img_name)
+                hit = False
+                if use_cache:
+                    try:
+                        hit, status, encoding = cache.lookup(cache_key, img_path)
+                    except OSError:
+                        pass
+                if hit:
+                    cached[cache_key] = (status, encoding)
+                else:
+                    misses.append(img_path)
+        
+        mode = f"{self.workers} 个进程" if self.workers > 1 and len(misses) > 1 else "单进程"
+        print(f"处理 {total_images} 张图片（需编码 {len(misses)} 张，{mode}）...")
         print("-" * 40)
         
+        encoded = self.encode_many(misses)
+        encode_start = time.time()
+        
         for person_name, info in face_data.items():
             print(f"\n处理 {person_name} 的照片...")
             person_encodings = []
@@ -110,53 +225,60 @@ class FaceModelTrainer:
                 progress = processed / total_images * 100
                 print(f"\r[{progress:5.1f}%] 处理: {img_name[:30]}...", end="")
                 
-                try:
-                    # 加载图片
-                    image = face_recognition.load_image_file(img_path)
-                    
-                    # 查找人脸
-                    face_locations = face_recognition.face_locations(image)
-                    
-                    if face_locations:
-                        # 生成编码（只取第一张脸）
-                        encoding = face_recognition.face_encodings(image, face_locations)[0]
-                        person_encodings.append(encoding)
-                        known_encodings.append(encoding)
-                        known_names.append(person_name)
-                    else:
+                cache_key = os.path.join(person_name, img_name)
+                if cache_key in cached:
+                    status, encoding = cached[cache_key]
+                else:
+                    encoding, error = next(encoded)
+                    if error:
+                        print(f"\n  ⚠ 处理失败: {img_name} - {error}")
                         failed_count += 1
-                        
-                except Exception as e:
-                    print(f"\n  ⚠ 处理失败: {img_name} - {e}")
+                        continue
+                    status = STATUS_OK if encoding is not None else STATUS_NO_FACE
+                    if use_cache:
+                        try:
+                            cache.record(cache_key, img_path, status, encoding)
+                        except OSError:
+                            pass
+                
+                if status == STATUS_OK:
+                    person_encodings.append(encoding)
+                    known_encodings.append(encoding)
+                    known_names.append(person_name)
+                else:
                     failed_count += 1
             
             print(f"\n  ✓ {person_name}: 成功处理 {len(person_encodings)}/{info['count']} 张")
             if failed_count > 0:
                 print(f"  ⚠ {failed_count} 张处理失败")
         
+        encoded.close()
+        encode_time = time.time() - encode_start
+        if misses and encode_time > 0:
+            print(f"\n编码速度: {len(misses) / encode_time:.2f} 张/秒 ({encode_time:.1f}秒)")
+        
+        if use_cache:
+            stats = cache.stats
+            print(f"编码缓存: 命中 {stats['hits'] + stats['rehashed']} 张, "
+                  f"新编码 {stats['misses']} 张, 已删除 {len(cache.removed())} 张")
+            cache.save()
+        
         # 保存模型
         if known_encodings:
-            model_data = {
-                'encodings': known_encodings,
-                'names': known_names,
-                'tolerance': self.config.get('recognition_tolerance', 0.4),
-                'trained_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'total_faces': len(known_encodings),
-                'users': list(set(known_names))
-            }
-            
-            model_path = os.path.join(self.model_dir, 'face_model.pkl')
-            
-            with open(model_path, 'wb') as f:
-                pickle.dump(model_data, f)
+            prototype_index = self.save_model(known_encodings, known_names)
             
             print("\n" + "="*50)
             print("✓ 模型训练完成！")
-            print(f"  - 模型文件: {model_path}")
+            print(f"  - 模型文件: {self.model_path}")
             print(f"  - 总人脸数: {len(known_encodings)}")
             print(f"  - 用户数: {len(set(known_names))}")
+            print(f"  - 原型数: {len(prototype_index['prototypes'])}")
             print(f"  - 用户列表: {', '.join(set(known_names))}")
             
+            # IVF索引的编号必须与模型文件中的行号一致
+            store = ModelStore(self.model_path)
+            self.build_ann_index(store.encodings, store.names())
+            
             # 更新配置文件中的用户列表
             self.config['authorized_users'] = list(set(known_names))
             with open('config.json', 'w') as f:
@@ -169,37 +291,135 @@ class FaceModelTrainer:
             print("\n✗ 没有成功处理任何人脸")
             return False
     
+    def enroll_user(self, person_name):
+        """增量注册用户：只编码该用户的照片，追加到现有模型和IVF索引"""
+        person_dir = os.path.join(self.faces_dir, person_name)
+        
+        if not os.path.exists(self.model_path):
+            print("✗ 模型文件不存在，请先完整训练")
+            return False
+        
+        if not os.path.isdir(person_dir):
+            print(f"✗ 未找到用户照片目录: {person_dir}")
+            return False
+        
+        store = ModelStore(self.model_path)
+        
+        if person_name in store.users:
+            print(f"⚠ {person_name} 已在模型中，请完整重新训练以更新其照片")
+            return False
+        
+        images = [f for f in os.listdir(person_dir)
+                  if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+        
+        # 注册的照片同样记入编码缓存，下次完整训练时不必重新编码
+        use_cache = self.config.get('performance', {}).get('cache_encodings', True)
+        cache = EncodingCache(self.cache_path).load() if use_cache else None
+        
+        new_encodings = []
+        for img_name in images:
+            img_path = os.path.join(person_dir, img_name)
+            cache_key = os.path.join(person_name, img_name)
+            try:
+                hit = False
+                if cache is not None:
+                    hit, status, encoding = cache.lookup(cache_key, img_path)
+                if not hit:
+                    encoding = self.encode_image(img_path)
+                    if cache is not None:
+                        cache.record(cache_key, img_path,
+                                     STATUS_OK if encoding is not None else STATUS_NO_FACE, encoding)
+                if encoding is not None:
+                    new_encodings.append(encoding)
+            except Exception as e:
+                print(f"  ⚠ 处理失败: {img_name} - {e}")
+        
+        if cache is not None:
+            cache.save(merge=True)
+        
+        if not new_encodings:
+            print(f"✗ {person_name} 没有可用的人脸照片")
+            return False
+        
+        # 新用户的编码追加在末尾，已有编码的行号不变
+        start = len(store)
+        encodings = np.concatenate([store.encodings, np.asarray(new_encodings, dtype=np.float32)])
+        names = store.names() + [person_name] * len(new_encodings)
+        self.save_model(encodings, names)
+        
+        print(f"✓ {person_name}: 新增 {len(new_encodings)}/{len(images)} 张")
+        
+        # 新编码直接插入IVF索引，数据增长过多时才重新聚类
+        ann = self.ann_config()
+        if ann['enabled']:
+            if os.path.exists(ann['path']):
+                index = IVFIndex.load(ann['path'], nprobe=ann['nprobe'])
+                index.add(new_encodings, [person_name] * len(new_encodings),
+                          np.arange(start, start + len(new_encodings)))
+                if index.needs_rebuild():
+                    print("  IVF索引增长过多，重新聚类...")
+                    self.build_ann_index(encodings, names)
+                else:
+                    index.save(ann['path'])
+                    print(f"  - IVF索引已更新 ({len(index)} 条)")
+            else:
+                self.build_ann_index(encodings, names)
+        
+        self.config['authorized_users'] = list(dict.fromkeys(names))
+        with open('config.json', 'w') as f:
+            json.dump(self.config, f, indent=2, ensure_ascii=False)
+        
+        return True
+    
     def test_model(self):
         """测试模型"""
-        model_path = os.path.join(self.model_dir, 'face_model.pkl')
-        
-        if not os.path.exists(model_path):
+        if not os.path.exists(self.model_path):
             print("✗ 模型文件不存在")
             return
         
-        with open(model_path, 'rb') as f:
-            model_data = pickle.load(f)
+        store = ModelStore(self.model_path)
         
         print("\n=== 模型信息 ===")
-        print(f"训练时间: {model_data.get('trained_at', '未知')}")
-        print(f"人脸总数: {model_data.get('total_faces', 0)}")
-        print(f"用户列表: {', '.join(model_data.get('users', []))}")
-        print(f"识别阈值: {model_data.get('tolerance', 0.4)}")
+        print(f"格式版本: v{store.version}")
+        print(f"训练时间: {store.meta.get('trained_at', '未知')}")
+        print(f"人脸总数: {len(store)}")
+        print(f"用户列表: {', '.join(store.users)}")
+        print(f"识别阈值: {store.meta.get('tolerance', 0.4)}")
+        prototype_index = store.prototype_index()
+        if prototype_index is not None:
+            print(f"原型索引: {len(prototype_index['prototypes'])} 个原型")
+        else:
+            print("原型索引: 无（重新训练后生成）")
+
+
+def parse_args():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(description='人脸识别模型训练')
+    parser.add_argument('choice', nargs='?', choices=['1', '2', '3', '4'],
+                        help='直接执行菜单项（不给出时显示菜单）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行编码的进程数 (默认1)')
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    
     print("="*50)
     print("人脸识别模型训练系统")
     print("="*50)
     
-    print("\n选择操作：")
-    print("1. 训练新模型")
-    print("2. 查看现有模型")
-    print("3. 查看人脸数据")
-    
-    choice = input("\n请选择 (1/2/3) [1]: ").strip() or "1"
+    choice = args.choice
+    if choice is None:
+        print("\n选择操作：")
+        print("1. 训练新模型")
+        print("2. 查看现有模型")
+        print("3. 查看人脸数据")
+        print("4. 增量注册新用户")
+        
+        choice = input("\n请选择 (1/2/3/4) [1]: ").strip() or "1"
     
-    trainer = FaceModelTrainer()
+    trainer = FaceModelTrainer(workers=args.workers)
     
     if choice == "1":
         # 训练模型
@@ -228,6 +448,12 @@ def main():
             print(f"{'总计':15} : {total:3} 张照片")
         else:
             print("✗ 没有找到人脸数据")
+    
+    elif choice == "4":
+        # 增量注册
+        name = input("用户名（faces/下的目录名）: ").strip()
+        if name:
+            trainer.enroll_user(name)
 
 
 if __name__ == "__main__":
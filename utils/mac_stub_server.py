@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Mac解锁服务模拟 - 本地测试用，不需要Mac
+Stub Mac unlock server - local stand-in for mac_unlock_service.py
+
+实现与Mac端相同的接口（/status、/unlock、/unlock_v2、/wake），
+可以模拟解锁和唤醒的耗时、随机失败，并统计请求数和TCP连接数，
+用于验证连接复用和重试。
+
+用法:
+  python3 utils/mac_stub_server.py --port 5001 --unlock-delay 1.5 --wake-delay 0.8
+  然后把config.json中的mac.host设为运行本脚本的机器
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 才支持keep-alive
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.record('connections')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def reply(self, code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def do_GET(self):
+        self.server.record('requests')
+        if self.path == '/status':
+            self.reply(200, {'status': 'running', 'stub': True})
+        else:
+            self.reply(404, {'status': 'not_found'})
+
+    def do_POST(self):
+        self.server.record('requests')
+        data = self.read_json()
+
+        if self.path == '/wake':
+            time.sleep(self.server.wake_delay)
+            self.server.record('wakes')
+            self.reply(200, {'status': 'awake'})
+            return
+
+        if self.path not in ('/unlock', '/unlock_v2'):
+            self.reply(404, {'status': 'not_found'})
+            return
+
+        if data.get('key') != self.server.key:
+            self.reply(401, {'status': 'unauthorized'})
+            return
+
+        if random.random() < self.server.fail_rate:
+            self.server.record('failures')
+            self.reply(500, {'status': 'error'})
+            return
+
+        # 模拟唤醒屏幕+输入密码；刚唤醒过的屏幕不再需要唤醒时间
+        delay = self.server.unlock_delay
+        if time.monotonic() - self.server.last_wake > self.server.wake_valid:
+            delay += self.server.wake_delay
+        time.sleep(delay)
+        self.server.record('unlocks')
+        self.reply(200, {'status': 'success', 'user': data.get('user')})
+
+
+class StubMacServer(ThreadingHTTPServer):
+    """可在测试/基准中以线程方式启动的模拟服务"""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=5001, key='face_unlock_2024', unlock_delay=0.0,
+                 wake_delay=0.0, wake_valid=10.0, fail_rate=0.0, verbose=False):
+        super().__init__((host, port), StubHandler)
+        self.key = key
+        self.unlock_delay = unlock_delay
+        self.wake_delay = wake_delay
+        self.wake_valid = wake_valid
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.last_wake = 0.0
+
+        self.lock = threading.Lock()
+        self.counters = {'connections': 0, 'requests': 0, 'unlocks': 0, 'wakes': 0, 'failures': 0}
+        self.thread = None
+
+    def record(self, name):
+        with self.lock:
+            self.counters[name] += 1
+            if name == 'wakes':
+                self.last_wake = time.monotonic()
+
+    def handle_error(self, request, client_address):
+        # 客户端超时后先断开连接是正常情况，只在verbose时打印
+        if self.verbose:
+            super().handle_error(request, client_address)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """在后台线程中运行"""
+        self.thread = threading.Thread(target=self.serve_forever, name='mac-stub', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mac解锁服务模拟')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--key', default='face_unlock_2024')
+    parser.add_argument('--unlock-delay', type=float, default=1.0, help='输入密码耗时（秒）')
+    parser.add_argument('--wake-delay', type=float, default=0.5, help='点亮屏幕耗时（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='随机返回500的比例')
+    parser.add_argument('--verbose', action='store_true', help='打印每个请求')
+    args = parser.parse_args()
+
+    server = StubMacServer(args.host, args.port, args.key, args.unlock_delay,
+                           args.wake_delay, fail_rate=args.fail_rate, verbose=args.verbose)
+    print(f"✓ 模拟Mac服务运行在 {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n统计: {json.dumps(server.counters, ensure_ascii=False)}")
+
+
+if __name__ == '__main__':
+    main()
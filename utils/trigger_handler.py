@@ -1,10 +1,24 @@
 import RPi.GPIO as GPIO
+import os
+import sys
 import time
 import threading
 from flask import Flask, render_template_string, jsonify
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core'))
+from daemon import DaemonClient, DaemonError
+
+def recognize_via_daemon(source='trigger'):
+    """默认回调：请求识别守护进程识别一次（本进程不加载模型、不占用相机），返回是否成功"""
+    try:
+        result = DaemonClient.from_config().recognize(source=source)
+    except DaemonError as e:
+        print(f"✗ {e}")
+        return False
+    return bool(result.get('success'))
+
 class TriggerHandler:
-    def __init__(self, callback_func):
+    def __init__(self, callback_func=recognize_via_daemon):
         self.callback_func = callback_func
         self.is_processing = False
         
@@ -1,22 +1,102 @@
 #!/usr/bin/env python3
 """
 Web触发服务 - 支持手动触发人脸识别
+
+POST /jobs 立即返回任务ID，识别在后台执行；
+GET /jobs/<id> 轮询结果，GET /jobs/<id>/events 以SSE推送状态变化。
+GET /preview.mjpg 实时预览（叠加人脸框和识别结果），/preview.jpg 单张快照。
+GET /metrics 以Prometheus文本格式输出各阶段延迟直方图、计数器和进程资源。
+/debug/* 现场诊断（cProfile、tracemalloc、线程栈），需在配置中开启debug.profiling。
+
+识别守护进程（python3 run.py daemon）运行时，本服务只作为它的客户端：
+不再加载模型、打开相机，识别请求通过Unix套接字转发（此时预览和诊断接口不可用）。
 """
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+import hmac
 import json
+import os
 import threading
 import time
-from core.main import FaceUnlockSystem
+from core.daemon import DaemonClient, DaemonError
+from core.jobs import JobManager
+from core.profiling import AttemptProfiler, MemoryTracer, dump_threads
 
 app = Flask(__name__)
 face_system = None
-is_processing = False
+daemon = None
+job_manager = None
+preview = None
+profiler = None
+memory_tracer = None
+
+# SSE连接最长保持时间（秒），心跳间隔（秒）
+SSE_MAX_SECONDS = 60
+SSE_HEARTBEAT = 10
+# /trigger_unlock（旧接口）等待识别结果的时间（秒）
+TRIGGER_TIMEOUT = 30
+
+def run_recognition():
+    """任务线程中执行一次识别，返回结果和各阶段耗时"""
+    if daemon is not None:
+        return daemon.recognize(source='web')
+    face_system.run_once(source='web')
+    return face_system.last_result
+
+def collect_web_metrics():
+    """Web任务和预览的指标"""
+    jobs = job_manager.get_stats()
+    samples = [
+        ('web_jobs_total', 'counter', 'Recognition jobs started from the web.', {}, jobs['submitted']),
+        ('web_jobs_coalesced_total', 'counter', 'Web triggers merged into a running job.', {},
+         jobs['coalesced']),
+        ('web_jobs_errors_total', 'counter', 'Web recognition jobs that raised.', {}, jobs['errors'])
+    ]
+    if preview is not None:
+        stats = preview.get_stats()
+        samples += [
+            ('preview_viewers', 'gauge', 'Connected preview clients.', {}, stats['viewers']),
+            ('preview_frames_encoded_total', 'counter', 'Preview frames encoded.', {}, stats['encoded']),
+            ('preview_frames_sent_total', 'counter', 'Preview frames sent to clients.', {}, stats['sent'])
+        ]
+    return samples
 
 def init_face_system():
     """初始化人脸识别系统"""
-    global face_system
+    global face_system, daemon, job_manager, preview, profiler, memory_tracer
     try:
+        # 守护进程已持有相机和模型时只做客户端
+        client = DaemonClient.from_config()
+        if client.available():
+            daemon = client
+            job_manager = JobManager(run_recognition)
+            print(f"✓ 使用识别守护进程: {client.path}")
+            return True
+        
+        from core.main import FaceUnlockSystem
+        from core.preview import PreviewStream
         face_system = FaceUnlockSystem()
+        job_manager = JobManager(run_recognition)
+        
+        # 预览从常驻相机的帧缓冲取帧，单次拍照的相机不支持
+        preview_config = face_system.config.get('preview', {})
+        if preview_config.get('enabled', True) and face_system.capture_thread is not None:
+            stream = PreviewStream.from_config(face_system.capture_thread.buffer,
+                                               face_system.overlay, preview_config)
+            if stream.available:
+                preview = stream.start()
+                print(f"✓ 实时预览: /preview.mjpg ({stream.fps} fps, {stream.width}px)")
+            else:
+                print("⚠ 未安装OpenCV或Pillow，实时预览不可用")
+        
+        face_system.metrics.collector(collect_web_metrics)
+        
+        # 诊断接口默认关闭；开启后分析器只在被调用时才挂到识别路径上
+        if face_system.config.get('debug', {}).get('profiling', False):
+            log_dir = face_system.config.get('system', {}).get('log_dir', 'logs')
+            profiler = AttemptProfiler(face_system, os.path.join(log_dir, 'profiles'))
+            memory_tracer = MemoryTracer()
+            print("⚠ 诊断接口已开启: /debug/*")
+        
         print("✓ 人脸识别系统初始化完成")
         return True
     except Exception as e:
@@ -176,6 +256,20 @@ def index():
                 box-shadow: 0 2px 8px rgba(0, 0, 0, 0.1) !important;
             }
             
+            .preview-panel {
+                display: none;
+                margin-bottom: 25px;
+                border-radius: 16px;
+                overflow: hidden;
+                background: #000;
+                border: 1px solid #bbdefb;
+            }
+            
+            .preview-panel img {
+                display: block;
+                width: 100%%;
+            }
+            
             #result {
                 border-radius: 16px;
                 padding: 20px;
@@ -265,6 +359,14 @@ def index():
                 <button onclick="testMacService()" id="testMacBtn" class="secondary-btn">
                     🖥 测试Mac服务
                 </button>
+                
+                <button onclick="togglePreview()" id="previewBtn" class="secondary-btn">
+                    📷 显示实时预览
+                </button>
+            </div>
+            
+            <div class="preview-panel" id="previewPanel">
+                <img id="previewImg" alt="实时预览">
             </div>
             
             <div id="result"></div>
@@ -291,31 +393,119 @@ def index():
                     success ? '✅ 连接正常' : '❌ 连接异常';
             }
             
+            function formatTimings(timings) {
+                return Object.entries(timings || {})
+                    .map(([stage, ms]) => stage + ' ' + Math.round(ms) + 'ms')
+                    .join(' · ');
+            }
+            
+            function showJob(job) {
+                if (job.state === 'queued' || job.state === 'running') {
+                    showResult('🔄 正在进行人脸识别，请稍候...', 'processing');
+                    return false;
+                }
+                const result = job.result || {};
+                if (job.state === 'done' && result.queued) {
+                    // 守护进程持续监控中：已激活流水线，但等待时间内没有得出结果
+                    showResult('ℹ 已触发持续监控，暂无识别结果<br><small>' +
+                        (result.error || '') + '</small>', 'processing');
+                } else if (job.state === 'done' && result.success) {
+                    showResult('✅ 识别成功: ' + result.user + ' (' +
+                        (result.confidence * 100).toFixed(1) + '%)<br><small>' +
+                        formatTimings(result.timings_ms) + '</small>', 'success');
+                } else {
+                    showResult('❌ ' + (job.error || result.error || '识别失败') +
+                        '<br><small>' + formatTimings(result.timings_ms) + '</small>', 'error');
+                }
+                return true;
+            }
+            
+            function finishJob() {
+                const btn = document.getElementById('unlockBtn');
+                btn.disabled = false;
+                btn.innerHTML = '🔓 触发人脸识别解锁';
+                setTimeout(checkStatus, 1000);
+            }
+            
+            function pollJob(jobId) {
+                fetch('/jobs/' + jobId)
+                    .then(response => response.json())
+                    .then(job => {
+                        if (showJob(job)) {
+                            finishJob();
+                        } else {
+                            setTimeout(() => pollJob(jobId), 1000);
+                        }
+                    })
+                    .catch(error => {
+                        showResult('❌ 网络请求失败: ' + error, 'error');
+                        finishJob();
+                    });
+            }
+            
+            function watchJob(jobId) {
+                // 优先使用SSE，不支持或连接断开时改为轮询
+                if (!window.EventSource) {
+                    pollJob(jobId);
+                    return;
+                }
+                const source = new EventSource('/jobs/' + jobId + '/events');
+                source.addEventListener('state', event => {
+                    if (showJob(JSON.parse(event.data))) {
+                        source.close();
+                        finishJob();
+                    }
+                });
+                source.onerror = () => {
+                    source.close();
+                    pollJob(jobId);
+                };
+            }
+            
             function triggerUnlock() {
                 const btn = document.getElementById('unlockBtn');
                 btn.disabled = true;
                 btn.innerHTML = '<span class="spinner"></span>识别中...';
                 showResult('🔄 正在进行人脸识别，请稍候...', 'processing');
                 
-                fetch('/trigger_unlock', {method: 'POST'})
+                fetch('/jobs', {method: 'POST'})
                     .then(response => response.json())
                     .then(data => {
-                        if (data.success) {
-                            showResult('✅ ' + data.message, 'success');
-                        } else {
+                        if (!data.job_id) {
                             showResult('❌ ' + data.message, 'error');
+                            finishJob();
+                            return;
                         }
-                        setTimeout(checkStatus, 1000);
+                        watchJob(data.job_id);
                     })
                     .catch(error => {
                         showResult('❌ 网络请求失败: ' + error, 'error');
-                    })
-                    .finally(() => {
-                        btn.disabled = false;
-                        btn.innerHTML = '🔓 触发人脸识别解锁';
+                        finishJob();
                     });
             }
             
+            function togglePreview() {
+                const panel = document.getElementById('previewPanel');
+                const img = document.getElementById('previewImg');
+                const btn = document.getElementById('previewBtn');
+                if (panel.style.display === 'block') {
+                    // 清空src断开MJPEG连接，服务端停止为该客户端推送
+                    img.src = '';
+                    panel.style.display = 'none';
+                    btn.innerHTML = '📷 显示实时预览';
+                    return;
+                }
+                img.onerror = () => {
+                    showResult('❌ 实时预览不可用（需要常驻相机）', 'error');
+                    img.src = '';
+                    panel.style.display = 'none';
+                    btn.innerHTML = '📷 显示实时预览';
+                };
+                img.src = '/preview.mjpg?t=' + Date.now();
+                panel.style.display = 'block';
+                btn.innerHTML = '📷 隐藏实时预览';
+            }
+            
             function checkStatus() {
                 fetch('/status')
                     .then(response => response.json())
@@ -390,83 +580,298 @@ def index():
     </html>
     """
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """提交识别任务，立即返回任务ID；已有任务进行中时合并到该任务"""
+    if not job_manager:
+        return jsonify({
+            'success': False,
+            'message': '系统未初始化'
+        }), 503
+    
+    job, coalesced = job_manager.submit()
+    data = job.as_dict()
+    data.update({
+        'success': True,
+        'coalesced': coalesced,
+        'message': '已合并到进行中的识别任务' if coalesced else '识别任务已提交',
+        'status_url': f'/jobs/{job.id}',
+        'events_url': f'/jobs/{job.id}/events'
+    })
+    return jsonify(data), 202
+
 @app.route('/trigger_unlock', methods=['POST'])
 def trigger_unlock():
-    """触发人脸识别解锁"""
-    global is_processing, face_system
-    
-    if is_processing:
+    """旧接口：等待识别完成后返回（success表示识别已完成，recognized表示是否识别出授权用户）"""
+    if not job_manager:
         return jsonify({
             'success': False,
-            'message': '系统正在处理中，请稍后再试'
+            'message': '系统未初始化'
         })
     
-    if not face_system:
+    job, _ = job_manager.submit()
+    if not job_manager.wait_finished(job, TRIGGER_TIMEOUT):
         return jsonify({
             'success': False,
-            'message': '系统未初始化'
+            'message': '识别超时',
+            'job_id': job.id
         })
+    if job.error:
+        return jsonify({
+            'success': False,
+            'message': f'识别失败: {job.error}',
+            'job_id': job.id
+        })
+    
+    result = job.result or {}
+    outcome = result.get('user') if result.get('success') else (result.get('error') or '未识别到授权用户')
+    return jsonify({
+        'success': True,
+        'message': f'人脸识别完成: {outcome}',
+        'recognized': bool(result.get('success')),
+        'job_id': job.id,
+        'result': result
+    })
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """查询任务状态和结果"""
+    job = job_manager.get(job_id) if job_manager else None
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+    return jsonify(job.as_dict())
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """以SSE推送任务状态，任务结束后关闭"""
+    job = job_manager.get(job_id) if job_manager else None
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
     
-    is_processing = True
+    def stream():
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        version = -1
+        while time.monotonic() < deadline:
+            if job.version > version:
+                version = job.version
+                yield f"event: state\ndata: {json.dumps(job.as_dict())}\n\n"
+                if job.is_finished:
+                    return
+            elif not job_manager.wait(job, version, SSE_HEARTBEAT):
+                # 心跳，防止代理断开空闲连接
+                yield ": keepalive\n\n"
     
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/preview.mjpg')
+def preview_stream():
+    """MJPEG实时预览；?fps=N 限制本客户端的帧率"""
+    if preview is None:
+        return jsonify({
+            'success': False,
+            'message': '实时预览不可用'
+        }), 503
+    
+    client_fps = face_system.config.get('preview', {}).get('client_fps', preview.fps)
     try:
-        # 在新线程中执行识别
-        def run_recognition():
-            global is_processing
-            try:
-                result = face_system.run_once()
-                return result
-            finally:
-                is_processing = False
-        
-        # 启动识别线程
-        thread = threading.Thread(target=run_recognition)
-        thread.start()
-        thread.join(timeout=30)  # 30秒超时
-        
-        if thread.is_alive():
-            return jsonify({
-                'success': False,
-                'message': '识别超时'
-            })
-        
+        fps = min(float(request.args.get('fps', client_fps)), client_fps)
+    except ValueError:
+        fps = client_fps
+    
+    def stream():
+        for jpeg in preview.frames(max_fps=fps):
+            yield (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: ' +
+                   str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+    
+    return Response(stream(), mimetype='multipart/x-mixed-replace; boundary=frame',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/preview.jpg')
+def preview_snapshot():
+    """单张预览快照"""
+    jpeg = preview.snapshot() if preview is not None else None
+    if jpeg is None:
         return jsonify({
-            'success': True,
-            'message': '人脸识别完成，请查看终端输出'
-        })
-        
-    except Exception as e:
+            'success': False,
+            'message': '实时预览不可用'
+        }), 503
+    return Response(jpeg, mimetype='image/jpeg', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus指标"""
+    if daemon is not None:
+        try:
+            text = daemon.call('stats', prometheus=True)['prometheus']
+        except DaemonError as e:
+            return Response(f"# {e}\n", status=503, mimetype='text/plain')
+    elif face_system:
+        text = face_system.metrics.render()
+    else:
+        return Response("# 系统未初始化\n", status=503, mimetype='text/plain')
+    return Response(text, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def debug_denied():
+    """诊断接口未开启时返回404，配置了token时校验X-Debug-Token头或?token="""
+    if profiler is None:
         return jsonify({
             'success': False,
-            'message': f'识别失败: {str(e)}'
-        })
-    finally:
-        is_processing = False
+            'message': '诊断接口未开启'
+        }), 404
+    token = face_system.config.get('debug', {}).get('token', '')
+    given = request.headers.get('X-Debug-Token') or request.args.get('token', '')
+    if token and not hmac.compare_digest(given.encode(), token.encode()):
+        return jsonify({
+            'success': False,
+            'message': '无效的诊断token'
+        }), 403
+    return None
+
+def text_download(text, filename):
+    """以附件形式返回文本"""
+    return Response(text, mimetype='text/plain; charset=utf-8',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/debug/profile', methods=['POST'])
+def start_profile():
+    """对接下来N次识别做cProfile；?attempts=N（默认5）"""
+    denied = debug_denied()
+    if denied:
+        return denied
+    try:
+        attempts = max(1, min(int(request.args.get('attempts', 5)), 100))
+    except ValueError:
+        attempts = 5
+    if profiler.armed:
+        return jsonify(dict(profiler.status(), success=False, message='已有分析进行中')), 409
+    return jsonify(dict(profiler.arm(attempts, request.args.get('sort', 'cumulative')),
+                        success=True, message=f'将分析接下来的 {attempts} 次识别')), 202
+
+@app.route('/debug/profile', methods=['GET'])
+def profile_status():
+    """分析进度"""
+    denied = debug_denied()
+    if denied:
+        return denied
+    return jsonify(profiler.status())
+
+@app.route('/debug/profile', methods=['DELETE'])
+def cancel_profile():
+    """取消进行中的分析"""
+    denied = debug_denied()
+    if denied:
+        return denied
+    return jsonify(profiler.cancel())
+
+@app.route('/debug/profile/stats')
+@app.route('/debug/profile/report')
+def profile_result():
+    """下载最近一次分析结果：stats为pstats文件，report为文本报告"""
+    denied = debug_denied()
+    if denied:
+        return denied
+    status = profiler.status()
+    binary = request.path.endswith('/stats')
+    path = status.get('stats_path' if binary else 'report_path')
+    if not path or not os.path.exists(path):
+        return jsonify({
+            'success': False,
+            'message': '还没有完成的分析',
+            'state': status['state']
+        }), 404
+    with open(path, 'rb') as f:
+        data = f.read()
+    return Response(data, mimetype='application/octet-stream' if binary else 'text/plain; charset=utf-8',
+                    headers={'Content-Disposition': f'attachment; filename={os.path.basename(path)}'})
+
+@app.route('/debug/tracemalloc/start', methods=['POST'])
+def tracemalloc_start():
+    """开始跟踪内存分配并记录基准快照"""
+    denied = debug_denied()
+    if denied:
+        return denied
+    return jsonify(memory_tracer.start())
+
+@app.route('/debug/tracemalloc/diff')
+def tracemalloc_diff():
+    """与基准快照对比；?top=N"""
+    denied = debug_denied()
+    if denied:
+        return denied
+    try:
+        top = max(1, min(int(request.args.get('top', 30)), 500))
+    except ValueError:
+        top = 30
+    text = memory_tracer.diff(top=top)
+    if text is None:
+        return jsonify({
+            'success': False,
+            'message': '请先 POST /debug/tracemalloc/start'
+        }), 409
+    return text_download(text, f"tracemalloc_{time.strftime('%Y%m%d_%H%M%S')}.txt")
+
+@app.route('/debug/tracemalloc/stop', methods=['POST'])
+def tracemalloc_stop():
+    """停止跟踪"""
+    denied = debug_denied()
+    if denied:
+        return denied
+    return jsonify(memory_tracer.stop())
+
+@app.route('/debug/threads')
+def threads_dump():
+    """所有线程的调用栈"""
+    denied = debug_denied()
+    if denied:
+        return denied
+    return text_download(dump_threads(), f"threads_{time.strftime('%Y%m%d_%H%M%S')}.txt")
 
 @app.route('/status')
 def status():
     """系统状态"""
-    global face_system, is_processing
-    
-    return jsonify({
-        'system_initialized': face_system is not None,
-        'is_processing': is_processing,
-        'stats': face_system.stats if face_system else None
-    })
+    data = {
+        'system_initialized': face_system is not None or daemon is not None,
+        'is_processing': job_manager.busy if job_manager else False,
+        'jobs': job_manager.get_stats() if job_manager else None,
+        'preview': preview.get_stats() if preview else None,
+        'last_result': face_system.last_result if face_system else None,
+        'stats': face_system.stats if face_system else None,
+        'capture': face_system.capture_thread.get_stats()
+                   if face_system and face_system.capture_thread else None,
+        'prefilter': face_system.prefilter.get_stats()
+                     if face_system and face_system.prefilter else None
+    }
+    if daemon is not None:
+        try:
+            data['daemon'] = daemon.call('status')
+            data['last_result'] = data['daemon']['last_result']
+        except DaemonError as e:
+            data['daemon'] = {'ok': False, 'error': str(e)}
+    return jsonify(data)
 
 @app.route('/test_mac')
 def test_mac():
     """测试Mac服务"""
     global face_system
     
-    if not face_system:
+    if not face_system and daemon is None:
         return jsonify({
             'success': False,
             'message': '系统未初始化'
         })
     
     try:
-        result = face_system.check_mac_service()
+        if daemon is not None:
+            result = daemon.call('status', check_mac=True)['mac_ok']
+        else:
+            result = face_system.check_mac_service()
         return jsonify({
             'success': result,
             'message': 'Mac服务正常' if result else 'Mac服务异常'
@@ -480,14 +885,12 @@ def test_mac():
 @app.route('/health')
 def health_check():
     """健康检查接口"""
-    global face_system, is_processing
-    
     return jsonify({
         'status': 'healthy',
         'service': 'face-unlock-web',
         'timestamp': time.time(),
-        'system_initialized': face_system is not None,
-        'is_processing': is_processing,
+        'system_initialized': face_system is not None or daemon is not None,
+        'is_processing': job_manager.busy if job_manager else False,
         'version': '1.0'
     })
 